@@ -10,14 +10,51 @@
 返回：曲线 + 信号 + 统计
 """
 
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 import ccxt
+import numpy as np
 import pandas as pd
 from typing import Dict, Any
 
-from technical_analysis import calculate_technical_indicators, get_sentiment_indicators, calculate_integrated_trading_score
+from technical_analysis import calculate_technical_indicators, get_sentiment_indicators, calculate_integrated_trading_score, calculate_integrated_trading_scores
 from strategy_decision import StrategyInterface
-from deepseekok3 import exchange, TRADE_CONFIG, deepseek_client
+from candle_store import candle_store
+from backtest_cache import backtest_cache
+from llm_replay import RecordReplayClient
+from llm_dispatcher import LLMDispatcher
+from deepseekok3 import exchange, TRADE_CONFIG, deepseek_client, load_strategy_config
+
+
+# 基于LLM的策略：回测时通过录制/回放客户端调用模型
+LLM_STRATEGY_VERSIONS = ('strategy_decision_v1',)
+
+
+def create_llm_strategy(strategy_version: str, interval: str, llm_mode: str = 'record', llm_client=None, store=None,
+                        dispatcher: LLMDispatcher = None):
+    """
+    为基于LLM的策略创建回测用策略接口。
+    模型调用经 RecordReplayClient（见 llm_replay），实盘AI分析/交易历史不进入 prompt，
+    保证每根K线的 prompt 只由K线数据决定，可确定性回放。
+    record/live 模式下未录制的K线经 LLMDispatcher 并发预取（replay 模式只读本地录制，无需并发）。
+    Returns:
+        (StrategyInterface, RecordReplayClient)
+    """
+    if llm_client is None and llm_mode != 'replay':
+        llm_client = deepseek_client
+    if dispatcher is None and llm_mode != 'replay':
+        dispatcher = LLMDispatcher()
+    client = RecordReplayClient(store=store, mode=llm_mode, client=llm_client)
+    no_history = lambda limit: []
+    strategy = StrategyInterface(client, strategy_version=strategy_version, strategy_params={
+        'timeframe': interval,
+        'recent_analysis_func': no_history,
+        'recent_trades_func': no_history,
+        'dispatcher': dispatcher
+    })
+    return strategy, client
 
 
 def fetch_historical(exchange: ccxt.Exchange, symbol: str, timeframe: str, since: int, limit: int = 1000):
@@ -89,17 +126,87 @@ def fetch_since_paginated(exchange: ccxt.Exchange, symbol: str, timeframe: str,
     return df
 
 
-def run_backtest(days: int = 2, interval: str = '15m', strategy_version: str = 'strategy_decision_v2', end_time: str = None) -> Dict[str, Any]:
+class _ColumnCursor:
+    """单列只读游标：iloc 的负索引/切片均相对于游标末端（第 i 根）计算"""
+
+    def __init__(self, values: np.ndarray, end: int, name: str):
+        self._values = values
+        self._end = end
+        self.name = name
+
+    @property
+    def iloc(self):
+        return self
+
+    def __len__(self):
+        return self._end
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._end)
+            # 切片仅包装为Series视图（不复制数据），保留pandas的NaN处理语义（如mean跳过NaN）
+            return pd.Series(self._values[start:stop:step], name=self.name, copy=False)
+        idx = int(key)
+        if idx < 0:
+            idx += self._end
+        if idx < 0 or idx >= self._end:
+            raise IndexError(f"游标索引越界: {key} (当前长度 {self._end})")
+        return self._values[idx]
+
+    def to_numpy(self):
+        return self._values[:self._end]
+
+
+class BarCursor:
     """
-    运行回测。
+    回测用只读K线游标。
+    一次性把各列转换为只读 numpy 数组，之后每根K线只移动末端位置，
+    替代逐根 df.iloc[:i+1].copy()，每步的时间和内存开销均为 O(1)。
+    支持策略中使用的 len(df)、df['col'].iloc[-k]、df['col'].iloc[a:b]、df.tail(n) 访问方式。
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self._df = df
+        self._columns = {}
+        for col in df.columns:
+            values = df[col].to_numpy().view()
+            values.flags.writeable = False
+            self._columns[col] = values
+        self._end = 0
+
+    def advance_to(self, i: int):
+        """将游标移动到第 i 根K线（包含第 i 根）"""
+        self._end = i + 1
+        return self
+
+    @property
+    def columns(self):
+        return list(self._columns.keys())
+
+    def __len__(self):
+        return self._end
+
+    def __contains__(self, col):
+        return col in self._columns
+
+    def __getitem__(self, col):
+        return _ColumnCursor(self._columns[col], self._end, col)
+
+    def tail(self, n: int = 5) -> pd.DataFrame:
+        """截至当前位置的最近 n 根K线（原 DataFrame 的切片，调用方不应修改）"""
+        return self._df.iloc[max(0, self._end - n):self._end]
+
+
+def load_backtest_data(days: int = 2, interval: str = '15m', end_time: str = None) -> Dict[str, Any]:
+    """
+    加载回测所需的K线数据并计算技术指标。
+    同一份数据可供多个策略版本或参数组合共享，避免重复获取和计算。
     Args:
-        days: 回测天数 (默认 2 天，最多支持 300 天)
-        interval: K线级别 (默认 15m)
-        strategy_version: 策略版本 (默认 strategy_decision_v2)
+        days: 回测天数 (最多支持 300 天)
+        interval: K线级别
         end_time: 回测截至时间 (格式: 'YYYY-MM-DD HH:MM:SS'，默认为当前时间)
     Returns:
-        dict: { labels, prices, decisions, trades, equity_curve, summary }
-        注意：当回测天数超过20天时，返回数据仅包含最近20天，但统计数据基于完整回测结果
+        dict: { df, days, interval, per_day, end_timestamp }，失败时为 { error }
     """
     # 限制最大回测天数为300天
     days = min(days, 300)
@@ -126,9 +233,13 @@ def run_backtest(days: int = 2, interval: str = '15m', strategy_version: str = '
     end_utc = end_timestamp.tz_convert('UTC')
     end_ms = int(end_utc.timestamp() * 1000)
 
-    # 优先分页抓取，确保覆盖完整时间区间
-    # 注意：OKX等交易所单次抓取有限制，采用分页方式，max_candles设置为需求的1.5倍，增加安全边界
-    df = fetch_since_paginated(exchange, symbol, interval, since_ms=since_ms, max_candles=int(expected_candles * 1.5), page_limit=300)
+    # 优先从本地K线存储读取，仅向交易所请求缺失的区间
+    # 存储不可用时回退到分页抓取：OKX等交易所单次抓取有限制，max_candles设置为需求的1.5倍，增加安全边界
+    try:
+        df = candle_store.load_dataframe(exchange, symbol, interval, since_ms=since_ms, until_ms=end_ms)
+    except Exception as e:
+        print(f"⚠️ 本地K线存储读取失败: {e}，改为直接从交易所分页获取")
+        df = fetch_since_paginated(exchange, symbol, interval, since_ms=since_ms, max_candles=int(expected_candles * 1.5), page_limit=300)
     
     # 过滤掉截至时间之后的数据
     # 注意：DataFrame中的timestamp是naive datetime（无时区），需要转换为相同类型才能比较
@@ -151,32 +262,46 @@ def run_backtest(days: int = 2, interval: str = '15m', strategy_version: str = '
     # 计算技术指标
     df = calculate_technical_indicators(df)
 
-    # 初始化策略接口（使用指定版本）
-    strategy = StrategyInterface(deepseek_client, strategy_version=strategy_version)
+    return {
+        'df': df,
+        'days': days,
+        'interval': interval,
+        'per_day': per_day,
+        'end_timestamp': end_timestamp
+    }
+
+
+def simulate_strategy(df: pd.DataFrame, strategy_version: str = 'strategy_decision_v2', warmup_candles: int = 0,
+                      engine: str = 'batch', strategy: StrategyInterface = None,
+                      fee_rate: float = 0.0005, fixed_usd: float = 100.0, verbose: bool = True,
+                      progress_callback=None, prefetch_callback=None) -> Dict[str, Any]:
+    """
+    在已计算技术指标的K线上逐根模拟交易。
+    Args:
+        df: load_backtest_data 返回的K线数据
+        strategy_version: 策略版本
+        warmup_candles: 预热期K线数量（预热期内不进行交易判断）
+        engine: 回测引擎，见 run_backtest
+        strategy: 可选的已初始化策略接口（不传则按 strategy_version 创建）
+        fee_rate: 单边手续费率 (默认 0.05%)
+        fixed_usd: 每笔固定名义金额 (USDT，按首根K线价格换算为固定BTC数量)
+        verbose: 是否输出引擎信息（参数扫描时关闭）
+        progress_callback: 可选的进度回调 progress_callback(已处理K线数, 总K线数)，约每1%调用一次；
+            回调抛出的异常会中止回测（用于后台任务取消）
+        prefetch_callback: 可选的LLM决策预取进度回调 prefetch_callback(已完成请求数, 总请求数)，
+            每完成一个请求调用一次；抛出的异常同样会中止回测，剩余请求不再发出
+    Returns:
+        dict: { decisions, trades, equity_curve, stats }
+    """
+    if strategy is None:
+        strategy = StrategyInterface(deepseek_client, strategy_version=strategy_version)
 
     labels_full = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M').tolist()
-    
-    # 智能格式化时间标签：如果数据跨越多天，显示"月-日 时:分"，否则只显示"时:分"
-    if len(df) > 0:
-        first_date = df['timestamp'].iloc[0].date()
-        last_date = df['timestamp'].iloc[-1].date()
-        if first_date != last_date:
-            # 跨天数据：显示 "月-日 时:分"
-            labels_hm = df['timestamp'].dt.strftime('%m-%d %H:%M').tolist()
-        else:
-            # 单天数据：只显示 "时:分"
-            labels_hm = df['timestamp'].dt.strftime('%H:%M').tolist()
-    else:
-        labels_hm = []
-    
-    prices = df['close'].tolist()
     decisions = []  # 1 buy, -1 sell, 0 hold
     trades = []     # 每次信号记录
     equity_curve = []
 
     # 交易参数
-    fee_rate = 0.0005  # 0.05%
-    fixed_usd = 100.0
     first_price = float(df['close'].iloc[0])
     fixed_qty = fixed_usd / first_price  # 固定BTC数量（根据首根K线价格确定）
 
@@ -193,11 +318,29 @@ def run_backtest(days: int = 2, interval: str = '15m', strategy_version: str = '
     def order_fee(price: float, qty: float) -> float:
         return price * qty * fee_rate
 
-    # 计算第1天结束的索引位置（作为预热期）
-    warmup_candles = per_day  # 第1天的K线数量
-    
+    # 只读游标：各列仅转换一次，逐根移动末端
+    cursor = BarCursor(df) if engine != 'copy' else None
+    close_values = df['close'].to_numpy()
+
+    # 批量信号：一次性生成整列信号，循环中只在真正成交的K线上调用策略获取原因说明
+    batch_signals = None
+    if engine == 'batch' and strategy.supports_batch_signals():
+        batch_signals = strategy.generate_signals(df).to_numpy()
+        if verbose:
+            print(f"⚡ 使用批量信号引擎: {strategy.strategy_version}")
+
+    # 逐根调用模型的策略（v1）：先并发预取所有需要判断的K线的决策，循环中按顺序直接取用
+    if batch_signals is None and strategy.supports_signal_prefetch():
+        strategy.prefetch_signals(df, start=max(warmup_candles, 3), progress_callback=prefetch_callback)
+
+    total_bars = len(df)
+    progress_step = max(1, total_bars // 100)
+
     # 回测逐根
-    for i in range(len(df)):
+    for i in range(total_bars):
+        if progress_callback is not None and i % progress_step == 0:
+            progress_callback(i, total_bars)
+
         # 第1天作为预热期，不进行交易判断
         if i < warmup_candles:
             decisions.append(0)
@@ -210,9 +353,20 @@ def run_backtest(days: int = 2, interval: str = '15m', strategy_version: str = '
             equity_curve.append(cumulative_pnl)
             continue
 
-        partial_df = df.iloc[:i+1].copy()  # 截止当前
+        if batch_signals is not None:
+            signal = batch_signals[i]
+            # 与当前持仓同向的信号不会成交，无需生成原因说明
+            if signal == 'HOLD' or (signal == 'BUY' and position_side == 'long') or (signal == 'SELL' and position_side == 'short'):
+                decisions.append(0)
+                equity_curve.append(round(cumulative_pnl, 2))
+                continue
+
+        if cursor is not None:
+            partial_df = cursor.advance_to(i)  # 截止当前（只读视图）
+        else:
+            partial_df = df.iloc[:i+1].copy()  # 截止当前
         price_data = {
-            'price': partial_df['close'].iloc[-1],
+            'price': close_values[i],
             'full_data': partial_df
         }
         signal_data = strategy.analyze_market_strategy(price_data, signal_history=[], max_retries=1)
@@ -376,6 +530,30 @@ def run_backtest(days: int = 2, interval: str = '15m', strategy_version: str = '
         })
         position_side = None
 
+    return {
+        'decisions': decisions,
+        'trades': trades,
+        'equity_curve': equity_curve,
+        'stats': {
+            'closed_trades': closed_trades,
+            'win_trades': win_trades,
+            'gross_pnl_total': gross_pnl_total,
+            'total_fees': total_fees,
+            'net_pnl_total': cumulative_pnl
+        }
+    }
+
+
+def summarize_backtest(sim: Dict[str, Any], df: pd.DataFrame, days: int, interval: str, end_timestamp) -> Dict[str, Any]:
+    """根据 simulate_strategy 的结果生成回测统计"""
+    trades = sim['trades']
+    stats = sim['stats']
+    closed_trades = stats['closed_trades']
+    win_trades = stats['win_trades']
+    gross_pnl_total = stats['gross_pnl_total']
+    total_fees = stats['total_fees']
+    cumulative_pnl = stats['net_pnl_total']
+
     total_trades = len(trades)
     win_rate = (win_trades / closed_trades * 100) if closed_trades > 0 else 0.0
     avg_pnl_net = (cumulative_pnl / closed_trades) if closed_trades > 0 else 0.0
@@ -401,6 +579,124 @@ def run_backtest(days: int = 2, interval: str = '15m', strategy_version: str = '
         'total_pnl': round(cumulative_pnl, 2),
         'avg_pnl_per_trade': round(avg_pnl_net, 2)
     }
+    return summary
+
+
+def calculate_daily_pnl(trades) -> list:
+    """计算完整的天收益数据（按日期倒序）"""
+    daily_pnl_map = {}
+    for trade in trades:
+        if trade.get('pnl') is not None:
+            date = trade['timestamp'].split(' ')[0]  # 提取日期 YYYY-MM-DD
+            if date not in daily_pnl_map:
+                daily_pnl_map[date] = 0
+            daily_pnl_map[date] += trade['pnl']
+    
+    # 转换为列表并排序
+    daily_pnl_list = [
+        {'date': date, 'pnl': round(pnl, 2)}
+        for date, pnl in sorted(daily_pnl_map.items(), key=lambda x: x[0], reverse=True)
+    ]
+    return daily_pnl_list
+
+
+def run_backtest(days: int = 2, interval: str = '15m', strategy_version: str = 'strategy_decision_v2', end_time: str = None,
+                 engine: str = 'batch', progress_callback=None, use_cache: bool = True,
+                 llm_mode: str = 'record', llm_client=None, llm_dispatcher: LLMDispatcher = None) -> Dict[str, Any]:
+    """
+    运行回测。
+    Args:
+        days: 回测天数 (默认 2 天，最多支持 300 天)
+        interval: K线级别 (默认 15m)
+        strategy_version: 策略版本 (默认 strategy_decision_v2)
+        end_time: 回测截至时间 (格式: 'YYYY-MM-DD HH:MM:SS'，默认为当前时间)
+        engine: 回测引擎
+            'batch'  - 策略支持 generate_signals 时一次性向量化生成整列信号，否则退回 'cursor'
+            'cursor' - 逐根调用策略，使用只读游标，O(1)/根
+            'copy'   - 旧的逐根复制DataFrame方式
+        progress_callback: 可选的进度回调 progress_callback(stage, fraction)，
+            stage 为 'loading' / 'prefetching'（仅LLM策略）/ 'simulating' / 'summarizing'，fraction 为 0~1 的整体进度
+        use_cache: 是否使用回测结果磁盘缓存（K线数据与策略代码均未变化时直接返回上次结果）
+        llm_mode: 基于LLM的策略（v1）的模型调用方式，见 llm_replay:
+            'record' - 优先使用已录制的响应，未录制的调用模型并录制（默认）
+            'replay' - 只使用已录制的响应，不访问网络；未录制的K线按回退信号（HOLD）处理
+            'live'   - 每根K线直接调用模型
+        llm_client: 可选的模型客户端（默认 DeepSeek 客户端，测试时可传入 llm_replay.StubChatClient）
+        llm_dispatcher: 可选的 llm_dispatcher.LLMDispatcher，record/live 模式下并发预取未录制K线的决策
+            （默认按 LLM_MAX_CONCURRENCY / LLM_RATE_PER_SECOND / LLM_REQUEST_TIMEOUT 创建）
+    Returns:
+        dict: { labels, prices, decisions, trades, equity_curve, summary }
+        注意：当回测天数超过20天时，返回数据仅包含最近20天，但统计数据基于完整回测结果
+    """
+    if progress_callback is not None:
+        progress_callback('loading', 0.0)
+    data = load_backtest_data(days=days, interval=interval, end_time=end_time)
+    if 'error' in data:
+        return data
+    df = data['df']
+    days = data['days']
+    end_timestamp = data['end_timestamp']
+
+    # LLM策略的结果取决于录制存储的内容，不使用结果缓存
+    strategy, llm = None, None
+    if strategy_version in LLM_STRATEGY_VERSIONS:
+        strategy, llm = create_llm_strategy(strategy_version, interval, llm_mode, llm_client,
+                                            dispatcher=llm_dispatcher)
+        use_cache = False
+
+    # 各回测引擎结果一致，缓存键不区分引擎
+    cache_key = None
+    if use_cache:
+        try:
+            cache_key = backtest_cache.make_key(strategy_version, interval, days, df)
+            cached = backtest_cache.get(cache_key) if cache_key is not None else None
+            if cached is not None:
+                end_time_str = end_timestamp.strftime('%Y-%m-%d %H:%M:%S')
+                print(f"💾 回测缓存命中: {strategy_version} {interval} {days}天 截至 {end_time_str}")
+                cached['summary'] = dict(cached.get('summary', {}), end_time=end_time_str)
+                return cached
+        except Exception as e:
+            print(f"⚠️ 回测缓存不可用: {e}")
+            cache_key = None
+
+    # 进度划分：数据加载 0~10%，逐根模拟 10~90%，统计与图表 90~100%；
+    # LLM策略的耗时主要在预取模型决策，划分为 预取 10~80%，逐根模拟 80~90%
+    bar_progress, prefetch_progress = None, None
+    if progress_callback is not None:
+        sim_start = 0.8 if strategy is not None else 0.1
+        bar_progress = lambda done, total: progress_callback('simulating', sim_start + (0.9 - sim_start) * done / max(total, 1))
+        if strategy is not None:
+            prefetch_progress = lambda done, total: progress_callback('prefetching', 0.1 + 0.7 * done / max(total, 1))
+
+    # 第1天作为预热期
+    sim = simulate_strategy(df, strategy_version=strategy_version, warmup_candles=data['per_day'], engine=engine,
+                            strategy=strategy, progress_callback=bar_progress, prefetch_callback=prefetch_progress)
+    if llm is not None:
+        print(f"🤖 LLM调用统计: {llm.stats()}")
+    if progress_callback is not None:
+        progress_callback('summarizing', 0.9)
+    decisions = sim['decisions']  # 1 buy, -1 sell, 0 hold
+    trades = sim['trades']        # 每次信号记录
+    equity_curve = sim['equity_curve']
+
+    labels_full = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M').tolist()
+    
+    # 智能格式化时间标签：如果数据跨越多天，显示"月-日 时:分"，否则只显示"时:分"
+    if len(df) > 0:
+        first_date = df['timestamp'].iloc[0].date()
+        last_date = df['timestamp'].iloc[-1].date()
+        if first_date != last_date:
+            # 跨天数据：显示 "月-日 时:分"
+            labels_hm = df['timestamp'].dt.strftime('%m-%d %H:%M').tolist()
+        else:
+            # 单天数据：只显示 "时:分"
+            labels_hm = df['timestamp'].dt.strftime('%H:%M').tolist()
+    else:
+        labels_hm = []
+    
+    prices = df['close'].tolist()
+
+    summary = summarize_backtest(sim, df, days, interval, end_timestamp)
 
     # 计算 scores 以与技术图保持一致（使用当前情绪）
     try:
@@ -408,29 +704,34 @@ def run_backtest(days: int = 2, interval: str = '15m', strategy_version: str = '
     except Exception:
         sentiment_data = None
 
-    scores = []
     if sentiment_data is not None:
-        for i in range(len(df)):
-            try:
-                technical_data = {
-                    'sma_5': df['sma_5'].iloc[i],
-                    'sma_20': df['sma_20'].iloc[i],
-                    'sma_50': df['sma_50'].iloc[i],
-                    'rsi': df['rsi'].iloc[i],
-                    'macd': df['macd'].iloc[i],
-                    'macd_signal': df['macd_signal'].iloc[i],
-                    'macd_histogram': df['macd_histogram'].iloc[i],
-                    'bb_position': df['bb_position'].iloc[i]
-                }
-                sc = calculate_integrated_trading_score(
-                    current_price=df['close'].iloc[i],
-                    technical_data=technical_data,
-                    sentiment_data=sentiment_data
-                )
-                scores.append(sc)
-            except Exception:
-                scores.append(0)
-        df['score'] = scores
+        try:
+            # 整列向量化计算，结果与逐行调用评分函数一致
+            df['score'] = calculate_integrated_trading_scores(df, sentiment_data)
+        except Exception as e:
+            print(f"向量化计算score失败: {e}，改为逐行计算")
+            scores = []
+            for i in range(len(df)):
+                try:
+                    technical_data = {
+                        'sma_5': df['sma_5'].iloc[i],
+                        'sma_20': df['sma_20'].iloc[i],
+                        'sma_50': df['sma_50'].iloc[i],
+                        'rsi': df['rsi'].iloc[i],
+                        'macd': df['macd'].iloc[i],
+                        'macd_signal': df['macd_signal'].iloc[i],
+                        'macd_histogram': df['macd_histogram'].iloc[i],
+                        'bb_position': df['bb_position'].iloc[i]
+                    }
+                    sc = calculate_integrated_trading_score(
+                        current_price=df['close'].iloc[i],
+                        technical_data=technical_data,
+                        sentiment_data=sentiment_data
+                    )
+                    scores.append(sc)
+                except Exception:
+                    scores.append(0)
+            df['score'] = scores
     else:
         df['score'] = 0
 
@@ -535,21 +836,9 @@ def run_backtest(days: int = 2, interval: str = '15m', strategy_version: str = '
     }
 
     # 计算完整的天收益数据（不受20天限制）
-    daily_pnl_map = {}
-    for trade in trades:
-        if trade.get('pnl') is not None:
-            date = trade['timestamp'].split(' ')[0]  # 提取日期 YYYY-MM-DD
-            if date not in daily_pnl_map:
-                daily_pnl_map[date] = 0
-            daily_pnl_map[date] += trade['pnl']
-    
-    # 转换为列表并排序
-    daily_pnl_list = [
-        {'date': date, 'pnl': round(pnl, 2)}
-        for date, pnl in sorted(daily_pnl_map.items(), key=lambda x: x[0], reverse=True)
-    ]
+    daily_pnl_list = calculate_daily_pnl(trades)
 
-    return {
+    result = {
         'labels': labels_display,
         'prices': prices_display,
         'decisions': decisions_display,
@@ -560,6 +849,106 @@ def run_backtest(days: int = 2, interval: str = '15m', strategy_version: str = '
         'summary': summary,
         'chart': chart
     }
+    if llm is not None:
+        result['llm'] = llm.stats()
+    if cache_key is not None:
+        backtest_cache.put(cache_key, result)
+    return result
+
+
+def _display_start_index(df: pd.DataFrame, days: int, display_days: int = 20) -> int:
+    """回测天数超过 display_days 时，返回仅展示最近 display_days 天的起始位置"""
+    if days <= display_days or df.empty:
+        return 0
+    truncate_time = df['timestamp'].iloc[-1] - timedelta(days=display_days)
+    return int(df['timestamp'].searchsorted(truncate_time))
+
+
+def _simulate_version(task) -> Dict[str, Any]:
+    """进程池任务：在共享的K线数据上回测单个策略版本"""
+    df, strategy_version, warmup_candles, days, interval, end_timestamp = task
+    try:
+        strategy = None
+        if strategy_version in LLM_STRATEGY_VERSIONS:
+            strategy, _ = create_llm_strategy(strategy_version, interval)
+        sim = simulate_strategy(df, strategy_version=strategy_version, warmup_candles=warmup_candles, strategy=strategy)
+        return {
+            'version': strategy_version,
+            'summary': summarize_backtest(sim, df, days, interval, end_timestamp),
+            'equity_curve': sim['equity_curve'],
+            'decisions': sim['decisions'],
+            'daily_pnl': calculate_daily_pnl(sim['trades'])
+        }
+    except Exception as e:
+        print(f"❌ 策略 {strategy_version} 回测失败: {e}")
+        return {'version': strategy_version, 'error': str(e)}
+
+
+def compare_strategies(days: int = 2, interval: str = '15m', end_time: str = None, versions=None,
+                       max_workers: int = None) -> Dict[str, Any]:
+    """
+    多策略对比回测：K线与技术指标只加载一次，各策略版本在进程池中并行回测。
+    Args:
+        days: 回测天数 (最多支持 300 天)
+        interval: K线级别
+        end_time: 回测截至时间 (格式: 'YYYY-MM-DD HH:MM:SS'，默认为当前时间)
+        versions: 参与对比的策略版本列表，默认取 strategy_config.json 中所有 enabled 的版本
+        max_workers: 进程池大小，默认 min(策略数, CPU核数)
+    Returns:
+        dict: { labels, prices, dates, strategies: [{ version, summary, equity_curve, decisions, daily_pnl }] }
+        equity_curve/decisions 与 labels 对齐（超过20天时仅含最近20天），
+        daily_pnl 与 dates 对齐（完整区间，按日期倒序，无交易的日期为0）
+    """
+    if not versions:
+        config = load_strategy_config()
+        versions = [v['version'] for v in config.get('available_versions', []) if v.get('enabled')]
+    if not versions:
+        return {'error': '没有可对比的策略版本'}
+
+    data = load_backtest_data(days=days, interval=interval, end_time=end_time)
+    if 'error' in data:
+        return data
+    df = data['df']
+    days = data['days']
+
+    tasks = [(df, v, data['per_day'], days, interval, data['end_timestamp']) for v in versions]
+    workers = max(1, min(len(tasks), max_workers or os.cpu_count() or 1))
+    try:
+        # Web进程中有后台线程（情绪刷新、任务队列等）持有锁和sqlite连接，fork 出的子进程可能死锁，
+        # 工作进程改由单线程的 forkserver 创建
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('forkserver')) as pool:
+            results = list(pool.map(_simulate_version, tasks))
+    except Exception as e:
+        print(f"⚠️ 进程池执行失败: {e}，改为顺序回测")
+        results = [_simulate_version(task) for task in tasks]
+
+    # 对齐：曲线按K线位置截取展示区间，天收益按所有策略日期的并集对齐
+    start = _display_start_index(df, days)
+    labels = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M').tolist()[start:]
+    prices = df['close'].tolist()[start:]
+    dates = sorted({d['date'] for r in results for d in r.get('daily_pnl', [])}, reverse=True)
+
+    strategies = []
+    for r in results:
+        if 'error' in r:
+            strategies.append(r)
+            continue
+        daily_map = {d['date']: d['pnl'] for d in r['daily_pnl']}
+        strategies.append({
+            'version': r['version'],
+            'summary': r['summary'],
+            'equity_curve': r['equity_curve'][start:],
+            'decisions': r['decisions'][start:],
+            'daily_pnl': [daily_map.get(date, 0) for date in dates]
+        })
+
+    print(f"📊 对比回测完成：{len(versions)} 个策略，{len(df)} 根K线，并行进程数 {workers}")
+    return {
+        'labels': labels,
+        'prices': prices,
+        'dates': dates,
+        'strategies': strategies
+    }
 
 
 if __name__ == '__main__':
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+回测结果磁盘缓存
+以 (策略版本, K线级别, 回测天数, 最后一根K线时间, K线数据指纹, 代码版本) 为键缓存 run_backtest 的结果。
+- 不使用请求的截至时间：默认截至当前时间时，同一根K线内的请求对应同一份数据，应命中同一结果
+- K线数据指纹：回测所用已收盘OHLCV数据的哈希，数据变化（如新K线收盘）时自动失效；
+  未收盘K线的数值在收盘前不断变化，不计入指纹，结果缓存到该K线收盘（与技术图缓存一致）。
+  命中时最后一根的收盘价、FINAL_CLOSE 平仓盈亏和评分仍是首次回测时的值，因此只对不超过
+  BACKTEST_CACHE_MAX_OPEN_INTERVAL（默认1h）的周期缓存含未收盘K线的回测，更长周期只缓存截至已收盘K线的回测
+- 代码版本：策略模块及回测相关模块源码的哈希，修改策略后旧结果自动失效
+缓存按最近使用时间（LRU）淘汰，总大小和条目数超过上限时删除最久未使用的结果。
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+
+from candle_store import timeframe_to_ms
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'backtest_cache')
+
+# 除策略模块外，影响回测结果的源码
+CODE_MODULES = ('backtest.py', 'strategy_decision.py', 'technical_analysis.py')
+
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+# 最后一根K线未收盘时允许缓存的最大K线周期（缓存结果中该K线的数值最多滞后一个周期）
+MAX_OPEN_CANDLE_INTERVAL = os.getenv('BACKTEST_CACHE_MAX_OPEN_INTERVAL', '1h')
+
+
+def candle_fingerprint(df: pd.DataFrame) -> str:
+    """计算K线区间指纹（OHLCV数据的哈希）"""
+    hasher = hashlib.sha1()
+    hasher.update(str(len(df)).encode())
+    if len(df):
+        hasher.update(df['timestamp'].astype('int64').to_numpy().tobytes())
+        hasher.update(df[OHLCV_COLUMNS[1:]].to_numpy(dtype='float64').tobytes())
+    return hasher.hexdigest()
+
+
+class BacktestResultCache:
+    """
+    回测结果磁盘缓存（每个结果一个JSON文件）。
+    文件修改时间即最近使用时间，命中时刷新，淘汰时按修改时间从旧到新删除。
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=200 * 1024 * 1024, max_entries=500):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # 源码哈希缓存: 路径 -> (mtime, size, 哈希)
+        self._source_hashes = {}
+
+    def _source_hash(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return 'missing'
+        cached = self._source_hashes.get(path)
+        if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+            return cached[2]
+        with open(path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        self._source_hashes[path] = (stat.st_mtime, stat.st_size, digest)
+        return digest
+
+    def code_version(self, strategy_version):
+        """策略模块与回测相关模块源码的组合哈希"""
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        modules = (f'{strategy_version}.py',) + CODE_MODULES
+        hasher = hashlib.sha1()
+        for name in modules:
+            hasher.update(name.encode())
+            hasher.update(self._source_hash(os.path.join(base_dir, name)).encode())
+        return hasher.hexdigest()
+
+    def make_key(self, strategy_version, interval, days, df):
+        """
+        生成缓存键（df 的时间为上海时区 naive 时间）。
+        最后一根K线未收盘且周期超过 MAX_OPEN_CANDLE_INTERVAL 时返回 None（不缓存）。
+        """
+        last_candle, closed = None, df
+        if len(df):
+            last_candle = pd.Timestamp(df['timestamp'].iloc[-1])
+            now = pd.Timestamp.now(tz='Asia/Shanghai').tz_localize(None)
+            tf_ms = timeframe_to_ms(interval)
+            if last_candle + pd.Timedelta(milliseconds=tf_ms) > now:
+                if tf_ms > timeframe_to_ms(MAX_OPEN_CANDLE_INTERVAL):
+                    return None
+                closed = df.iloc[:-1]
+        parts = {
+            'strategy_version': strategy_version,
+            'interval': interval,
+            'days': days,
+            'last_candle': str(last_candle),
+            'candles': candle_fingerprint(closed),
+            'code': self.code_version(strategy_version),
+        }
+        return hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def get(self, key):
+        """读取缓存结果，未命中返回 None"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            os.utime(path, None)  # 刷新最近使用时间
+            return result
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️ 读取回测缓存失败: {e}")
+            return None
+
+    def put(self, key, result):
+        """写入缓存结果（原子替换），并按上限淘汰旧结果"""
+        try:
+            with self._lock:
+                if not os.path.exists(self.cache_dir):
+                    os.makedirs(self.cache_dir)
+                path = self._path(key)
+                tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(result, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+                self._evict()
+        except Exception as e:
+            print(f"⚠️ 写入回测缓存失败: {e}")
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        while entries and (total > self.max_bytes or len(entries) > self.max_entries):
+            _, size, name = entries.pop(0)
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            total -= size
+            removed += 1
+        if removed:
+            print(f"🧹 回测缓存淘汰 {removed} 个旧结果")
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            if not os.path.exists(self.cache_dir):
+                return
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.json'):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+
+# 全局回测结果缓存实例
+backtest_cache = BacktestResultCache()
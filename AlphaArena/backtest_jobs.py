@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+后台回测任务队列
+回测请求提交后立即返回任务ID，由本地有界线程池在后台执行 run_backtest，
+前端通过任务ID轮询状态与进度、取消任务、获取结果，长时间回测不再占用Web请求线程。
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# 任务状态
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+FINISHED_STATES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+
+class BacktestCancelled(Exception):
+    """任务被取消时由进度回调抛出，用于中止正在执行的回测"""
+
+
+class BacktestJobManager:
+    """
+    回测任务管理器。
+
+    - 同时执行的回测数不超过 max_workers，其余任务排队
+    - 排队+执行中的任务超过 max_pending 时拒绝提交
+    - 已结束的任务最多保留 max_finished 个（最早结束的先清理）
+    - 取消：排队中的任务直接取消；执行中的任务在下一次进度回调时中止
+    """
+
+    def __init__(self, max_workers=None, max_pending=20, max_finished=100, runner=None):
+        self.max_workers = max_workers or int(os.getenv('BACKTEST_JOB_WORKERS', 2))
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        # 可注入的回测函数，默认延迟导入 backtest.run_backtest
+        self._runner = runner
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='backtest-job')
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+
+    def _get_runner(self):
+        if self._runner is None:
+            from backtest import run_backtest
+            self._runner = run_backtest
+        return self._runner
+
+    # ------------------------------------------------------------------
+    # 提交与执行
+    # ------------------------------------------------------------------
+    def submit(self, params):
+        """
+        提交回测任务。
+        Args:
+            params: run_backtest 的关键字参数 (days, interval, strategy_version, end_time, llm_mode)
+        Returns:
+            dict: 任务状态；任务数超过上限时为 { error }
+        """
+        with self._lock:
+            active = sum(1 for job in self._jobs.values() if job['status'] not in FINISHED_STATES)
+            if active >= self.max_pending:
+                return {'error': f'回测任务过多（{active} 个未完成），请稍后再试'}
+            job_id = uuid.uuid4().hex[:12]
+            job = {
+                'job_id': job_id,
+                'params': dict(params),
+                'status': JOB_QUEUED,
+                'stage': 'queued',
+                'progress': 0.0,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'error': None,
+                'result': None,
+                'cancel_event': threading.Event(),
+                'future': None,
+            }
+            self._jobs[job_id] = job
+            job['future'] = self._executor.submit(self._run_job, job)
+        print(f"📝 回测任务已提交: {job_id} {params}")
+        return self._public(job)
+
+    def _run_job(self, job):
+        with self._lock:
+            if job['cancel_event'].is_set():
+                self._finish(job, JOB_CANCELLED)
+                return
+            job['status'] = JOB_RUNNING
+            job['stage'] = 'loading'
+            job['started_at'] = time.time()
+
+        def on_progress(stage, fraction):
+            if job['cancel_event'].is_set():
+                raise BacktestCancelled()
+            job['stage'] = stage
+            job['progress'] = round(min(max(fraction, 0.0), 1.0), 4)
+
+        try:
+            result = self._get_runner()(progress_callback=on_progress, **job['params'])
+            with self._lock:
+                if 'error' in result:
+                    job['error'] = result['error']
+                    self._finish(job, JOB_FAILED)
+                else:
+                    job['result'] = result
+                    job['progress'] = 1.0
+                    self._finish(job, JOB_COMPLETED)
+        except BacktestCancelled:
+            with self._lock:
+                self._finish(job, JOB_CANCELLED)
+            print(f"🛑 回测任务已取消: {job['job_id']}")
+        except Exception as e:
+            print(f"❌ 回测任务失败: {job['job_id']} {e}")
+            with self._lock:
+                job['error'] = str(e)
+                self._finish(job, JOB_FAILED)
+
+    def _finish(self, job, status):
+        """标记任务结束并清理过多的已结束任务（调用方持有锁）"""
+        job['status'] = status
+        job['stage'] = status
+        job['finished_at'] = time.time()
+        finished = [job_id for job_id, j in self._jobs.items() if j['status'] in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    # ------------------------------------------------------------------
+    # 查询与取消
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _public(job):
+        """任务状态（不含结果）"""
+        info = {k: job[k] for k in ('job_id', 'params', 'status', 'stage', 'progress', 'error')}
+        for key in ('created_at', 'started_at', 'finished_at'):
+            info[key] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(job[key])) if job[key] else None
+        if job['started_at']:
+            info['elapsed_seconds'] = round((job['finished_at'] or time.time()) - job['started_at'], 2)
+        return info
+
+    def get_status(self, job_id):
+        """返回任务状态，任务不存在时为 None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._public(job) if job else None
+
+    def get_result(self, job_id):
+        """返回 (任务状态, 回测结果)；任务未完成时结果为 None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job:
+                return None, None
+            return self._public(job), job['result']
+
+    def list_jobs(self):
+        """按提交时间倒序返回所有任务状态"""
+        with self._lock:
+            return [self._public(job) for job in reversed(self._jobs.values())]
+
+    def cancel(self, job_id):
+        """取消任务，返回取消后的任务状态；任务不存在时为 None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job:
+                return None
+            if job['status'] in FINISHED_STATES:
+                return self._public(job)
+            job['cancel_event'].set()
+            if job['status'] == JOB_QUEUED and job['future'].cancel():
+                self._finish(job, JOB_CANCELLED)
+            return self._public(job)
+
+
+# 全局回测任务管理器实例
+backtest_job_manager = BacktestJobManager()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+K线收盘调度器
+在每个K线周期边界（收盘时刻）加上可配置的等待时间后唤醒，执行一次交易任务。
+任务返回 None 表示交易所尚未生成新K线（或没有新收盘的K线），调度器会短暂等待后重试，
+重试次数用完则跳过本周期，避免对同一根K线重复分析。
+"""
+
+import time
+
+from candle_store import timeframe_to_ms
+
+
+class CandleCloseScheduler:
+    """
+    Args:
+        timeframe: K线周期，如 '15m'
+        job: 每根K线收盘后执行的函数；返回 None 表示没有新收盘K线（将重试）
+        settle_seconds: 收盘后等待的秒数，保证交易所已生成新K线
+        retry_delay: 没有新K线时的重试间隔（秒）
+        max_retries: 每个周期最多重试次数
+    """
+
+    def __init__(self, timeframe, job, settle_seconds=3.0, retry_delay=2.0, max_retries=5):
+        self.timeframe = timeframe
+        self.interval = timeframe_to_ms(timeframe) / 1000.0
+        self.job = job
+        self.settle_seconds = settle_seconds
+        self.retry_delay = retry_delay
+        self.max_retries = max_retries
+        self.ticks = 0
+        self.skipped = 0
+
+    def next_close(self, now=None):
+        """下一个K线收盘时刻（epoch秒）"""
+        now = time.time() if now is None else now
+        return (now // self.interval + 1) * self.interval
+
+    def _sleep_until(self, target):
+        while True:
+            remaining = target - time.time()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def run_once(self, close_time):
+        """在 close_time 对应的收盘后执行一次任务（含重试），返回任务结果"""
+        self._sleep_until(close_time + self.settle_seconds)
+        self.ticks += 1
+        for attempt in range(self.max_retries + 1):
+            result = self.job()
+            if result is not None:
+                return result
+            if attempt < self.max_retries:
+                time.sleep(self.retry_delay)
+        self.skipped += 1
+        print(f"⏭️ {time.strftime('%H:%M:%S', time.localtime(close_time))} 收盘后未获取到新K线，跳过本周期")
+        return None
+
+    def run_forever(self):
+        """按K线收盘循环执行，直到被中断"""
+        print(f"⏰ K线收盘调度已启动: 周期 {self.timeframe}，收盘后 {self.settle_seconds}s 执行")
+        while True:
+            close_time = self.next_close()
+            print(f"⏳ 下次执行: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(close_time + self.settle_seconds))}")
+            self.run_once(close_time)
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本地K线存储模块
+以 SQLite 按 (symbol, timeframe) 持久化已收盘的OHLCV数据，并记录已同步的时间区间。
+读取任意 [since, until] 区间时只向交易所请求本地缺失的部分，
+重复的回测/图表请求直接从磁盘读取，无需再次下载。
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+OHLCV_COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'candles.sqlite3')
+
+
+def timeframe_to_ms(timeframe: str) -> int:
+    """将'3m','15m','1h','4h','1d','1w'等周期转换为毫秒数"""
+    tf = timeframe.strip().lower()
+    units = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+    if tf and tf[-1] in units and tf[:-1].isdigit():
+        return int(tf[:-1]) * units[tf[-1]] * 1000
+    raise ValueError(f"无法识别的K线周期: {timeframe}")
+
+
+def _align_up(ms: int, tf_ms: int) -> int:
+    """向上对齐到K线开盘时间（OKX各周期K线按UTC整点对齐）"""
+    return -(-int(ms) // tf_ms) * tf_ms
+
+
+def ohlcv_to_dataframe(rows):
+    """将ccxt格式的OHLCV列表转换为DataFrame，时间戳转换为上海时区（去除时区信息）"""
+    df = pd.DataFrame(rows, columns=OHLCV_COLUMNS)
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms').dt.tz_localize('UTC').dt.tz_convert('Asia/Shanghai').dt.tz_localize(None)
+    return df
+
+
+class CandleStore:
+    """
+    本地持久化K线存储。
+
+    - candles 表：已收盘K线，主键 (symbol, timeframe, ts)，只追加/覆盖写入
+    - coverage 表：已向交易所同步过的时间区间（合并后的闭区间，毫秒），只覆盖到实际收到的最后一根已收盘K线
+    交易所返回的最新一根K线在出现更晚的K线之前都视为未收盘（不依赖本地时钟），不落盘，每次按需实时获取。
+    """
+
+    def __init__(self, db_path=None, page_limit=300):
+        self.db_path = db_path or DEFAULT_DB_PATH
+        self.page_limit = page_limit
+        # 同一进程内串行化同步过程，避免多个请求重复下载同一区间
+        self._sync_lock = threading.Lock()
+        # 数据库在第一次读写时才创建，导入模块（如测试收集）不会在数据目录生成文件
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self._init_db()
+                    self._initialized = True
+        return self._open()
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_db(self):
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        with self._open() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS candles (
+                    symbol TEXT NOT NULL,
+                    timeframe TEXT NOT NULL,
+                    ts INTEGER NOT NULL,
+                    open REAL, high REAL, low REAL, close REAL, volume REAL,
+                    PRIMARY KEY (symbol, timeframe, ts)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS coverage (
+                    symbol TEXT NOT NULL,
+                    timeframe TEXT NOT NULL,
+                    start_ms INTEGER NOT NULL,
+                    end_ms INTEGER NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_coverage ON coverage (symbol, timeframe, start_ms)")
+
+    # ------------------------------------------------------------------
+    # 读写
+    # ------------------------------------------------------------------
+    def get_rows(self, symbol, timeframe, since_ms, until_ms):
+        """读取本地已存储的 [since_ms, until_ms] 区间K线（ccxt列表格式，按时间升序）"""
+        with self._connect() as conn:
+            cur = conn.execute(
+                "SELECT ts, open, high, low, close, volume FROM candles "
+                "WHERE symbol = ? AND timeframe = ? AND ts >= ? AND ts <= ? ORDER BY ts",
+                (symbol, timeframe, int(since_ms), int(until_ms))
+            )
+            return [list(row) for row in cur.fetchall()]
+
+    def save_rows(self, symbol, timeframe, rows):
+        """写入已收盘K线（重复时间戳覆盖）"""
+        if not rows:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO candles (symbol, timeframe, ts, open, high, low, close, volume) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(symbol, timeframe, int(r[0]), r[1], r[2], r[3], r[4], r[5]) for r in rows]
+            )
+
+    def _get_coverage(self, conn, symbol, timeframe):
+        cur = conn.execute(
+            "SELECT start_ms, end_ms FROM coverage WHERE symbol = ? AND timeframe = ? ORDER BY start_ms",
+            (symbol, timeframe)
+        )
+        return [(int(s), int(e)) for s, e in cur.fetchall()]
+
+    def mark_covered(self, symbol, timeframe, start_ms, end_ms):
+        """记录 [start_ms, end_ms] 区间已同步，并与相邻/重叠区间合并"""
+        if end_ms < start_ms:
+            return
+        tf_ms = timeframe_to_ms(timeframe)
+        with self._connect() as conn:
+            intervals = self._get_coverage(conn, symbol, timeframe)
+            intervals.append((int(start_ms), int(end_ms)))
+            intervals.sort()
+            merged = []
+            for s, e in intervals:
+                # 两个区间之间不存在K线开盘时间时视为连续
+                if merged and _align_up(merged[-1][1] + 1, tf_ms) >= s:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+                else:
+                    merged.append((s, e))
+            conn.execute("DELETE FROM coverage WHERE symbol = ? AND timeframe = ?", (symbol, timeframe))
+            conn.executemany(
+                "INSERT INTO coverage (symbol, timeframe, start_ms, end_ms) VALUES (?, ?, ?, ?)",
+                [(symbol, timeframe, s, e) for s, e in merged]
+            )
+
+    def find_gaps(self, symbol, timeframe, since_ms, until_ms):
+        """返回 [since_ms, until_ms] 内尚未同步的区间列表 [(start_ms, end_ms), ...]"""
+        since_ms, until_ms = int(since_ms), int(until_ms)
+        if until_ms < since_ms:
+            return []
+        tf_ms = timeframe_to_ms(timeframe)
+        with self._connect() as conn:
+            intervals = self._get_coverage(conn, symbol, timeframe)
+
+        gaps = []
+        cursor = since_ms
+        for s, e in intervals:
+            if e < cursor:
+                continue
+            if s > until_ms:
+                break
+            # 只有空隙中包含K线开盘时间时才算缺失
+            gap_start = _align_up(cursor, tf_ms)
+            gap_end = min(s - 1, until_ms)
+            if gap_start <= gap_end:
+                gaps.append((gap_start, gap_end))
+            cursor = max(cursor, e + 1)
+            if cursor > until_ms:
+                break
+        gap_start = _align_up(cursor, tf_ms)
+        if gap_start <= until_ms:
+            gaps.append((gap_start, until_ms))
+        return gaps
+
+    # ------------------------------------------------------------------
+    # 同步
+    # ------------------------------------------------------------------
+    def _download(self, exchange, symbol, timeframe, start_ms, end_ms, now_ms):
+        """
+        分页下载 [start_ms, end_ms] 区间，返回 (已收盘K线, 未收盘K线)。
+        只有交易所已返回更晚K线、且按本地时钟已收盘的K线才视为已收盘；
+        出错时返回已下载的部分（已收盘部分从 start_ms 起连续，可以落盘）。
+        """
+        tf_ms = timeframe_to_ms(timeframe)
+        rows = []
+        newest_ts = None
+        cursor = start_ms
+        max_iterations = max(50, int((end_ms - start_ms) // (tf_ms * self.page_limit)) + 10)
+        for attempt in range(1, max_iterations + 1):
+            try:
+                chunk = exchange.fetch_ohlcv(symbol, timeframe=timeframe, since=cursor, limit=self.page_limit)
+            except Exception as e:
+                print(f"⚠️ 获取数据出错 (第{attempt}次): {str(e)[:100]}")
+                break
+            if not chunk:
+                break
+            rows.extend(row for row in chunk if start_ms <= row[0] <= end_ms)
+            last_ts = chunk[-1][0]
+            newest_ts = last_ts if newest_ts is None else max(newest_ts, last_ts)
+            # 越过区间末端（末端K线之后已有更晚的K线）或到达最新K线即停止
+            if last_ts > end_ms or last_ts + tf_ms > now_ms:
+                break
+            cursor = last_ts + 1
+        else:
+            print(f"⚠️ 分页次数达到上限 ({max_iterations})，区间未完整同步")
+
+        closed, live = [], []
+        for row in rows:
+            if row[0] < newest_ts and row[0] + tf_ms <= now_ms:
+                closed.append(row)
+            else:
+                live.append(row)
+        return closed, live
+
+    def sync(self, exchange, symbol, timeframe, since_ms, until_ms):
+        """
+        仅下载本地缺失的区间并落盘。
+        覆盖范围只记录到实际收到的最后一根已收盘K线：交易所暂时没有返回数据的区间（故障、停牌）
+        不会被标记为已同步，下次读取时重新请求。
+
+        Returns:
+            list: 同步过程中顺带获取到的未收盘K线（不落盘）。
+        """
+        tf_ms = timeframe_to_ms(timeframe)
+        now_ms = int(time.time() * 1000)
+        live_rows = []
+        with self._sync_lock:
+            gaps = self.find_gaps(symbol, timeframe, since_ms, until_ms)
+            if gaps:
+                print(f"   本地K线缺失 {len(gaps)} 个区间，从交易所补齐: {symbol} {timeframe}")
+            for start_ms, end_ms in gaps:
+                # 只包含未收盘K线的区间无需同步
+                if min(end_ms, now_ms - tf_ms) < start_ms:
+                    continue
+                closed, live = self._download(exchange, symbol, timeframe, start_ms, end_ms, now_ms)
+                self.save_rows(symbol, timeframe, closed)
+                live_rows.extend(live)
+                if closed:
+                    self.mark_covered(symbol, timeframe, start_ms, max(row[0] for row in closed))
+        return live_rows
+
+    def load(self, exchange, symbol, timeframe, since_ms, until_ms=None):
+        """
+        获取 [since_ms, until_ms] 区间的K线（ccxt列表格式）。
+        已收盘部分来自本地存储（缺失时先同步），区间包含当前未收盘K线时实时获取该根。
+        """
+        tf_ms = timeframe_to_ms(timeframe)
+        now_ms = int(time.time() * 1000)
+        if until_ms is None:
+            until_ms = now_ms
+        since_ms, until_ms = int(since_ms), int(until_ms)
+
+        live_rows = self.sync(exchange, symbol, timeframe, since_ms, until_ms)
+        rows = self.get_rows(symbol, timeframe, since_ms, until_ms)
+
+        # 区间末端落在未收盘K线内且同步时没有取到时，实时获取最新一根
+        live_open = now_ms // tf_ms * tf_ms
+        if not live_rows and until_ms >= live_open and since_ms <= until_ms:
+            try:
+                chunk = exchange.fetch_ohlcv(symbol, timeframe=timeframe, since=max(live_open, since_ms), limit=2)
+                live_rows = [r for r in chunk or [] if r[0] + tf_ms > now_ms]
+            except Exception as e:
+                print(f"⚠️ 获取最新K线失败: {str(e)[:100]}")
+        # 未落盘的K线（最新一根）补入结果
+        if live_rows:
+            stored = {r[0] for r in rows}
+            rows.extend(r for r in live_rows if since_ms <= r[0] <= until_ms and r[0] not in stored)
+            rows.sort(key=lambda r: r[0])
+        return rows
+
+    def load_dataframe(self, exchange, symbol, timeframe, since_ms, until_ms=None):
+        """与 load 相同，返回已转换为上海时区的DataFrame"""
+        rows = self.load(exchange, symbol, timeframe, since_ms, until_ms)
+        if not rows:
+            return pd.DataFrame(columns=OHLCV_COLUMNS)
+        return ohlcv_to_dataframe(rows)
+
+    def load_recent_dataframe(self, exchange, symbol, timeframe, limit):
+        """获取最近 limit 根K线（含当前未收盘K线），与 fetch_ohlcv(limit=...) 的结果一致"""
+        tf_ms = timeframe_to_ms(timeframe)
+        now_ms = int(time.time() * 1000)
+        since_ms = (now_ms // tf_ms - (int(limit) - 1)) * tf_ms
+        df = self.load_dataframe(exchange, symbol, timeframe, since_ms, now_ms)
+        return df.tail(int(limit)).reset_index(drop=True)
+
+
+# 全局K线存储实例
+candle_store = CandleStore()
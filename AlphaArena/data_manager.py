@@ -1,57 +1,314 @@
 import json
+import math
 import os
-from datetime import datetime
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+# 历史记录不再截断；未指定范围时默认返回最近的条数（与旧版本的保留上限一致）
+TRADE_HISTORY_LIMIT = 100
+AI_ANALYSIS_LIMIT = 50
+
+RECORD_TABLES = ('trades', 'ai_analysis')
+
+# 读缓存最多保留的查询结果数
+READ_CACHE_SIZE = 128
+
+
+def _new_aggregate():
+    """单个维度（整体或某个策略版本）的增量绩效统计"""
+    return {
+        "closed_trades": 0,
+        "winning_trades": 0,
+        "losing_trades": 0,
+        "win_rate": 0.0,
+        "equity": 0.0,
+        "peak_equity": 0.0,
+        "max_drawdown": 0.0,
+        "current_drawdown": 0.0,
+        "current_streak": 0,
+        "max_win_streak": 0,
+        "max_loss_streak": 0,
+        "best_trade": None,
+        "worst_trade": None,
+        "pnl_mean": 0.0,
+        "pnl_m2": 0.0,
+        "pnl_std": 0.0,
+        "sharpe": 0.0
+    }
+
+
+def _update_aggregate(agg, pnl):
+    """
+    O(1) 更新一笔已实现盈亏：
+    - 累计权益、历史峰值与最大回撤
+    - 连胜/连亏（current_streak 正数为连胜，负数为连亏）
+    - Welford 算法维护每笔盈亏的均值与方差，sharpe 为每笔交易的 均值/标准差（未年化）
+    """
+    n = agg["closed_trades"] + 1
+    agg["closed_trades"] = n
+    if pnl > 0:
+        agg["winning_trades"] += 1
+        agg["current_streak"] = agg["current_streak"] + 1 if agg["current_streak"] > 0 else 1
+        agg["max_win_streak"] = max(agg["max_win_streak"], agg["current_streak"])
+    elif pnl < 0:
+        agg["losing_trades"] += 1
+        agg["current_streak"] = agg["current_streak"] - 1 if agg["current_streak"] < 0 else -1
+        agg["max_loss_streak"] = max(agg["max_loss_streak"], -agg["current_streak"])
+    else:
+        agg["current_streak"] = 0
+    agg["win_rate"] = round(agg["winning_trades"] / n * 100, 2)
+
+    agg["equity"] += pnl
+    agg["peak_equity"] = max(agg["peak_equity"], agg["equity"])
+    agg["current_drawdown"] = agg["peak_equity"] - agg["equity"]
+    agg["max_drawdown"] = max(agg["max_drawdown"], agg["current_drawdown"])
+    agg["best_trade"] = pnl if agg["best_trade"] is None else max(agg["best_trade"], pnl)
+    agg["worst_trade"] = pnl if agg["worst_trade"] is None else min(agg["worst_trade"], pnl)
+
+    delta = pnl - agg["pnl_mean"]
+    agg["pnl_mean"] += delta / n
+    agg["pnl_m2"] += delta * (pnl - agg["pnl_mean"])
+    agg["pnl_std"] = math.sqrt(agg["pnl_m2"] / (n - 1)) if n > 1 else 0.0
+    agg["sharpe"] = round(agg["pnl_mean"] / agg["pnl_std"], 4) if agg["pnl_std"] > 0 else 0.0
+
+
+def _normalize_ts(value):
+    """
+    统一时间戳格式为 'YYYY-MM-DD HH:MM:SS[.ffffff]'，保证字符串比较与时间先后一致。
+    缺少时间戳时为空字符串（排在所有时间之前），使分页游标可以往返。
+    """
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return str(value).strip().replace('T', ' ')
+
+
+def _parse_cursor(cursor):
+    """解析分页游标 '时间戳|id'，格式无效时抛出 ValueError"""
+    cursor_ts, sep, cursor_id = str(cursor).rpartition('|')
+    if not sep or not cursor_id.isdigit():
+        raise ValueError(f"无效的分页游标: {cursor}")
+    return cursor_ts, int(cursor_id)
+
 
 class DataManager:
+    """
+    数据管理器（SQLite WAL 存储）。
+
+    - trades / ai_analysis 表：只追加写入，保留全部历史，每条记录一次 INSERT；
+      按 timestamp、(strategy_version, timestamp)、(signal, timestamp) 建索引，支持范围查询
+    - state 表：系统状态、绩效等小型文档（键值形式）
+    每次写入都是单个事务，交易机器人和Web服务两个进程可以同时读写。
+    首次运行时自动导入旧版本的 JSON 文件。
+
+    读取结果缓存在内存中，以数据库及WAL文件的 (inode, mtime, size) 作为版本：
+    其他进程写入后文件状态变化，缓存随之失效；本实例写入时直接通知缓存失效。
+    缓存返回的是共享对象，调用方不应修改。
+    """
+
     def __init__(self):
         self.data_dir = "data"
+        self.db_file = os.path.join(self.data_dir, "alphaarena.sqlite3")
+        # 旧版本的JSON文件（仅用于首次迁移）
         self.system_file = os.path.join(self.data_dir, "system_status.json")
         self.trades_file = os.path.join(self.data_dir, "trades.json")
         self.performance_file = os.path.join(self.data_dir, "performance.json")
         self.ai_analysis_file = os.path.join(self.data_dir, "ai_analysis_history.json")
-        
+
         # 确保数据目录存在
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
-        
-        # 初始化数据文件
-        self._init_files()
-    
-    def _init_files(self):
-        """初始化数据文件"""
-        if not os.path.exists(self.system_file):
-            self._save_json(self.system_file, {
+
+        # 读缓存
+        self._cache = {}
+        self._cache_signature = None
+        self._cache_lock = threading.Lock()
+        self._write_version = 0
+
+        # 初始化数据库
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_db(self):
+        """初始化数据表，并导入旧版本的JSON数据"""
+        with self._connect() as conn:
+            for table in RECORD_TABLES:
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        timestamp TEXT,
+                        strategy_version TEXT,
+                        signal TEXT,
+                        record TEXT NOT NULL
+                    )
+                """)
+                self._upgrade_record_table(conn, table)
+                conn.execute(f"UPDATE {table} SET timestamp = '' WHERE timestamp IS NULL")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_timestamp ON {table} (timestamp)")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_strategy ON {table} (strategy_version, timestamp)")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_signal ON {table} (signal, timestamp)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+            """)
+
+            # 系统状态、绩效的初始值
+            conn.execute("INSERT OR IGNORE INTO state (key, value) VALUES (?, ?)", ('system_status', json.dumps({
                 "status": "stopped",
                 "last_update": datetime.now().isoformat(),
                 "account_info": {},
                 "btc_info": {},
                 "position": {},
                 "ai_signal": {}
-            })
-        
-        if not os.path.exists(self.trades_file):
-            self._save_json(self.trades_file, [])
-        
-        if not os.path.exists(self.performance_file):
-            self._save_json(self.performance_file, {
+            }, ensure_ascii=False)))
+            conn.execute("INSERT OR IGNORE INTO state (key, value) VALUES (?, ?)", ('performance', json.dumps({
                 "total_trades": 0,
                 "winning_trades": 0,
                 "total_pnl": 0,
                 "daily_pnl": {},
                 "monthly_pnl": {}
-            })
-        
-        if not os.path.exists(self.ai_analysis_file):
-            self._save_json(self.ai_analysis_file, [])
-    
-    def _save_json(self, filepath, data):
-        """保存JSON数据"""
+            }, ensure_ascii=False)))
+
+        self._migrate_json_files()
+        self._backfill_aggregates()
+
+    @staticmethod
+    def _upgrade_record_table(conn, table):
+        """为早期版本的表补充索引列，并由记录内容回填"""
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if 'strategy_version' in columns and 'signal' in columns:
+            return
+        for column in ('strategy_version', 'signal'):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+        rows = conn.execute(f"SELECT id, record FROM {table}").fetchall()
+        updates = []
+        for record_id, record in rows:
+            data = json.loads(record)
+            updates.append((_normalize_ts(data.get('timestamp')), data.get('strategy_version'), data.get('signal'), record_id))
+        conn.executemany(f"UPDATE {table} SET timestamp = ?, strategy_version = ?, signal = ? WHERE id = ?", updates)
+
+    @staticmethod
+    def _insert_record(conn, table, record):
+        """追加一条记录（索引列取自记录内容）"""
+        conn.execute(
+            f"INSERT INTO {table} (timestamp, strategy_version, signal, record) VALUES (?, ?, ?, ?)",
+            (_normalize_ts(record.get('timestamp')), record.get('strategy_version'), record.get('signal'),
+             json.dumps(record, ensure_ascii=False))
+        )
+
+    def _migrate_json_files(self):
+        """将旧版本的JSON文件导入数据库（每个文件只导入一次，原文件保留）"""
+        migrations = [
+            ('system_status', self.system_file),
+            ('performance', self.performance_file),
+            ('trades', self.trades_file),
+            ('ai_analysis', self.ai_analysis_file),
+        ]
+        for name, filepath in migrations:
+            if not os.path.exists(filepath):
+                continue
+            try:
+                with self._connect() as conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    flag = f"migrated:{name}"
+                    if conn.execute("SELECT 1 FROM state WHERE key = ?", (flag,)).fetchone():
+                        continue
+                    data = self._load_json(filepath)
+                    if name in RECORD_TABLES:
+                        if isinstance(data, list):
+                            for record in data:
+                                if isinstance(record, dict):
+                                    self._insert_record(conn, name, record)
+                    elif data:
+                        self._put_state(conn, name, data)
+                    conn.execute("INSERT INTO state (key, value) VALUES (?, ?)", (flag, datetime.now().isoformat()))
+                print(f"📦 已导入旧数据文件: {filepath}")
+            except Exception as e:
+                print(f"导入旧数据失败 {filepath}: {e}")
+
+    # ------------------------------------------------------------------
+    # 读缓存
+    # ------------------------------------------------------------------
+    def _storage_signature(self):
+        """存储版本：本实例写入次数 + 数据库与WAL文件的 (inode, mtime, size)"""
+        signature = [self._write_version]
+        for path in (self.db_file, self.db_file + '-wal'):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _notify_write(self):
+        """本实例写入后立即使读缓存失效（不依赖文件时间精度）"""
+        with self._cache_lock:
+            self._write_version += 1
+
+    def _cached_read(self, key, load, default):
+        """
+        读穿缓存：存储版本未变化时直接返回内存中的结果，否则执行 load(conn) 并缓存。
+        读取失败时返回 default（不缓存）。
+        """
+        signature = self._storage_signature()
+        with self._cache_lock:
+            if signature != self._cache_signature:
+                self._cache.clear()
+                self._cache_signature = signature
+            elif key in self._cache:
+                return self._cache[key]
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with self._connect() as conn:
+                value = load(conn)
         except Exception as e:
-            print(f"保存数据失败 {filepath}: {e}")
-    
+            print(f"读取数据失败 {key[1]}: {e}")
+            return default
+        with self._cache_lock:
+            if self._cache_signature == signature:
+                if len(self._cache) >= READ_CACHE_SIZE:
+                    self._cache.pop(next(iter(self._cache)))
+                self._cache[key] = value
+        return value
+
+    def _backfill_aggregates(self):
+        """早期版本的绩效数据没有增量统计时，由已有交易记录一次性补算"""
+        try:
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT value FROM state WHERE key = 'performance'").fetchone()
+                performance = json.loads(row[0]) if row else {}
+                if "aggregates" in performance:
+                    return
+                performance["aggregates"] = _new_aggregate()
+                performance["by_strategy"] = {}
+                for (record,) in conn.execute("SELECT record FROM trades ORDER BY id"):
+                    self._apply_aggregates(performance, json.loads(record))
+                self._put_state(conn, 'performance', performance)
+        except Exception as e:
+            print(f"补算绩效统计失败: {e}")
+
+    @staticmethod
+    def _apply_aggregates(performance, trade_record):
+        """将一笔已实现盈亏计入整体及对应策略版本的增量统计（开仓等无盈亏记录不计入）"""
+        pnl = trade_record.get("pnl")
+        if pnl is None:
+            return
+        aggregates = performance.setdefault("aggregates", _new_aggregate())
+        _update_aggregate(aggregates, pnl)
+        version = trade_record.get("strategy_version") or "unknown"
+        by_strategy = performance.setdefault("by_strategy", {})
+        _update_aggregate(by_strategy.setdefault(version, _new_aggregate()), pnl)
+
     def _load_json(self, filepath):
         """加载JSON数据"""
         try:
@@ -59,7 +316,117 @@ class DataManager:
                 return json.load(f)
         except:
             return {}
-    
+
+    # ------------------------------------------------------------------
+    # 键值文档
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _put_state(conn, key, value):
+        conn.execute(
+            "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+            (key, json.dumps(value, ensure_ascii=False))
+        )
+
+    def _get_state(self, key):
+        def load(conn):
+            row = conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+            return json.loads(row[0]) if row else {}
+        return self._cached_read(('state', key), load, {})
+
+    # ------------------------------------------------------------------
+    # 追加记录
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _build_filters(since=None, until=None, strategy_version=None, signal=None):
+        """生成过滤条件 (where子句列表, 参数列表)"""
+        where, params = [], []
+        if since is not None:
+            where.append("timestamp >= ?")
+            params.append(_normalize_ts(since))
+        if until is not None:
+            where.append("timestamp <= ?")
+            params.append(_normalize_ts(until))
+        if strategy_version is not None:
+            where.append("strategy_version = ?")
+            params.append(strategy_version)
+        if signal is not None:
+            where.append("signal = ?")
+            params.append(signal)
+        return where, params
+
+    def _query_records(self, table, since=None, until=None, strategy_version=None, signal=None, limit=None):
+        """
+        范围查询历史记录（时间正序）。
+        Args:
+            since / until: 时间范围（闭区间，字符串或datetime）
+            strategy_version / signal: 精确匹配过滤
+            limit: 只返回范围内最新的 limit 条，None 表示全部
+        """
+        where, params = self._build_filters(since, until, strategy_version, signal)
+        sql = f"SELECT record FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if limit is not None:
+            # 倒序取最新的 limit 条，再翻转为正序
+            sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+            params.append(int(limit))
+        else:
+            sql += " ORDER BY timestamp, id"
+        def load(conn):
+            rows = conn.execute(sql, params).fetchall()
+            if limit is not None:
+                rows.reverse()
+            return [json.loads(row[0]) for row in rows]
+        return self._cached_read(('query', table, sql, tuple(params)), load, [])
+
+    def _page_records(self, table, page_size, page=1, cursor=None, **filters):
+        """
+        倒序（最新在前）分页读取，直接利用 (timestamp, id) 索引，无需读取和排序全部记录。
+        Args:
+            page_size: 每页条数
+            page: 页码（从1开始），使用 OFFSET 定位，适合前几页
+            cursor: 上一页返回的 next_cursor；指定时忽略 page，按键集定位，深翻页同样高效；
+                格式无效时抛出 ValueError
+            **filters: since / until / strategy_version / signal
+        Returns:
+            tuple: (记录列表, 下一页游标；没有更多数据时为 None)
+        """
+        where, params = self._build_filters(**filters)
+        offset = 0
+        if cursor:
+            cursor_ts, cursor_id = _parse_cursor(cursor)
+            where.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+            params.extend([cursor_ts, cursor_ts, cursor_id])
+        else:
+            offset = max(int(page) - 1, 0) * int(page_size)
+        sql = f"SELECT id, timestamp, record FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        # 多取一条用于判断是否还有下一页
+        sql += " ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?"
+        params.extend([int(page_size) + 1, offset])
+        def load(conn):
+            rows = conn.execute(sql, params).fetchall()
+            has_more = len(rows) > page_size
+            rows = rows[:page_size]
+            next_cursor = f"{rows[-1][1]}|{rows[-1][0]}" if has_more and rows else None
+            return [json.loads(row[2]) for row in rows], next_cursor
+        return self._cached_read(('page', table, sql, tuple(params)), load, ([], None))
+
+    def _count_records(self, table, **filters):
+        """统计满足过滤条件的记录数"""
+        where, params = self._build_filters(**filters)
+        sql = f"SELECT COUNT(*) FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return self._cached_read(('count', table, sql, tuple(params)),
+                                 lambda conn: conn.execute(sql, params).fetchone()[0], 0)
+
+    def get_trades_version(self):
+        """交易记录版本号（最新记录ID），用于判断交易记录是否有更新"""
+        return self._cached_read(('version', 'trades'),
+                                 lambda conn: conn.execute("SELECT MAX(id) FROM trades").fetchone()[0] or 0, None)
+
     def update_system_status(self, status, account_info=None, btc_info=None, position=None, ai_signal=None):
         """更新系统状态"""
         data = {
@@ -70,86 +437,159 @@ class DataManager:
             "position": position or {},
             "ai_signal": ai_signal or {}
         }
-        self._save_json(self.system_file, data)
-    
+        try:
+            with self._connect() as conn:
+                self._put_state(conn, 'system_status', data)
+            self._notify_write()
+        except Exception as e:
+            print(f"保存数据失败 system_status: {e}")
+
     def save_trade_record(self, trade_record):
-        """保存交易记录"""
-        trades = self._load_json(self.trades_file)
-        if not isinstance(trades, list):
-            trades = []
-        
-        # 添加交易记录
-        trades.append(trade_record)
-        
-        # 只保留最近100条记录
-        if len(trades) > 100:
-            trades = trades[-100:]
-        
-        self._save_json(self.trades_file, trades)
-        
-        # 更新绩效数据
-        self._update_performance(trade_record)
-    
-    def _update_performance(self, trade_record):
+        """保存交易记录（追加一条记录，并在同一事务中更新绩效数据）"""
+        try:
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                self._insert_record(conn, 'trades', trade_record)
+                # 更新绩效数据
+                self._update_performance(conn, trade_record)
+            self._notify_write()
+        except Exception as e:
+            print(f"保存数据失败 trades: {e}")
+
+    def _update_performance(self, conn, trade_record):
         """更新绩效数据"""
-        performance = self._load_json(self.performance_file)
-        
+        row = conn.execute("SELECT value FROM state WHERE key = 'performance'").fetchone()
+        performance = json.loads(row[0]) if row else {}
+
         # 更新基础统计
         performance["total_trades"] = performance.get("total_trades", 0) + 1
-        
-        pnl = trade_record.get("pnl", 0)
+
+        pnl = trade_record.get("pnl") or 0
         if pnl > 0:
             performance["winning_trades"] = performance.get("winning_trades", 0) + 1
-        
+
         performance["total_pnl"] = performance.get("total_pnl", 0) + pnl
-        
+
         # 更新每日绩效
         today = datetime.now().strftime("%Y-%m-%d")
         daily_pnl = performance.get("daily_pnl", {})
         daily_pnl[today] = daily_pnl.get(today, 0) + pnl
         performance["daily_pnl"] = daily_pnl
-        
+
         # 更新月度绩效
         month = datetime.now().strftime("%Y-%m")
         monthly_pnl = performance.get("monthly_pnl", {})
         monthly_pnl[month] = monthly_pnl.get(month, 0) + pnl
         performance["monthly_pnl"] = monthly_pnl
-        
-        self._save_json(self.performance_file, performance)
-    
+
+        # 权益、回撤、连胜连亏、夏普等增量统计（整体及按策略版本）
+        self._apply_aggregates(performance, trade_record)
+
+        self._put_state(conn, 'performance', performance)
+
+    def request_strategy_reload(self):
+        """请求交易进程在下一次执行时重新加载实时策略（跨进程，通过 state 表传递）"""
+        requested_at = datetime.now().isoformat()
+        try:
+            with self._connect() as conn:
+                self._put_state(conn, 'strategy_reload', {'requested_at': requested_at})
+            self._notify_write()
+        except Exception as e:
+            print(f"保存数据失败 strategy_reload: {e}")
+            return None
+        return requested_at
+
+    def get_strategy_reload_request(self):
+        """最近一次策略重新加载请求的时间（没有请求时为 None）"""
+        return self._get_state('strategy_reload').get('requested_at')
+
+    def save_runtime_metrics(self, snapshot):
+        """保存交易进程的接口调用指标快照（metrics.MetricsRegistry.snapshot()）"""
+        try:
+            with self._connect() as conn:
+                self._put_state(conn, 'runtime_metrics', snapshot)
+            self._notify_write()
+        except Exception as e:
+            print(f"保存数据失败 runtime_metrics: {e}")
+
+    def get_runtime_metrics(self):
+        """获取交易进程最近一次发布的接口调用指标快照"""
+        return self._get_state('runtime_metrics')
+
+    def save_tick_timings(self, ticks):
+        """保存交易进程最近若干周期的分阶段耗时（metrics.StageTimings.snapshot()）"""
+        try:
+            with self._connect() as conn:
+                self._put_state(conn, 'tick_timings', {'ticks': ticks})
+            self._notify_write()
+        except Exception as e:
+            print(f"保存数据失败 tick_timings: {e}")
+
+    def get_tick_timings(self):
+        """获取交易进程最近若干周期的分阶段耗时列表（时间正序）"""
+        return self._get_state('tick_timings').get('ticks', [])
+
     def get_system_status(self):
         """获取系统状态"""
-        return self._load_json(self.system_file)
-    
-    def get_trade_history(self):
-        """获取交易历史"""
-        return self._load_json(self.trades_file)
-    
+        return self._get_state('system_status')
+
+    def get_trade_history(self, since=None, until=None, strategy_version=None, signal=None, limit=TRADE_HISTORY_LIMIT):
+        """获取交易历史（时间正序）。默认返回最近100条，可按时间范围、策略版本、信号过滤，limit=None 返回范围内全部"""
+        return self._query_records('trades', since, until, strategy_version, signal, limit)
+
+    def get_latest_trades(self, limit=5):
+        """获取最近 limit 条交易记录（最新在前）"""
+        return self._page_records('trades', limit)[0]
+
+    def get_trades_page(self, page_size=20, page=1, cursor=None, **filters):
+        """交易记录倒序分页，返回 (记录列表, 下一页游标)"""
+        return self._page_records('trades', page_size, page, cursor, **filters)
+
+    def count_trades(self, **filters):
+        """统计交易记录数（可选 since/until/strategy_version/signal 过滤）"""
+        return self._count_records('trades', **filters)
+
     def get_performance(self):
-        """获取绩效数据"""
-        return self._load_json(self.performance_file)
-    
+        """获取绩效数据（含增量统计 aggregates / by_strategy，以及由每日盈亏得到的近7天、30天滚动盈亏）"""
+        performance = self._get_state('performance')
+        if not performance:
+            return performance
+        daily_pnl = performance.get("daily_pnl", {})
+        today = datetime.now().date()
+        rolling = {}
+        for days in (7, 30):
+            rolling[f"{days}d"] = sum(
+                daily_pnl.get((today - timedelta(days=i)).strftime("%Y-%m-%d"), 0) for i in range(days)
+            )
+        return dict(performance, rolling_pnl=rolling)
+
     def save_ai_analysis_record(self, analysis_record):
         """保存AI分析记录"""
-        analysis_history = self._load_json(self.ai_analysis_file)
-        if not isinstance(analysis_history, list):
-            analysis_history = []
-        
         # 添加时间戳
         analysis_record['timestamp'] = datetime.now().isoformat()
-        
-        # 添加分析记录
-        analysis_history.append(analysis_record)
-        
-        # 只保留最近50条记录
-        if len(analysis_history) > 50:
-            analysis_history = analysis_history[-50:]
-        
-        self._save_json(self.ai_analysis_file, analysis_history)
-    
-    def get_ai_analysis_history(self):
-        """获取AI分析历史记录"""
-        return self._load_json(self.ai_analysis_file)
+
+        try:
+            with self._connect() as conn:
+                self._insert_record(conn, 'ai_analysis', analysis_record)
+            self._notify_write()
+        except Exception as e:
+            print(f"保存数据失败 ai_analysis: {e}")
+
+    def get_ai_analysis_history(self, since=None, until=None, strategy_version=None, signal=None, limit=AI_ANALYSIS_LIMIT):
+        """获取AI分析历史记录（时间正序）。默认返回最近50条，过滤参数同 get_trade_history"""
+        return self._query_records('ai_analysis', since, until, strategy_version, signal, limit)
+
+    def get_latest_ai_analysis(self, limit=5):
+        """获取最近 limit 条AI分析记录（最新在前）"""
+        return self._page_records('ai_analysis', limit)[0]
+
+    def get_ai_analysis_page(self, page_size=10, page=1, cursor=None, **filters):
+        """AI分析记录倒序分页，返回 (记录列表, 下一页游标)"""
+        return self._page_records('ai_analysis', page_size, page, cursor, **filters)
+
+    def count_ai_analysis(self, **filters):
+        """统计AI分析记录数（可选 since/until/strategy_version/signal 过滤）"""
+        return self._count_records('ai_analysis', **filters)
 
 # 全局数据管理器实例
 data_manager = DataManager()
@@ -162,4 +602,4 @@ def save_trade_record(trade_record):
     data_manager.save_trade_record(trade_record)
 
 def save_ai_analysis_record(analysis_record):
-    data_manager.save_ai_analysis_record(analysis_record)
\ No newline at end of file
+    data_manager.save_ai_analysis_record(analysis_record)
@@ -1,6 +1,7 @@
 import os
 import time
-import schedule
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
 import ccxt
 import pandas as pd
@@ -16,16 +17,20 @@ from market_data import (
 from technical_analysis import (
     calculate_technical_indicators, get_support_resistance_levels,
     get_market_trend, generate_technical_analysis_text,
-    get_sentiment_indicators, calculate_integrated_trading_score
+    get_sentiment_indicators, calculate_integrated_trading_score, sentiment_cache
 )
-from strategy_decision import StrategyInterface
-from trade_executor import execute_trade, calculate_position_size
+from indicator_engine import IncrementalIndicatorEngine
+from candle_scheduler import CandleCloseScheduler
+from metrics import InstrumentedExchange, InstrumentedClient, metrics_registry, stage_timings
+from strategy_decision import StrategyInterface, LiveStrategy
+from trade_executor import execute_trade, calculate_position_size, POSITION_NOT_FETCHED
+
+STRATEGY_CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'strategy_config.json')
 
 def load_strategy_config():
     """从配置文件加载策略配置"""
     try:
-        config_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'strategy_config.json')
-        with open(config_path, 'r', encoding='utf-8') as f:
+        with open(STRATEGY_CONFIG_PATH, 'r', encoding='utf-8') as f:
             config = json.load(f)
         return config
     except Exception as e:
@@ -69,26 +74,32 @@ load_dotenv()
 # 初始化数据管理器
 data_manager = DataManager()
 
-# 创建 DeepSeek AI 客户端
-deepseek_client = OpenAI(
+# 创建 DeepSeek AI 客户端（chat.completions.create 调用计入监控指标）
+deepseek_client = InstrumentedClient(OpenAI(
     api_key=os.getenv('DEEPSEEK_API_KEY'),
     base_url="https://api.deepseek.com"
-)
+))
 
 # 初始加载策略配置（仅用于启动时输出信息）
 initial_config = load_strategy_config()
 initial_version = initial_config.get('live_trading', {}).get('version', 'strategy_decision_v2')
 print(f"🎯 启动时策略版本: {initial_version}")
 
-# 初始化OKX交易所
-exchange = ccxt.okx({
+# 长期复用的实时策略实例：配置文件修改时间变化或收到重新加载请求时才重建
+live_strategy = LiveStrategy(
+    deepseek_client, load_strategy_config, STRATEGY_CONFIG_PATH,
+    reload_token_func=data_manager.get_strategy_reload_request
+)
+
+# 初始化OKX交易所（REST调用计入监控指标：延迟、错误、限频）
+exchange = InstrumentedExchange(ccxt.okx({
     'options': {
         'defaultType': 'swap',  # OKX使用swap表示永续合约
     },
     'apiKey': os.getenv('OKX_API_KEY'),
     'secret': os.getenv('OKX_SECRET'),
     'password': os.getenv('OKX_PASSWORD'),  # OKX需要交易密码
-})
+}))
 
 # 交易参数配置 - 结合两个版本的优点
 TRADE_CONFIG = {
@@ -97,6 +108,9 @@ TRADE_CONFIG = {
     'timeframe': '15m',  # 使用15分钟K线
     'test_mode': False,  # 测试模式
     'data_points': 96,  # 24小时数据（96根15分钟K线）
+    'candle_settle_seconds': 3,  # K线收盘后等待秒数再执行策略
+    'flip_mode': 'netted',  # 反向开仓方式: netted 单笔净额订单 / sequential 先平后开（均按订单状态确认成交）
+    'fill_timeout': 5,  # 等待订单成交确认的最长秒数
     'analysis_periods': {
         'short_term': 20,  # 短期均线
         'medium_term': 50,  # 中期均线
@@ -118,6 +132,18 @@ TRADE_CONFIG = {
 # 全局变量存储历史数据
 signal_history = []
 
+# 增量技术指标引擎：首次执行时批量冷启动，之后每根新收盘K线 O(1) 更新
+indicator_engine = IncrementalIndicatorEngine()
+
+# 最近一次已分析的收盘K线（开盘时间），用于跳过没有新收盘K线的执行
+last_closed_candle = None
+
+# 决策延迟记录（秒）：从K线收盘到下单/决策完成
+decision_latencies = deque(maxlen=500)
+
+# 每轮数据采集阶段的并发线程池（余额 / 持仓）
+snapshot_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='tick-fetch')
+
 
 def setup_exchange():
     """设置交易所参数并验证连接"""
@@ -169,9 +195,45 @@ def setup_exchange():
         return False
 
 
-def execute_intelligent_trade(signal_data, price_data):
-    """执行智能交易 - 调用独立交易执行模块"""
-    result = execute_trade(exchange, TRADE_CONFIG, signal_data, price_data)
+def fetch_account_info():
+    """获取账户余额信息，失败返回 None"""
+    try:
+        balance = exchange.fetch_balance()
+        return {
+            'balance': float(balance['USDT'].get('free', 0)),
+            'equity': float(balance['USDT'].get('total', 0)),
+            'leverage': TRADE_CONFIG['leverage']
+        }
+    except Exception as e:
+        print(f"获取账户信息失败: {e}")
+        return None
+
+
+def fetch_price_data():
+    """获取增强K线（含技术指标、支撑阻力与趋势），用于判断是否有新收盘K线"""
+    return stage_timings.timed('data_fetch', get_btc_ohlcv_enhanced)(
+        exchange, TRADE_CONFIG, indicator_engine.calculate, get_support_resistance_levels, get_market_trend
+    )
+
+
+def fetch_account_snapshot():
+    """
+    并发获取账户余额与当前持仓。
+    只在确认有新收盘K线后调用，调度重试（没有新K线）时不产生多余的REST请求；
+    两个请求互不依赖，并发执行后本阶段耗时约等于较慢的单个请求。
+    返回的持仓快照会传给交易执行模块复用，避免下单前再次查询持仓。
+    """
+    balance_future = snapshot_executor.submit(stage_timings.timed('account', fetch_account_info))
+    position_future = snapshot_executor.submit(stage_timings.timed('position', get_current_position), exchange, TRADE_CONFIG)
+    return {
+        'account_info': balance_future.result(),
+        'current_position': position_future.result(),
+    }
+
+
+def execute_intelligent_trade(signal_data, price_data, current_position=POSITION_NOT_FETCHED):
+    """执行智能交易 - 调用独立交易执行模块（传入本轮持仓快照时不再重复查询持仓）"""
+    result = execute_trade(exchange, TRADE_CONFIG, signal_data, price_data, current_position=current_position)
     
     if result['success']:
         print(f"✅ {result['message']}")
@@ -182,36 +244,40 @@ def execute_intelligent_trade(signal_data, price_data):
 
 
 def trading_bot():
-    """主交易机器人函数"""
+    """
+    主交易机器人函数。
+    Returns:
+        True 执行完成，False 获取数据失败，None 没有新收盘的K线（已跳过）
+    """
+    global last_closed_candle
 
     print("\n" + "=" * 60)
     print(f"执行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 60)
 
-    # 1. 获取增强版K线数据
-    price_data = get_btc_ohlcv_enhanced(exchange, TRADE_CONFIG, calculate_technical_indicators, get_support_resistance_levels, get_market_trend)
+    # 1. 获取K线数据（先判断是否有新收盘K线，再查询账户与持仓）
+    price_data = fetch_price_data()
     if not price_data:
         print("❌ 获取K线数据失败，跳过本次执行")
         return False
 
+    # 最后一根为当前未收盘K线，倒数第二根为最近收盘的K线
+    full_data = price_data['full_data']
+    closed_candle = full_data['timestamp'].iloc[-2] if len(full_data) >= 2 else None
+    if closed_candle is not None and last_closed_candle is not None and closed_candle <= last_closed_candle:
+        print(f"⏭️ 没有新收盘的K线（最近收盘: {closed_candle}），跳过本次执行")
+        return None
+    # 收盘时刻 = 当前K线开盘时间（K线时间为上海时区）
+    candle_close_epoch = pd.Timestamp(full_data['timestamp'].iloc[-1]).tz_localize('Asia/Shanghai').timestamp()
+
     print(f"BTC当前价格: ${price_data['price']:,.2f}")
-    print(f"数据周期: {TRADE_CONFIG['timeframe']} (每1分钟执行策略)")
+    print(f"数据周期: {TRADE_CONFIG['timeframe']} (每根K线收盘后执行策略)")
     print(f"价格变化: {price_data['price_change']:+.2f}%")
 
-    # 2. 获取账户信息
-    try:
-        balance = exchange.fetch_balance()
-        account_info = {
-            'balance': float(balance['USDT'].get('free', 0)),
-            'equity': float(balance['USDT'].get('total', 0)),
-            'leverage': TRADE_CONFIG['leverage']
-        }
-    except Exception as e:
-        print(f"获取账户信息失败: {e}")
-        account_info = None
-
-    # 3. 获取当前持仓
-    current_position = get_current_position(exchange, TRADE_CONFIG)
+    # 2-3. 并发获取账户余额与持仓快照
+    snapshot = fetch_account_snapshot()
+    account_info = snapshot['account_info']
+    current_position = snapshot['current_position']
     position_info = None
     if current_position:
         position_info = {
@@ -221,20 +287,20 @@ def trading_bot():
             'unrealized_pnl': current_position['unrealized_pnl']
         }
 
-    # 4. 每次都重新加载策略配置，支持动态切换
-    strategy_config = load_strategy_config()
-    strategy_version = strategy_config.get('live_trading', {}).get('version', 'strategy_decision_v2')
-    print(f"🔄 使用策略版本: {strategy_version}")
-    
-    # 使用当前配置的策略版本创建策略接口
-    strategy_interface = StrategyInterface(deepseek_client, strategy_version=strategy_version)
+    # 4. 复用长期策略实例，配置变化或收到重新加载请求时自动重建，支持动态切换
+    with stage_timings.stage('strategy_load'):
+        strategy_interface = live_strategy.get()
+    print(f"🔄 使用策略版本: {strategy_interface.strategy_version}")
     
     # 使用策略接口进行市场分析（带重试）
-    signal_data = strategy_interface.analyze_market_strategy(
-        price_data, signal_history
-    )
+    with stage_timings.stage('analysis'):
+        signal_data = strategy_interface.analyze_market_strategy(
+            price_data, signal_history
+        )
 
     if signal_data:
+        # 本根收盘K线已完成分析，下一次执行需等待新的收盘K线
+        last_closed_candle = closed_candle
         print(f"🎯 AI交易信号: {signal_data['signal']} (信心: {signal_data['confidence']})")
         print(f"📝 分析原因: {signal_data['reason']}")
         
@@ -244,59 +310,88 @@ def trading_bot():
             signal_history.pop(0)
 
         # 5. 执行交易
+        decided_at = time.time()
         if signal_data['signal'] != 'HOLD':
-            execute_intelligent_trade(signal_data, price_data)
+            with stage_timings.stage('execution'):
+                trade_result = execute_intelligent_trade(signal_data, price_data, current_position)
+            # 下单时刻由交易执行模块记录，不含等待成交确认的时间
+            decided_at = trade_result.get('order_sent_at') or decided_at
         else:
             print("💤 保持观望")
 
+        # 决策延迟：从K线收盘到发出订单（或决定观望）
+        latency = decided_at - candle_close_epoch
+        decision_latencies.append(latency)
+        print(f"⏱️ 决策延迟: 收盘后 {latency:.2f}s {'下单' if signal_data['signal'] != 'HOLD' else '完成决策'}")
+
         # 6. 保存AI分析记录
-        try:
-            analysis_record = {
-                'signal': signal_data['signal'],
-                'confidence': signal_data['confidence'],
-                'reason': signal_data['reason'],
-                'stop_loss': signal_data.get('stop_loss', 0),
-                'take_profit': signal_data.get('take_profit', 0),
-                'btc_price': price_data['price'],
-                'price_change': price_data['price_change'],
-                'has_position': current_position is not None,
-                'position_side': current_position['side'] if current_position else None,
-                'position_size': current_position['size'] if current_position else 0
-            }
-            save_ai_analysis_record(analysis_record)
-            print("✅ AI分析记录已保存")
-        except Exception as e:
-            print(f"保存AI分析记录失败: {e}")
+        with stage_timings.stage('persistence'):
+            try:
+                analysis_record = {
+                    'signal': signal_data['signal'],
+                    'confidence': signal_data['confidence'],
+                    'reason': signal_data['reason'],
+                    'strategy_version': signal_data.get('strategy_version'),
+                    'stop_loss': signal_data.get('stop_loss', 0),
+                    'take_profit': signal_data.get('take_profit', 0),
+                    'btc_price': price_data['price'],
+                    'price_change': price_data['price_change'],
+                    'has_position': current_position is not None,
+                    'position_side': current_position['side'] if current_position else None,
+                    'position_size': current_position['size'] if current_position else 0
+                }
+                save_ai_analysis_record(analysis_record)
+                print("✅ AI分析记录已保存")
+            except Exception as e:
+                print(f"保存AI分析记录失败: {e}")
 
     # 7. 更新系统状态到Web界面
-    try:
-        # 构造符合 data_manager.py 期望的数据结构
-        btc_info_data = {
-            'price': price_data['price'],
-            'change': price_data['price_change']
-        }
+    with stage_timings.stage('persistence'):
+        try:
+            # 构造符合 data_manager.py 期望的数据结构
+            btc_info_data = {
+                'price': price_data['price'],
+                'change': price_data['price_change']
+            }
         
-        ai_signal_data = {
-            'signal': signal_data['signal'] if signal_data else 'NONE',
-            'confidence': signal_data['confidence'] if signal_data else 'NONE',
-            'reason': signal_data.get('reason', '') if signal_data else ''
-        }
+            ai_signal_data = {
+                'signal': signal_data['signal'] if signal_data else 'NONE',
+                'confidence': signal_data['confidence'] if signal_data else 'NONE',
+                'reason': signal_data.get('reason', '') if signal_data else ''
+            }
         
-        # 调用正确的更新函数，传递5个参数
-        update_system_status(
-            status='running',
-            account_info=account_info,
-            btc_info=btc_info_data,
-            position=position_info,
-            ai_signal=ai_signal_data
-        )
-        print("✅ 系统状态已更新")
-    except Exception as e:
-        print(f"更新系统状态失败: {e}")
+            # 调用正确的更新函数，传递5个参数
+            update_system_status(
+                status='running',
+                account_info=account_info,
+                btc_info=btc_info_data,
+                position=position_info,
+                ai_signal=ai_signal_data
+            )
+            print("✅ 系统状态已更新")
+        except Exception as e:
+            print(f"更新系统状态失败: {e}")
 
     return True
 
 
+def run_trading_tick():
+    """
+    执行一次交易周期，记录分阶段耗时，并发布本进程的接口调用指标与阶段耗时供 Web 端读取（无论本次是否完成）。
+    没有新收盘K线而跳过的执行不计入阶段耗时。
+    """
+    stage_timings.start_tick()
+    result = 'error'
+    try:
+        result = trading_bot()
+        return result
+    finally:
+        status = {True: 'completed', False: 'failed', None: 'skipped'}.get(result, 'error')
+        if stage_timings.end_tick(status, keep=status != 'skipped'):
+            data_manager.save_tick_timings(stage_timings.snapshot())
+        data_manager.save_runtime_metrics(metrics_registry.snapshot())
+
+
 def main():
     """主函数"""
     print("🚀 启动DeepSeek智能交易机器人 v3.0")
@@ -307,21 +402,24 @@ def main():
         print("❌ 交易所初始化失败，程序退出")
         return
     
-    # 设置定时任务
-    schedule.every(3).minutes.do(trading_bot)
+    # 后台预热并定时刷新情绪指标，交易循环中不再同步等待外部API
+    sentiment_cache.start()
+
+    # 设置K线收盘调度：每根K线收盘后 settle 秒执行一次
+    scheduler = CandleCloseScheduler(
+        TRADE_CONFIG['timeframe'], run_trading_tick,
+        settle_seconds=TRADE_CONFIG.get('candle_settle_seconds', 3)
+    )
     
-    print("⏰ 定时任务已设置: 每3分钟执行一次")
     print("🤖 机器人开始运行...")
     print("按 Ctrl+C 停止程序")
     
     try:
         # 先执行一次
-        trading_bot()
+        run_trading_tick()
         
-        # 进入定时循环
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
+        # 进入收盘调度循环
+        scheduler.run_forever()
             
     except KeyboardInterrupt:
         print("\n👋 收到停止信号，正在安全退出...")
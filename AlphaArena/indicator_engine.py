@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+增量技术指标引擎
+维护均线滚动和、EMA状态和滚动窗口，新K线收盘时以 O(1) 更新全部指标列。
+引擎只在首次调用（或数据不连续）时由批量函数 technical_analysis.calculate_technical_indicators 初始化，
+此后自行维护从初始化起点开始不断增长的历史，实盘每次取到的滑动窗口（固定 data_points 根）
+只把新收盘的K线提交给 update()，输出取历史中与窗口对应的最后若干行。
+
+与对同一滑动窗口直接执行批量函数的差异：
+- SMA/RSI/布林带/成交量均线的窗口不超过50根，窗口末尾的值与批量结果一致（浮点误差范围内）；
+  窗口开头的几十行使用了窗口之前的K线，不再是批量函数 min_periods 下的部分窗口值/NaN
+- EMA/MACD 从初始化起点递推，而批量函数从窗口第一根重新起算（adjust=True），
+  两者在窗口末尾相差约 (1-α)^窗口长度 乘以窗口起点附近的价格偏离（96根窗口时 EMA26/MACD/信号线
+  不超过价格的约 1e-4，macd_histogram 约 0.2），引擎的值与完整历史上的批量结果一致
+"""
+
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from technical_analysis import calculate_technical_indicators
+
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+INDICATOR_COLUMNS = [
+    'sma_5', 'sma_20', 'sma_50', 'ema_12', 'ema_26', 'macd', 'macd_signal', 'macd_histogram',
+    'rsi', 'bb_middle', 'bb_upper', 'bb_lower', 'bb_position', 'volume_ma'
+]
+
+SMA_WINDOWS = (5, 20, 50)
+BB_WINDOW = 20
+RSI_WINDOW = 14
+VOLUME_WINDOW = 20
+
+
+def _ema_alpha(span):
+    return 2.0 / (span + 1.0)
+
+
+class IncrementalIndicatorEngine:
+    """
+    流式技术指标引擎（与 calculate_technical_indicators 指标定义一致）。
+
+    - SMA: 各窗口的滚动和（min_periods=1）
+    - EMA/MACD: pandas ewm(adjust=True) 的递推形式，保存加权和与权重和
+    - RSI/布林带/成交量均线: 固定长度滚动窗口
+    已收盘K线通过 update() 提交；未收盘K线通过 peek() 计算，不改变引擎状态。
+    """
+
+    def __init__(self, max_history=2000):
+        self.max_history = max_history
+        self.reset()
+
+    def reset(self):
+        """清空状态，下一次计算将重新冷启动"""
+        self._count = 0
+        self._prev_close = None
+        self._closes = deque(maxlen=max(SMA_WINDOWS))
+        self._close_sums = {w: 0.0 for w in SMA_WINDOWS}
+        self._volumes = deque(maxlen=VOLUME_WINDOW)
+        self._volume_sum = 0.0
+        self._gains = deque(maxlen=RSI_WINDOW)
+        self._losses = deque(maxlen=RSI_WINDOW)
+        self._gain_sum = 0.0
+        self._loss_sum = 0.0
+        # ewm(adjust=True) 状态: (加权和, 权重和)
+        self._ema = {12: (0.0, 0.0), 26: (0.0, 0.0)}
+        self._signal_ema = (0.0, 0.0)
+        self._history = deque(maxlen=self.max_history)
+
+    @property
+    def is_warm(self):
+        return self._count > 0
+
+    @property
+    def last_timestamp(self):
+        return self._history[-1]['timestamp'] if self._history else None
+
+    # ------------------------------------------------------------------
+    # 冷启动
+    # ------------------------------------------------------------------
+    def warm_up(self, df):
+        """冷启动：批量计算指标并由结果初始化增量状态"""
+        self.reset()
+        if df is None or df.empty:
+            return df
+        df = calculate_technical_indicators(df)
+
+        closes = df['close'].to_numpy(dtype=float)
+        volumes = df['volume'].to_numpy(dtype=float)
+        n = len(df)
+        self._count = n
+        self._prev_close = float(closes[-1])
+
+        self._closes.extend(closes[-max(SMA_WINDOWS):])
+        for w in SMA_WINDOWS:
+            self._close_sums[w] = float(np.sum(closes[-w:]))
+        self._volumes.extend(volumes[-VOLUME_WINDOW:])
+        self._volume_sum = float(np.sum(volumes[-VOLUME_WINDOW:]))
+
+        # 第一根的 delta 为NaN，批量公式中按0计入涨跌幅
+        deltas = np.diff(closes, prepend=np.nan)[-RSI_WINDOW:]
+        gains = np.where(deltas > 0, deltas, 0.0)
+        losses = -np.where(deltas < 0, deltas, 0.0)
+        self._gains.extend(gains)
+        self._losses.extend(losses)
+        self._gain_sum = float(np.sum(gains))
+        self._loss_sum = float(np.sum(losses))
+
+        # 由最后一根的EMA值反推加权和：权重和 = (1 - (1-α)^n) / α
+        for span in (12, 26):
+            alpha = _ema_alpha(span)
+            weight_sum = (1.0 - (1.0 - alpha) ** n) / alpha
+            self._ema[span] = (float(df[f'ema_{span}'].iloc[-1]) * weight_sum, weight_sum)
+        alpha = _ema_alpha(9)
+        weight_sum = (1.0 - (1.0 - alpha) ** n) / alpha
+        self._signal_ema = (float(df['macd_signal'].iloc[-1]) * weight_sum, weight_sum)
+
+        for row in df[OHLCV_COLUMNS + INDICATOR_COLUMNS].tail(self.max_history).to_dict('records'):
+            self._history.append(row)
+        return df
+
+    # ------------------------------------------------------------------
+    # 增量计算
+    # ------------------------------------------------------------------
+    def _compute(self, candle):
+        """基于当前状态计算新一根K线的指标，返回 (指标行, 新状态)；不修改引擎"""
+        close = float(candle['close'])
+        volume = float(candle['volume'])
+        n = self._count + 1
+        closes = self._closes
+
+        row = {col: candle[col] for col in OHLCV_COLUMNS}
+        state = {}
+
+        # 简单移动平均 (min_periods=1)
+        close_sums = {}
+        for w in SMA_WINDOWS:
+            s = self._close_sums[w] + close
+            if len(closes) >= w:
+                s -= closes[-w]
+            close_sums[w] = s
+            row[f'sma_{w}'] = s / min(n, w)
+        state['close_sums'] = close_sums
+
+        # 指数移动平均 / MACD
+        ema_state = {}
+        for span in (12, 26):
+            decay = 1.0 - _ema_alpha(span)
+            num, den = self._ema[span]
+            num, den = close + decay * num, 1.0 + decay * den
+            ema_state[span] = (num, den)
+            row[f'ema_{span}'] = num / den
+        state['ema'] = ema_state
+        macd = row['ema_12'] - row['ema_26']
+        decay = 1.0 - _ema_alpha(9)
+        num, den = self._signal_ema
+        num, den = macd + decay * num, 1.0 + decay * den
+        state['signal_ema'] = (num, den)
+        row['macd'] = macd
+        row['macd_signal'] = num / den
+        row['macd_histogram'] = ((macd - row['macd_signal']) / close) * 10000
+
+        # RSI
+        delta = close - self._prev_close if self._prev_close is not None else float('nan')
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        gain_sum = self._gain_sum + gain - (self._gains[0] if len(self._gains) == RSI_WINDOW else 0.0)
+        loss_sum = self._loss_sum + loss - (self._losses[0] if len(self._losses) == RSI_WINDOW else 0.0)
+        state['gain'], state['loss'] = gain, loss
+        state['gain_sum'], state['loss_sum'] = gain_sum, loss_sum
+        if n >= RSI_WINDOW:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rs = np.float64(gain_sum / RSI_WINDOW) / np.float64(loss_sum / RSI_WINDOW)
+                row['rsi'] = float(100 - (100 / (1 + rs)))
+        else:
+            row['rsi'] = float('nan')
+
+        # 布林带
+        if n >= BB_WINDOW:
+            # 窗口只有20个点，直接精确求和，避免横盘时滚动和的舍入误差产生非零标准差
+            window = list(closes)[-(BB_WINDOW - 1):] + [close]
+            middle = math.fsum(window) / BB_WINDOW
+            std = math.sqrt(sum((x - middle) ** 2 for x in window) / (BB_WINDOW - 1))
+            row['bb_middle'] = middle
+            row['bb_upper'] = middle + std * 2
+            row['bb_lower'] = middle - std * 2
+            with np.errstate(divide='ignore', invalid='ignore'):
+                row['bb_position'] = float(np.float64(close - row['bb_lower']) / np.float64(row['bb_upper'] - row['bb_lower']))
+        else:
+            row['bb_middle'] = row['bb_upper'] = row['bb_lower'] = row['bb_position'] = float('nan')
+
+        # 成交量均线
+        volume_sum = self._volume_sum + volume
+        if len(self._volumes) == VOLUME_WINDOW:
+            volume_sum -= self._volumes[0]
+        state['volume_sum'] = volume_sum
+        row['volume_ma'] = volume_sum / VOLUME_WINDOW if n >= VOLUME_WINDOW else float('nan')
+
+        return row, state
+
+    def peek(self, candle):
+        """计算未收盘K线的指标（不提交状态）"""
+        row, _ = self._compute(candle)
+        return row
+
+    def update(self, candle):
+        """提交一根已收盘K线，O(1) 更新全部指标，返回该根的指标行"""
+        row, state = self._compute(candle)
+        close = float(candle['close'])
+        volume = float(candle['volume'])
+
+        self._close_sums = state['close_sums']
+        self._closes.append(close)
+        self._ema = state['ema']
+        self._signal_ema = state['signal_ema']
+        self._gain_sum, self._loss_sum = state['gain_sum'], state['loss_sum']
+        self._gains.append(state['gain'])
+        self._losses.append(state['loss'])
+        self._volume_sum = state['volume_sum']
+        self._volumes.append(volume)
+        self._prev_close = close
+        self._count += 1
+        self._history.append(row)
+        return row
+
+    # ------------------------------------------------------------------
+    # 与 calculate_technical_indicators 兼容的入口
+    # ------------------------------------------------------------------
+    def calculate(self, df):
+        """
+        可替代 calculate_technical_indicators 的入口（签名一致）。
+        df 的最后一根视为未收盘K线，其余为已收盘K线：
+        - 引擎已有的最后一根K线在 df 中时，只把其后新收盘的K线逐根 update()（滑动窗口每根新K线一次）
+        - 否则（未预热、数据中断超过窗口）对已收盘部分批量计算并据此初始化状态
+        返回与 df 对齐的最后 len(df) 行，未收盘K线由当前状态 peek() 计算。
+        """
+        try:
+            if df is None or len(df) < 2:
+                return calculate_technical_indicators(df)
+
+            closed = df.iloc[:-1]
+            timestamps = closed['timestamp']
+            last_ts = self.last_timestamp
+            matches = np.flatnonzero((timestamps == last_ts).to_numpy()) if self.is_warm and last_ts is not None else []
+            if len(matches) == 0:
+                self.warm_up(closed.copy())
+            else:
+                for candle in closed.iloc[int(matches[-1]) + 1:][OHLCV_COLUMNS].to_dict('records'):
+                    self.update(candle)
+
+            needed = len(closed)
+            rows = list(self._history)[-needed:]
+            if len(rows) < needed or rows[0]['timestamp'] != timestamps.iloc[0]:
+                # 历史缓存不足或与窗口不对齐（窗口内有缺失K线），由该窗口重新初始化
+                self.warm_up(closed.copy())
+                rows = list(self._history)[-needed:]
+                if len(rows) < needed:
+                    return calculate_technical_indicators(df)
+
+            rows.append(self.peek(df.iloc[-1][OHLCV_COLUMNS].to_dict()))
+            result = pd.DataFrame(rows, columns=OHLCV_COLUMNS + INDICATOR_COLUMNS)
+            result.index = df.index
+            return result
+        except Exception as e:
+            print(f"增量计算技术指标失败: {e}，改用批量计算")
+            self.reset()
+            return calculate_technical_indicators(df)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+LLM 决策缓存
+以完整请求内容（模型、消息、采样参数）的哈希为键缓存解析后的决策，有效期为一根K线的时长。
+实盘 prompt 包含最近的AI分析和交易记录，每根K线保存新分析后输入随之变化，
+因此命中场景主要是同一根K线内输入完全相同的重试（手动触发、执行失败后重跑），此时直接复用上次决策，不再消耗 token；
+同一键的并发请求共享一次调用（single-flight），失败结果不缓存，重试时会重新请求。
+回测使用的 llm_replay.RecordReplayClient 不经过此缓存。
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+
+def make_key(**request):
+    """请求内容的 SHA-256 哈希（键顺序无关）"""
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _Entry:
+    __slots__ = ('value', 'expires_at', 'lock')
+
+    def __init__(self):
+        self.value = None
+        self.expires_at = 0.0
+        self.lock = threading.Lock()
+
+
+class LLMResponseCache:
+    """
+    带 TTL 的内容寻址缓存。
+
+    get_or_compute(key, ttl, compute) 中 compute() 返回 (value, cacheable)，
+    cacheable 为 False 时（如响应无法解析）结果不缓存。
+    """
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._prune(time.time())
+                entry = self._entries[key] = _Entry()
+            return entry
+
+    def _prune(self, now):
+        """清理过期条目；仍超出上限时按过期时间淘汰最早的条目"""
+        if len(self._entries) < self.max_entries:
+            return
+        for key in [k for k, e in self._entries.items() if e.expires_at <= now and not e.lock.locked()]:
+            del self._entries[key]
+        if len(self._entries) >= self.max_entries:
+            oldest = sorted(self._entries.items(), key=lambda item: item[1].expires_at)
+            for key, _ in oldest[:len(self._entries) - self.max_entries + 1]:
+                del self._entries[key]
+
+    def get_or_compute(self, key, ttl, compute):
+        entry = self._entry(key)
+        if entry.value is not None and time.time() < entry.expires_at:
+            self.hits += 1
+            return entry.value
+
+        # 同一键只允许一个请求调用模型，其余请求等待后直接复用结果
+        with entry.lock:
+            if entry.value is not None and time.time() < entry.expires_at:
+                self.hits += 1
+                return entry.value
+            self.misses += 1
+            value, cacheable = compute()
+            if cacheable:
+                entry.value = value
+                entry.expires_at = time.time() + ttl
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+# DeepSeek 决策的全局缓存实例
+deepseek_response_cache = LLMResponseCache()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+LLM 请求并发调度器
+回测中各根K线的 prompt 相互独立，可以并发请求模型而不必逐根等待：
+- 有界并发：最多 max_concurrency 个请求同时进行，N 根K线约需 N/并发数 个往返
+- 令牌桶限流：平均每秒不超过 rate_per_second 个请求，允许 burst 个突发
+- 单请求超时：从请求实际开始执行起计时（排队与限流等待不计入），超时的结果按 default 返回
+- 按输入顺序返回结果，每完成一个调用一次进度回调；回调抛出异常时取消尚未开始的请求（用于后台任务取消）
+默认参数可通过环境变量 LLM_MAX_CONCURRENCY / LLM_RATE_PER_SECOND / LLM_REQUEST_TIMEOUT 配置。
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+
+class TokenBucket:
+    """令牌桶：每秒补充 rate 个令牌，最多积累 capacity 个"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取一个令牌，令牌不足时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class LLMDispatcher:
+    """
+    Args:
+        max_concurrency: 最大并发请求数
+        rate_per_second: 每秒请求数上限（None 或 0 表示不限流）
+        burst: 令牌桶容量（允许的突发请求数），默认等于 max(1, rate_per_second)
+        timeout: 单个请求的超时时间（秒）
+    """
+
+    def __init__(self, max_concurrency=None, rate_per_second=None, burst=None, timeout=None):
+        self.max_concurrency = max(1, int(max_concurrency or os.getenv('LLM_MAX_CONCURRENCY', 8)))
+        if rate_per_second is None:
+            rate_per_second = float(os.getenv('LLM_RATE_PER_SECOND', 5))
+        self.bucket = TokenBucket(rate_per_second, burst) if rate_per_second else None
+        self.timeout = float(timeout or os.getenv('LLM_REQUEST_TIMEOUT', 60))
+        self.completed = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def map(self, func, items, default=None, progress_callback=None):
+        """
+        并发执行 func(item)，按 items 顺序返回结果列表。
+        超时或抛出异常的请求结果为 default（超时的线程不会被中断，其结果被丢弃）。
+        progress_callback(已完成数, 总数) 在开始前及按顺序收集每个结果后调用，
+        其抛出的异常会原样抛出，排队中的请求不再发出（已在进行的请求完成后丢弃）。
+        """
+        items = list(items)
+        if not items:
+            return []
+        if progress_callback is not None:
+            progress_callback(0, len(items))
+
+        states = [{'event': threading.Event(), 'started_at': None} for _ in items]
+
+        def run(item, state):
+            try:
+                if self.bucket is not None:
+                    self.bucket.acquire()
+            finally:
+                state['started_at'] = time.monotonic()
+                state['event'].set()
+            return func(item)
+
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='llm-dispatch')
+        try:
+            futures = [executor.submit(run, item, state) for item, state in zip(items, states)]
+            results = []
+            for future, state in zip(futures, states):
+                # 等待请求开始执行，超时从开始执行时计算
+                state['event'].wait()
+                remaining = state['started_at'] + self.timeout - time.monotonic()
+                try:
+                    results.append(future.result(timeout=max(0.0, remaining)))
+                    self.completed += 1
+                except FuturesTimeout:
+                    self.timeouts += 1
+                    results.append(default)
+                except Exception as e:
+                    print(f"⚠️ LLM请求失败: {e}")
+                    self.errors += 1
+                    results.append(default)
+                if progress_callback is not None:
+                    progress_callback(len(results), len(items))
+            return results
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            'max_concurrency': self.max_concurrency,
+            'completed': self.completed,
+            'timeouts': self.timeouts,
+            'errors': self.errors
+        }
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+LLM 调用录制/回放
+基于LLM的策略（strategy_decision_v1）回测时每根K线都要调用一次模型，逐根同步请求无法用于长周期回测。
+RecordReplayClient 与 OpenAI 客户端接口一致（client.chat.completions.create(**request)），
+以请求内容哈希为键把 prompt -> 响应 持久化到本地 SQLite：
+- record: 已录制的请求直接返回录制结果；未录制的调用真实客户端并录制（首次回测较慢，之后可秒级重跑）；
+          策略无法解析的响应通过 discard() 删除，下次（包括同一次回测中的重试）重新请求
+- replay: 只返回录制结果，未录制时抛出 ReplayMissError，不访问网络，结果完全确定
+- live:   直接调用真实客户端，不读写录制存储
+StubChatClient 是模拟 chat-completions 接口的本地桩，用于测试或在没有 API Key 时录制确定性的响应。
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from llm_cache import make_key
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'llm_records.sqlite3')
+
+LLM_MODES = ('record', 'replay', 'live')
+
+
+class ReplayMissError(LookupError):
+    """回放模式下请求没有对应的录制响应"""
+
+
+class _Message:
+    def __init__(self, content):
+        self.role = 'assistant'
+        self.content = content
+
+
+class _Choice:
+    def __init__(self, content):
+        self.index = 0
+        self.message = _Message(content)
+        self.finish_reason = 'stop'
+
+
+class ChatCompletion:
+    """与 OpenAI ChatCompletion 响应结构兼容的最小对象（choices[0].message.content）"""
+
+    def __init__(self, content, model=None):
+        self.model = model
+        self.choices = [_Choice(content)]
+
+
+class _Completions:
+    def __init__(self, create):
+        self.create = create
+
+
+class _Chat:
+    def __init__(self, create):
+        self.completions = _Completions(create)
+
+
+class LLMRecordStore:
+    """prompt -> 响应 的本地录制存储（SQLite，键为请求内容哈希）"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or DEFAULT_DB_PATH
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_records (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    request TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            """)
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT response FROM llm_records WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key, request, response):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_records (key, model, request, response, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, request.get('model'), json.dumps(request, ensure_ascii=False, default=str), response,
+                 datetime.now().isoformat())
+            )
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM llm_records WHERE key = ?", (key,))
+
+    def count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM llm_records").fetchone()[0]
+
+
+class RecordReplayClient:
+    """
+    录制/回放客户端，可替代 OpenAI 客户端传给 StrategyAnalyzer。
+
+    Args:
+        store: LLMRecordStore，默认使用 data/llm_records.sqlite3
+        mode: 'record' / 'replay' / 'live'
+        client: 真实客户端（record/live 模式未命中录制时调用），replay 模式可不传
+    """
+
+    def __init__(self, store=None, mode='record', client=None):
+        if mode not in LLM_MODES:
+            raise ValueError(f"不支持的LLM模式: {mode}，可选 {', '.join(LLM_MODES)}")
+        if mode != 'replay' and client is None:
+            raise ValueError(f"{mode} 模式需要提供真实客户端")
+        self.store = store or LLMRecordStore()
+        self.mode = mode
+        self.client = client
+        self.chat = _Chat(self._create)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self.discarded = 0
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    @staticmethod
+    def _key(request):
+        # timeout 等传输参数不影响响应内容，不参与键计算
+        return make_key(**{k: v for k, v in request.items() if k != 'timeout'})
+
+    def is_recorded(self, request):
+        """请求是否已有录制响应（live 模式总是 False）"""
+        return self.mode != 'live' and self.store.get(self._key(request)) is not None
+
+    def _create(self, **request):
+        if self.mode == 'live':
+            return self.client.chat.completions.create(**request)
+
+        key = self._key(request)
+        content = self.store.get(key)
+        if content is not None:
+            self._count('hits')
+            return ChatCompletion(content, request.get('model'))
+
+        self._count('misses')
+        if self.mode == 'replay':
+            raise ReplayMissError(f"没有录制的LLM响应: {key[:12]}")
+
+        response = self.client.chat.completions.create(**request)
+        content = response.choices[0].message.content
+        self.store.put(key, {k: v for k, v in request.items() if k != 'timeout'}, content)
+        self._count('recorded')
+        return response
+
+    def discard(self, request):
+        """
+        调用方无法使用该请求的响应（如无法解析）时调用：record 模式下删除录制，之后重新请求模型，
+        避免错误响应被永久回放；replay 模式保持只读，live 模式没有录制。
+        """
+        if self.mode != 'record':
+            return
+        self.store.delete(self._key(request))
+        self._count('discarded')
+
+    def stats(self):
+        return {'mode': self.mode, 'hits': self.hits, 'misses': self.misses, 'recorded': self.recorded,
+                'discarded': self.discarded}
+
+
+def hash_signal_responder(request):
+    """默认桩响应：按 prompt 哈希确定性地给出 BUY/SELL/HOLD（同一 prompt 总是同一决策）"""
+    prompt = request['messages'][-1]['content']
+    digest = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8], 16)
+    signal = ('BUY', 'SELL', 'HOLD')[digest % 3]
+    return json.dumps({
+        'signal': signal,
+        'confidence': 'MEDIUM',
+        'reason': f'stub decision {digest % 1000:03d}'
+    })
+
+
+class StubChatClient:
+    """
+    模拟 OpenAI chat-completions 接口的本地桩客户端。
+
+    Args:
+        responder: responder(request) -> 响应文本，request 为 create() 的关键字参数；默认 hash_signal_responder
+        latency: 每次调用的模拟延迟（秒）
+    """
+
+    def __init__(self, responder=None, latency=0.0):
+        self.responder = responder or hash_signal_responder
+        self.latency = latency
+        self.chat = _Chat(self._create)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _create(self, **request):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatCompletion(self.responder(request), request.get('model'))
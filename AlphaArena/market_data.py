@@ -10,6 +10,8 @@ import ccxt
 import pandas as pd
 from datetime import datetime, timedelta
 from data_manager import DataManager
+from candle_store import candle_store
+from technical_analysis import calculate_integrated_trading_scores
 
 # 全局变量
 data_manager = DataManager()
@@ -18,13 +20,8 @@ data_manager = DataManager()
 def get_recent_trades(limit=5):
     """获取最近的交易记录"""
     try:
-        trade_history = data_manager.get_trade_history()
-        if not trade_history:
-            return []
-        
-        # 按时间倒序排列，获取最近的记录
-        sorted_trades = sorted(trade_history, key=lambda x: x.get('timestamp', ''), reverse=True)
-        return sorted_trades[:limit]
+        # 按时间倒序直接从索引读取最近的记录
+        return data_manager.get_latest_trades(limit)
         
     except Exception as e:
         print(f"获取交易历史失败: {e}")
@@ -34,13 +31,8 @@ def get_recent_trades(limit=5):
 def get_recent_ai_analysis(limit=5):
     """获取最近的AI分析记录"""
     try:
-        ai_history = data_manager.get_ai_analysis_history()
-        if not ai_history:
-            return []
-        
-        # 按时间倒序排列，获取最近的记录
-        sorted_analysis = sorted(ai_history, key=lambda x: x.get('timestamp', ''), reverse=True)
-        return sorted_analysis[:limit]
+        # 按时间倒序直接从索引读取最近的记录
+        return data_manager.get_latest_ai_analysis(limit)
         
     except Exception as e:
         print(f"获取AI分析历史失败: {e}")
@@ -50,6 +42,14 @@ def get_recent_ai_analysis(limit=5):
 def get_btc_ohlcv_base(exchange, config):
     """共享的核心K线数据获取和技术指标计算函数"""
     try:
+        # 优先使用本地K线存储（仅补齐缺失及最新K线）
+        try:
+            df = candle_store.load_recent_dataframe(exchange, config['symbol'], config['timeframe'], config['data_points'])
+            if not df.empty:
+                return df
+        except Exception as e:
+            print(f"⚠️ 本地K线存储读取失败: {e}，改为直接从交易所获取")
+
         # 获取K线数据
         ohlcv = exchange.fetch_ohlcv(config['symbol'], config['timeframe'],
                                      limit=config['data_points'])
@@ -64,6 +64,49 @@ def get_btc_ohlcv_base(exchange, config):
         return None
 
 
+def build_price_data(df, timeframe, get_support_resistance_levels, get_market_trend):
+    """由已计算技术指标的K线构造策略分析所需的 price_data（实盘与回测共用）"""
+    current_data = df.iloc[-1]
+    previous_data = df.iloc[-2]
+
+    # 获取技术分析数据
+    trend_analysis = get_market_trend(df)
+    levels_analysis = get_support_resistance_levels(df)
+
+    # 获取历史50根K线数据和MACD信号线数据
+    historical_data_count = min(50, len(df))
+    historical_klines = df[['timestamp', 'open', 'high', 'low', 'close', 'volume']].tail(historical_data_count).to_dict('records')
+    historical_macd_signal = df['macd_signal'].tail(historical_data_count).tolist()
+
+    return {
+        'price': current_data['close'],
+        # 数据时间取当前K线时间（同一根K线内输入不变，便于LLM决策缓存命中）
+        'timestamp': pd.Timestamp(current_data['timestamp']).strftime('%Y-%m-%d %H:%M:%S'),
+        'high': current_data['high'],
+        'low': current_data['low'],
+        'volume': current_data['volume'],
+        'timeframe': timeframe,
+        'price_change': ((current_data['close'] - previous_data['close']) / previous_data['close']) * 100,
+        'kline_data': df[['timestamp', 'open', 'high', 'low', 'close', 'volume']].tail(10).to_dict('records'),
+        # 专注MACD信号线和布林带的技术数据
+        'technical_data': {
+            'macd': current_data.get('macd', 0),
+            'macd_signal': current_data.get('macd_signal', 0),
+            'macd_histogram': current_data.get('macd_histogram', 0),
+            'bb_upper': current_data.get('bb_upper', 0),
+            'bb_middle': current_data.get('bb_middle', 0),
+            'bb_lower': current_data.get('bb_lower', 0),
+            'bb_position': current_data.get('bb_position', 0)
+        },
+        # 添加历史100根K线数据和MACD信号线数据
+        'historical_klines': historical_klines,
+        'historical_macd_signal': historical_macd_signal,
+        'trend_analysis': trend_analysis,
+        'levels_analysis': levels_analysis,
+        'full_data': df
+    }
+
+
 def get_btc_ohlcv_enhanced(exchange, config, calculate_technical_indicators, get_support_resistance_levels, get_market_trend):
     """获取增强的OHLCV数据（包含支撑阻力位和市场趋势分析）"""
     try:
@@ -74,45 +117,8 @@ def get_btc_ohlcv_enhanced(exchange, config, calculate_technical_indicators, get
         
         # 计算技术指标
         df = calculate_technical_indicators(df)
-        
-        current_data = df.iloc[-1]
-        previous_data = df.iloc[-2]
 
-        # 获取技术分析数据
-        trend_analysis = get_market_trend(df)
-        levels_analysis = get_support_resistance_levels(df)
-
-        # 获取历史50根K线数据和MACD信号线数据
-        historical_data_count = min(50, len(df))
-        historical_klines = df[['timestamp', 'open', 'high', 'low', 'close', 'volume']].tail(historical_data_count).to_dict('records')
-        historical_macd_signal = df['macd_signal'].tail(historical_data_count).tolist()
-
-        return {
-            'price': current_data['close'],
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'high': current_data['high'],
-            'low': current_data['low'],
-            'volume': current_data['volume'],
-            'timeframe': config['timeframe'],
-            'price_change': ((current_data['close'] - previous_data['close']) / previous_data['close']) * 100,
-            'kline_data': df[['timestamp', 'open', 'high', 'low', 'close', 'volume']].tail(10).to_dict('records'),
-            # 专注MACD信号线和布林带的技术数据
-            'technical_data': {
-                'macd': current_data.get('macd', 0),
-                'macd_signal': current_data.get('macd_signal', 0),
-                'macd_histogram': current_data.get('macd_histogram', 0),
-                'bb_upper': current_data.get('bb_upper', 0),
-                'bb_middle': current_data.get('bb_middle', 0),
-                'bb_lower': current_data.get('bb_lower', 0),
-                'bb_position': current_data.get('bb_position', 0)
-            },
-            # 添加历史100根K线数据和MACD信号线数据
-            'historical_klines': historical_klines,
-            'historical_macd_signal': historical_macd_signal,
-            'trend_analysis': trend_analysis,
-            'levels_analysis': levels_analysis,
-            'full_data': df
-        }
+        return build_price_data(df, config['timeframe'], get_support_resistance_levels, get_market_trend)
     except Exception as e:
         print(f"获取增强K线数据失败: {e}")
         return None
@@ -157,36 +163,40 @@ def get_btc_ohlcv_for_web(exchange, config, calculate_technical_indicators, get_
         # 获取情绪数据
         sentiment_data = get_sentiment_indicators()
 
-        # 计算每个点的交易决策score
-        scores = []
-        for i in range(len(df)):
-            try:
-                # 准备技术指标数据
-                technical_data = {
-                    'sma_5': df['sma_5'].iloc[i],
-                    'sma_20': df['sma_20'].iloc[i], 
-                    'sma_50': df['sma_50'].iloc[i],
-                    'rsi': df['rsi'].iloc[i],
-                    'macd': df['macd'].iloc[i],
-                    'macd_signal': df['macd_signal'].iloc[i],
-                    'macd_histogram': df['macd_histogram'].iloc[i],
-                    'bb_position': df['bb_position'].iloc[i]
-                }
+        # 计算每个点的交易决策score（整列向量化计算，结果与逐行调用评分函数一致）
+        try:
+            df['score'] = calculate_integrated_trading_scores(df, sentiment_data)
+        except Exception as e:
+            print(f"向量化计算score失败: {e}，改为逐行计算")
+            scores = []
+            for i in range(len(df)):
+                try:
+                    # 准备技术指标数据
+                    technical_data = {
+                        'sma_5': df['sma_5'].iloc[i],
+                        'sma_20': df['sma_20'].iloc[i], 
+                        'sma_50': df['sma_50'].iloc[i],
+                        'rsi': df['rsi'].iloc[i],
+                        'macd': df['macd'].iloc[i],
+                        'macd_signal': df['macd_signal'].iloc[i],
+                        'macd_histogram': df['macd_histogram'].iloc[i],
+                        'bb_position': df['bb_position'].iloc[i]
+                    }
                 
-                # 使用与deepseekok2.py一致的评分算法
-                score = calculate_integrated_trading_score(
-                    current_price=df['close'].iloc[i],
-                    technical_data=technical_data,
-                    sentiment_data=sentiment_data
-                )
+                    # 使用与deepseekok2.py一致的评分算法
+                    score = calculate_integrated_trading_score(
+                        current_price=df['close'].iloc[i],
+                        technical_data=technical_data,
+                        sentiment_data=sentiment_data
+                    )
                 
-                scores.append(score)
+                    scores.append(score)
                 
-            except Exception as e:
-                print(f"计算第{i}个点的score失败: {e}")
-                scores.append(0)
+                except Exception as e:
+                    print(f"计算第{i}个点的score失败: {e}")
+                    scores.append(0)
         
-        df['score'] = scores
+            df['score'] = scores
 
         return {
             'dataframe': df,
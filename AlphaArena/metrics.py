@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+外部调用监控指标
+在共享的 ccxt 交易所对象和 DeepSeek 客户端外包一层代理，记录每个接口的:
+- 延迟直方图（Prometheus 累积桶）
+- 错误次数（按异常类型）
+- 限频次数（ccxt RateLimitExceeded/DDoSProtection、OpenAI RateLimitError、HTTP 429）
+指标可导出为可 JSON 序列化的快照（交易进程写入 state 表，供 Web 进程读取），
+并渲染为 Prometheus 文本格式供 /api/metrics 使用。
+
+另提供交易周期分阶段耗时的环形缓冲区（StageTimings），用于统计各阶段 p50/p95/p99。
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# 延迟直方图桶上限（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 视为限频的异常类名（按 MRO 匹配，不直接依赖 ccxt/openai）
+RATE_LIMIT_ERRORS = ('RateLimitExceeded', 'DDoSProtection', 'RateLimitError')
+
+# 需要监控的交易所方法前缀（均为REST请求；market()、amount_to_precision() 等本地方法不记录）
+EXCHANGE_METHOD_PREFIXES = ('fetch_', 'create_', 'cancel_', 'edit_', 'set_leverage', 'load_markets')
+
+
+def is_rate_limit_error(error):
+    if any(cls.__name__ in RATE_LIMIT_ERRORS for cls in type(error).__mro__):
+        return True
+    return getattr(error, 'status_code', None) == 429
+
+
+class MetricsRegistry:
+    """线程安全的接口调用指标集合，键为 (component, endpoint)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _get_series(self, component, endpoint):
+        key = (component, endpoint)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = {
+                'buckets': [0] * len(self.buckets),
+                'sum': 0.0,
+                'count': 0,
+                'errors': {},
+                'rate_limited': 0,
+            }
+        return series
+
+    def observe(self, component, endpoint, seconds, error=None):
+        """记录一次调用（无论成功与否都计入延迟）"""
+        with self._lock:
+            series = self._get_series(component, endpoint)
+            series['sum'] += seconds
+            series['count'] += 1
+            for i, upper in enumerate(self.buckets):
+                if seconds <= upper:
+                    series['buckets'][i] += 1
+                    break
+            if error is not None:
+                name = type(error).__name__
+                series['errors'][name] = series['errors'].get(name, 0) + 1
+                if is_rate_limit_error(error):
+                    series['rate_limited'] += 1
+
+    def timed(self, component, endpoint, func):
+        """返回包装后的函数，调用时自动记录延迟、错误与限频"""
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self.observe(component, endpoint, time.perf_counter() - start, e)
+                raise
+            self.observe(component, endpoint, time.perf_counter() - start)
+            return result
+        wrapper.__name__ = getattr(func, '__name__', endpoint)
+        wrapper.__doc__ = getattr(func, '__doc__', None)
+        return wrapper
+
+    def snapshot(self):
+        """导出可 JSON 序列化的指标快照"""
+        with self._lock:
+            return {
+                'buckets': list(self.buckets),
+                'generated_at': time.time(),
+                'series': [
+                    {
+                        'component': component,
+                        'endpoint': endpoint,
+                        'buckets': list(series['buckets']),
+                        'sum': series['sum'],
+                        'count': series['count'],
+                        'errors': dict(series['errors']),
+                        'rate_limited': series['rate_limited'],
+                    }
+                    for (component, endpoint), series in sorted(self._series.items())
+                ],
+            }
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def render_prometheus(snapshots):
+    """
+    将多个进程的指标快照渲染为 Prometheus 文本格式。
+
+    Args:
+        snapshots: {进程名: MetricsRegistry.snapshot()}，进程名作为 process 标签
+    """
+    duration, errors, rate_limited, age = [], [], [], []
+    for process, snapshot in snapshots.items():
+        if not snapshot:
+            continue
+        bounds = snapshot.get('buckets', LATENCY_BUCKETS)
+        if snapshot.get('generated_at'):
+            age.append(f"alphaarena_metrics_snapshot_age_seconds{_labels(process=process)} "
+                       f"{max(0.0, time.time() - snapshot['generated_at']):.3f}")
+        for series in snapshot.get('series', []):
+            base = dict(process=process, component=series['component'], endpoint=series['endpoint'])
+            cumulative = 0
+            for upper, count in zip(bounds, series['buckets']):
+                cumulative += count
+                duration.append(f"alphaarena_api_request_duration_seconds_bucket{_labels(**base, le=upper)} {cumulative}")
+            duration.append(f"alphaarena_api_request_duration_seconds_bucket{_labels(**base, le='+Inf')} {series['count']}")
+            duration.append(f"alphaarena_api_request_duration_seconds_sum{_labels(**base)} {series['sum']:.6f}")
+            duration.append(f"alphaarena_api_request_duration_seconds_count{_labels(**base)} {series['count']}")
+            for error_type, count in sorted(series['errors'].items()):
+                errors.append(f"alphaarena_api_errors_total{_labels(**base, error=error_type)} {count}")
+            rate_limited.append(f"alphaarena_api_rate_limit_hits_total{_labels(**base)} {series['rate_limited']}")
+
+    lines = [
+        '# HELP alphaarena_api_request_duration_seconds External API call latency (exchange REST / DeepSeek).',
+        '# TYPE alphaarena_api_request_duration_seconds histogram',
+        *duration,
+        '# HELP alphaarena_api_errors_total External API call failures by exception type.',
+        '# TYPE alphaarena_api_errors_total counter',
+        *errors,
+        '# HELP alphaarena_api_rate_limit_hits_total External API calls rejected by rate limiting.',
+        '# TYPE alphaarena_api_rate_limit_hits_total counter',
+        *rate_limited,
+        '# HELP alphaarena_metrics_snapshot_age_seconds Seconds since the process metrics snapshot was taken.',
+        '# TYPE alphaarena_metrics_snapshot_age_seconds gauge',
+        *age,
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+class InstrumentedExchange:
+    """ccxt 交易所代理：REST 方法调用计入监控指标，其余属性原样透传"""
+
+    def __init__(self, exchange, registry=None, component='exchange'):
+        object.__setattr__(self, '_exchange', exchange)
+        object.__setattr__(self, '_registry', registry or metrics_registry)
+        object.__setattr__(self, '_component', component)
+
+    def __getattr__(self, name):
+        attr = getattr(self._exchange, name)
+        if callable(attr) and name.startswith(EXCHANGE_METHOD_PREFIXES):
+            return self._registry.timed(self._component, name, attr)
+        return attr
+
+    def __setattr__(self, name, value):
+        setattr(self._exchange, name, value)
+
+
+class InstrumentedClient:
+    """OpenAI 兼容客户端代理：监控 chat.completions.create 等指定路径的调用"""
+
+    def __init__(self, client, registry=None, component='deepseek',
+                 methods=('chat.completions.create',), _path=''):
+        self._client = client
+        self._registry = registry or metrics_registry
+        self._component = component
+        self._methods = tuple(methods)
+        self._path = _path
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        path = f"{self._path}.{name}" if self._path else name
+        if path in self._methods:
+            return self._registry.timed(self._component, path, attr)
+        if any(method.startswith(path + '.') for method in self._methods):
+            return InstrumentedClient(attr, self._registry, self._component, self._methods, path)
+        return attr
+
+
+def _percentile(sorted_values, q):
+    """线性插值分位数（q 取 0-100），sorted_values 需已排序且非空"""
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+class StageTimings:
+    """
+    交易周期分阶段耗时记录（环形缓冲区，保留最近 maxlen 个周期）。
+
+    用法: start_tick() -> 在各阶段使用 with stage(name) 或 timed(name, func) -> end_tick(status)。
+    同一周期内同名阶段的耗时累加；并发执行的阶段（如数据采集）各自记录自身耗时。
+    """
+
+    def __init__(self, maxlen=500):
+        self._ticks = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._current = None
+        self._tick_start = None
+
+    def start_tick(self):
+        with self._lock:
+            self._current = {'started_at': time.time(), 'stages': {}}
+            self._tick_start = time.perf_counter()
+
+    def record(self, name, seconds):
+        with self._lock:
+            if self._current is not None:
+                stages = self._current['stages']
+                stages[name] = stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timed(self, name, func):
+        """返回包装后的函数，调用耗时计入当前周期的 name 阶段（可在线程池中执行）"""
+        def wrapper(*args, **kwargs):
+            with self.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def end_tick(self, status, keep=True):
+        """结束当前周期；keep 为 False 时丢弃（如没有新K线而跳过的执行）"""
+        with self._lock:
+            tick, self._current = self._current, None
+            if tick is None or not keep:
+                return None
+            tick['total'] = time.perf_counter() - self._tick_start
+            tick['status'] = status
+            self._ticks.append(tick)
+            return tick
+
+    def snapshot(self):
+        """导出可 JSON 序列化的周期列表（时间正序）"""
+        with self._lock:
+            return [dict(tick, stages=dict(tick['stages'])) for tick in self._ticks]
+
+
+def summarize_stage_timings(ticks, last_n=None):
+    """
+    统计各阶段耗时分布。
+
+    Args:
+        ticks: StageTimings.snapshot() 返回的周期列表
+        last_n: 只统计最近 N 个周期，默认全部
+
+    Returns:
+        dict: {阶段名: {'count', 'mean', 'p50', 'p95', 'p99', 'max'}}，另含 'total' 为整个周期耗时
+    """
+    if last_n:
+        ticks = ticks[-last_n:]
+    samples = {}
+    for tick in ticks:
+        for name, seconds in tick.get('stages', {}).items():
+            samples.setdefault(name, []).append(seconds)
+        if tick.get('total') is not None:
+            samples.setdefault('total', []).append(tick['total'])
+
+    summary = {}
+    for name, values in samples.items():
+        values.sort()
+        summary[name] = {
+            'count': len(values),
+            'mean': round(sum(values) / len(values), 4),
+            'p50': round(_percentile(values, 50), 4),
+            'p95': round(_percentile(values, 95), 4),
+            'p99': round(_percentile(values, 99), 4),
+            'max': round(values[-1], 4),
+        }
+    return summary
+
+
+# 当前进程的全局指标实例
+metrics_registry = MetricsRegistry()
+
+# 交易周期分阶段耗时（交易进程使用）
+stage_timings = StageTimings()
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+参数扫描（网格搜索）模块
+在同一段K线上对策略参数、指标周期和交易参数的所有组合并行回测，并按指定指标排序输出结果。
+
+参数分为三类：
+- 指标参数: bb_period, bb_std, macd_fast, macd_slow, macd_signal（重算对应的指标列）
+- 交易参数: fee_rate, fixed_usd（传给 simulate_strategy）
+- 其余参数原样传给策略分析器（如 v3 的 bb_position_threshold, bb_position_window）
+
+K线只加载一次并在每个工作进程初始化时传入；进程内按参数缓存MACD/布林带列，
+任务按指标参数排序分块下发，使同一进程连续处理共享指标列的参数组合。
+"""
+
+import itertools
+import json
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from technical_analysis import calculate_macd, calculate_bollinger
+
+INDICATOR_DEFAULTS = OrderedDict([
+    ('bb_period', 20),
+    ('bb_std', 2),
+    ('macd_fast', 12),
+    ('macd_slow', 26),
+    ('macd_signal', 9),
+])
+SIM_PARAMS = ('fee_rate', 'fixed_usd')
+
+# 排序指标: 结果字段, 是否降序
+SORT_KEYS = {
+    'net_pnl': ('net_pnl_total', True),
+    'win_rate': ('win_rate', True),
+    'max_drawdown': ('max_drawdown', False),
+}
+
+# 每个进程缓存的指标列组数上限
+COLUMN_CACHE_SIZE = 32
+
+# Web 接口单次扫描允许的参数组合数上限
+MAX_SWEEP_COMBOS = int(os.getenv('SWEEP_MAX_COMBOS', 2000))
+
+
+def _range_count(spec):
+    """单个参数的取值个数（不展开）"""
+    if isinstance(spec, dict):
+        start, stop = spec['start'], spec['stop']
+        step = spec.get('step', 1)
+        if step <= 0:
+            raise ValueError(f"step 必须为正数: {spec}")
+        return max(int(np.floor((stop - start) / step + 1e-9)) + 1, 0)
+    if isinstance(spec, (list, tuple)):
+        return len(spec)
+    return 1
+
+
+def _expand_range(spec):
+    """将单个参数的取值描述展开为列表：列表原样返回，{start, stop, step} 展开为闭区间等差序列，标量视为单值"""
+    if isinstance(spec, dict):
+        start, stop = spec['start'], spec['stop']
+        step = spec.get('step', 1)
+        count = _range_count(spec)
+        values = [start + k * step for k in range(max(count, 0))]
+        if all(isinstance(v, int) for v in (start, stop, step)):
+            return values
+        return [round(v, 10) for v in values]
+    if isinstance(spec, (list, tuple)):
+        return list(spec)
+    return [spec]
+
+
+def expand_grid(param_ranges, max_combos=None):
+    """
+    展开参数网格。
+    Args:
+        param_ranges: {参数名: 取值列表 / {start, stop, step} / 单值}
+        max_combos: 组合数上限，超过时在展开前抛出 ValueError（默认不限制）
+    Returns:
+        list: 参数组合字典列表（笛卡尔积）
+    """
+    if not param_ranges:
+        return [{}]
+    if max_combos is not None:
+        total = 1
+        for spec in param_ranges.values():
+            total *= _range_count(spec)
+        if total > max_combos:
+            raise ValueError(f"参数组合数 {total} 超过上限 {max_combos}")
+    names = list(param_ranges.keys())
+    values = [_expand_range(param_ranges[name]) for name in names]
+    return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+
+def split_params(params):
+    """将一个参数组合拆分为 (指标参数, 交易参数, 策略参数)"""
+    indicator = {k: params.get(k, v) for k, v in INDICATOR_DEFAULTS.items()}
+    sim = {k: params[k] for k in SIM_PARAMS if k in params}
+    strategy = {k: v for k, v in params.items() if k not in INDICATOR_DEFAULTS and k not in SIM_PARAMS}
+    return indicator, sim, strategy
+
+
+def calculate_max_drawdown(equity_curve):
+    """根据累计净盈亏曲线计算最大回撤（USDT，正数表示回撤幅度）"""
+    if not equity_curve:
+        return 0.0
+    equity = np.asarray(equity_curve, dtype=float)
+    peaks = np.maximum.accumulate(np.maximum(equity, 0.0))
+    return float(np.max(peaks - equity))
+
+
+def sort_results(results, sort_by='net_pnl'):
+    """按 net_pnl / win_rate / max_drawdown 排序，失败的组合排在最后"""
+    if sort_by not in SORT_KEYS:
+        raise ValueError(f"不支持的排序指标: {sort_by}，可选 {list(SORT_KEYS)}")
+    field, descending = SORT_KEYS[sort_by]
+    ok = [r for r in results if 'error' not in r]
+    failed = [r for r in results if 'error' in r]
+    ok.sort(key=lambda r: r[field], reverse=descending)
+    return ok + failed
+
+
+# ----------------------------------------------------------------------
+# 工作进程
+# ----------------------------------------------------------------------
+_worker_state = {}
+
+
+def _init_worker(df, strategy_version, warmup_candles):
+    """进程池初始化：保存共享K线与指标列缓存"""
+    _worker_state.clear()
+    _worker_state.update({
+        'df': df,
+        'strategy_version': strategy_version,
+        'warmup_candles': warmup_candles,
+        'macd_cache': OrderedDict(),
+        'bb_cache': OrderedDict(),
+        'strategies': {},
+    })
+
+
+def _cached_columns(cache, key, compute):
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key]
+    columns = compute()
+    cache[key] = columns
+    if len(cache) > COLUMN_CACHE_SIZE:
+        cache.popitem(last=False)
+    return columns
+
+
+def _frame_for(indicator):
+    """返回替换了MACD/布林带列的K线（默认参数直接复用原始数据）"""
+    df = _worker_state['df']
+    if indicator == dict(INDICATOR_DEFAULTS):
+        return df
+    close = df['close']
+    macd_key = (indicator['macd_fast'], indicator['macd_slow'], indicator['macd_signal'])
+    bb_key = (indicator['bb_period'], indicator['bb_std'])
+    macd = _cached_columns(_worker_state['macd_cache'], macd_key, lambda: calculate_macd(close, *macd_key))
+    bb = _cached_columns(_worker_state['bb_cache'], bb_key, lambda: calculate_bollinger(close, *bb_key))
+    frame = df.copy(deep=False)
+    for col, values in itertools.chain(macd.items(), bb.items()):
+        frame[col] = values
+    return frame
+
+
+def _strategy_for(strategy_params):
+    """按策略参数缓存策略实例（批量信号策略无状态，可重复使用）"""
+    from strategy_decision import StrategyInterface
+
+    key = json.dumps(strategy_params, sort_keys=True)
+    strategies = _worker_state['strategies']
+    if key not in strategies:
+        strategies[key] = StrategyInterface(None, strategy_version=_worker_state['strategy_version'],
+                                            strategy_params=strategy_params)
+    return strategies[key]
+
+
+def _run_combo(task):
+    """进程池任务：回测单个参数组合，仅返回统计结果"""
+    from backtest import simulate_strategy
+
+    index, params = task
+    try:
+        indicator, sim_params, strategy_params = split_params(params)
+        df = _frame_for(indicator)
+        sim = simulate_strategy(df, strategy_version=_worker_state['strategy_version'],
+                                warmup_candles=_worker_state['warmup_candles'],
+                                strategy=_strategy_for(strategy_params), verbose=False, **sim_params)
+        stats = sim['stats']
+        closed_trades = stats['closed_trades']
+        win_rate = (stats['win_trades'] / closed_trades * 100) if closed_trades > 0 else 0.0
+        return {
+            'index': index,
+            'params': params,
+            'net_pnl_total': round(stats['net_pnl_total'], 2),
+            'gross_pnl_total': round(stats['gross_pnl_total'], 2),
+            'total_fees': round(stats['total_fees'], 2),
+            'win_rate': round(win_rate, 2),
+            'closed_trades': closed_trades,
+            'total_signals': len(sim['trades']),
+            'max_drawdown': round(calculate_max_drawdown(sim['equity_curve']), 2),
+        }
+    except Exception as e:
+        return {'index': index, 'params': params, 'error': str(e)}
+
+
+# ----------------------------------------------------------------------
+# 对外接口
+# ----------------------------------------------------------------------
+def iter_sweep(df, combos, strategy_version='strategy_decision_v3', warmup_candles=0, max_workers=None):
+    """
+    在已计算技术指标的K线上并行回测所有参数组合，逐个产出结果。
+    结果按任务下发顺序（按指标参数排序后的顺序）产出，不是原组合顺序，用 index 对应 combos。
+    Args:
+        df: load_backtest_data 返回的K线数据
+        combos: expand_grid 生成的参数组合列表
+        strategy_version: 策略版本（建议使用支持批量信号的 v2-v5）
+        warmup_candles: 预热期K线数量
+        max_workers: 进程池大小，默认CPU核数
+    Yields:
+        dict: { index, params, net_pnl_total, win_rate, max_drawdown, ... } 或 { index, params, error }
+        每个组合只产出一次；进程池中途失败时只顺序回测尚未产出的组合
+    """
+    # 共享同一组指标参数的组合排在一起，分块后落在同一进程，命中指标列缓存
+    tasks = sorted(enumerate(combos), key=lambda t: tuple(split_params(t[1])[0].values()))
+    if not tasks:
+        return
+    workers = max(1, min(len(tasks), max_workers or os.cpu_count() or 1))
+    chunksize = max(1, min(64, len(tasks) // (workers * 4)))
+
+    done = set()
+    if workers > 1:
+        pool = None
+        try:
+            # Web进程中有后台线程（情绪刷新、任务队列等）持有锁和sqlite连接，fork 出的子进程可能死锁，
+            # 工作进程改由单线程的 forkserver 创建
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('forkserver'),
+                                       initializer=_init_worker, initargs=(df, strategy_version, warmup_candles))
+            for result in pool.map(_run_combo, tasks, chunksize=chunksize):
+                done.add(result['index'])
+                yield result
+            return
+        except GeneratorExit:
+            raise
+        except Exception as e:
+            print(f"⚠️ 进程池执行失败: {e}，剩余 {len(tasks) - len(done)} 个组合改为顺序回测")
+        finally:
+            # 调用方提前关闭生成器（如客户端断开）时取消尚未开始的任务，不等待剩余组合
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    _init_worker(df, strategy_version, warmup_candles)
+    for task in tasks:
+        if task[0] not in done:
+            yield _run_combo(task)
+
+
+def run_sweep(param_ranges, days=2, interval='15m', strategy_version='strategy_decision_v3', end_time=None,
+              sort_by='net_pnl', top_n=None, output_path=None, max_workers=None, on_result=None):
+    """
+    参数扫描：K线只加载一次，并行回测参数网格中的所有组合，返回排序后的结果。
+    Args:
+        param_ranges: {参数名: 取值列表 / {start, stop, step} / 单值}，参数分类见模块说明
+        days: 回测天数 (最多支持 300 天)
+        interval: K线级别
+        strategy_version: 策略版本
+        end_time: 回测截至时间 (格式: 'YYYY-MM-DD HH:MM:SS'，默认为当前时间)
+        sort_by: 排序指标 'net_pnl' / 'win_rate' / 'max_drawdown'
+        top_n: 只返回排名前N的组合（默认全部）
+        output_path: 结果文件路径 (JSONL)。扫描过程中逐条追加，完成后替换为排序后的结果
+        max_workers: 进程池大小
+        on_result: 每完成一个组合时的回调 on_result(result, completed, total)
+    Returns:
+        dict: { strategy_version, sort_by, total, completed, failed, results }，失败时为 { error }
+    """
+    from backtest import load_backtest_data
+
+    if sort_by not in SORT_KEYS:
+        return {'error': f'不支持的排序指标: {sort_by}，可选 {list(SORT_KEYS)}'}
+    try:
+        combos = expand_grid(param_ranges)
+    except Exception as e:
+        return {'error': f'参数范围无效: {e}'}
+
+    data = load_backtest_data(days=days, interval=interval, end_time=end_time)
+    if 'error' in data:
+        return data
+
+    total = len(combos)
+    print(f"🔍 参数扫描开始：{strategy_version}，{total} 个参数组合，{len(data['df'])} 根K线")
+
+    results = []
+    out = None
+    if output_path:
+        out_dir = os.path.dirname(output_path)
+        if out_dir and not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        out = open(output_path, 'w', encoding='utf-8')
+    try:
+        for result in iter_sweep(data['df'], combos, strategy_version=strategy_version,
+                                 warmup_candles=data['per_day'], max_workers=max_workers):
+            results.append(result)
+            if out:
+                out.write(json.dumps(result, ensure_ascii=False) + '\n')
+                out.flush()
+            if on_result:
+                on_result(result, len(results), total)
+    finally:
+        if out:
+            out.close()
+
+    ranked = sort_results(results, sort_by)
+    if top_n:
+        ranked = ranked[:int(top_n)]
+
+    if output_path:
+        tmp_path = output_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for rank, result in enumerate(ranked, 1):
+                f.write(json.dumps(dict(result, rank=rank), ensure_ascii=False) + '\n')
+        os.replace(tmp_path, output_path)
+
+    failed = sum(1 for r in results if 'error' in r)
+    print(f"✅ 参数扫描完成：{len(results) - failed}/{total} 个组合成功")
+    return {
+        'strategy_version': strategy_version,
+        'sort_by': sort_by,
+        'total': total,
+        'completed': len(results),
+        'failed': failed,
+        'results': [dict(r, rank=rank) for rank, r in enumerate(ranked, 1)]
+    }
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+按K线收盘刷新的响应缓存
+缓存结果在下一根K线收盘（即下一根开盘时间）前有效，期间的重复请求直接返回缓存。
+同一键的并发请求共享一次计算（single-flight）：第一个请求负责计算，其余请求等待其结果，
+N 个看板同时刷新与一个看板的开销相同。
+"""
+
+import threading
+import time
+
+from candle_store import timeframe_to_ms
+
+
+class _Entry:
+    __slots__ = ('value', 'expires_ms', 'version', 'lock')
+
+    def __init__(self):
+        self.value = None
+        self.expires_ms = 0
+        self.version = None
+        self.lock = threading.Lock()
+
+
+class CandleCloseCache:
+    """
+    键值缓存，条目在所属K线周期结束时过期。
+
+    get_or_compute(key, timeframe, compute, version) 中:
+    - timeframe 决定过期时间（当前K线的收盘时刻 + settle_ms）
+    - version 为可选的附加版本号（如交易记录文件的修改时间），变化时立即失效
+    - compute() 返回 (value, cacheable)，cacheable 为 False 时结果不缓存（如错误响应）
+    """
+
+    def __init__(self, settle_ms=2000):
+        # 收盘后稍等片刻再刷新，保证交易所已生成新K线
+        self.settle_ms = settle_ms
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+            return entry
+
+    @staticmethod
+    def _fresh(entry, now_ms, version):
+        return entry.value is not None and now_ms < entry.expires_ms and entry.version == version
+
+    def get_or_compute(self, key, timeframe, compute, version=None):
+        entry = self._entry(key)
+        now_ms = int(time.time() * 1000)
+        if self._fresh(entry, now_ms, version):
+            self.hits += 1
+            return entry.value
+
+        # 同一键只允许一个请求计算，其余请求等待后直接复用结果
+        with entry.lock:
+            now_ms = int(time.time() * 1000)
+            if self._fresh(entry, now_ms, version):
+                self.hits += 1
+                return entry.value
+            self.misses += 1
+            value, cacheable = compute()
+            if cacheable:
+                tf_ms = timeframe_to_ms(timeframe)
+                entry.value = value
+                entry.version = version
+                entry.expires_ms = (now_ms // tf_ms + 1) * tf_ms + self.settle_ms
+            return value
+
+    def invalidate(self, key=None):
+        """使指定键（默认全部）失效"""
+        with self._lock:
+            if key is None:
+                entries = list(self._entries.values())
+            else:
+                entries = [self._entries[key]] if key in self._entries else []
+        for entry in entries:
+            entry.expires_ms = 0
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+# 技术图表接口的全局缓存实例
+technical_chart_cache = CandleCloseCache()
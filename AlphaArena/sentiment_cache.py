@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+市场情绪指标缓存
+恐慌贪婪指数每天只更新一次，无需在每次图表请求和回测时同步调用外部API：
+- 进程内缓存，TTL内直接返回
+- 过期后立即返回旧值，由后台线程刷新（stale-while-revalidate）
+- 缓存持久化到磁盘，重启后无需重新请求
+只有在内存和磁盘都没有任何数据时（首次运行）才会同步请求一次，并发的首次调用只请求一次。
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'sentiment_cache.json')
+
+
+class SentimentCache:
+    """
+    情绪指标缓存。
+
+    Args:
+        fetch_func: 实际请求情绪数据的函数，返回 get_sentiment_indicators 格式的字典
+        ttl: 成功数据的有效期（秒），默认1小时
+        retry_ttl: 请求失败（回退为中性值）时的重试间隔（秒）
+        cache_path: 磁盘缓存文件路径
+    """
+
+    def __init__(self, fetch_func, ttl=3600, retry_ttl=300, cache_path=None):
+        self.fetch_func = fetch_func
+        self.ttl = ttl
+        self.retry_ttl = retry_ttl
+        self.cache_path = cache_path or DEFAULT_CACHE_PATH
+        self._lock = threading.Lock()
+        # 冷启动（无任何缓存）时只由一个调用方同步请求，其余调用方等待同一结果
+        self._cold_start_lock = threading.Lock()
+        self._refreshing = False
+        self._value = None
+        self._fetched_at = 0.0
+        self._scheduler = None
+        self._load_from_disk()
+
+    # ------------------------------------------------------------------
+    # 磁盘持久化
+    # ------------------------------------------------------------------
+    def _load_from_disk(self):
+        try:
+            if os.path.exists(self.cache_path):
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                self._value = cached['value']
+                self._fetched_at = float(cached['fetched_at'])
+        except Exception as e:
+            print(f"⚠️ 读取情绪缓存失败: {e}")
+
+    def _save_to_disk(self):
+        try:
+            cache_dir = os.path.dirname(self.cache_path)
+            if cache_dir and not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+            # 交易进程与Web进程共用同一缓存文件，临时文件按进程/线程区分，避免并发写入互相覆盖
+            tmp_path = f'{self.cache_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'fetched_at': self._fetched_at, 'value': self._value}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"⚠️ 保存情绪缓存失败: {e}")
+
+    # ------------------------------------------------------------------
+    # 刷新
+    # ------------------------------------------------------------------
+    def _expires_in(self):
+        ttl = self.ttl if self._value and self._value.get('status') == 'success' else self.retry_ttl
+        return self._fetched_at + ttl - time.time()
+
+    def refresh(self):
+        """同步请求一次情绪数据并更新缓存；请求失败时保留已有的成功数据"""
+        value = self.fetch_func()
+        with self._lock:
+            if value.get('status') == 'success' or not self._value or self._value.get('status') != 'success':
+                self._value = value
+            self._fetched_at = time.time()
+            self._save_to_disk()
+        return value
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def worker():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ 后台刷新情绪数据失败: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=worker, name='sentiment-refresh', daemon=True).start()
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+    def get(self):
+        """返回情绪数据：有缓存时立即返回（过期则后台刷新），无任何缓存时同步请求"""
+        with self._lock:
+            value = self._value
+            expired = value is not None and self._expires_in() <= 0
+        if value is None:
+            with self._cold_start_lock:
+                with self._lock:
+                    value = self._value
+                if value is None:
+                    return self.refresh()
+            return self._with_age(value)
+        if expired:
+            self._refresh_in_background()
+        return self._with_age(value)
+
+    @staticmethod
+    def _with_age(value):
+        """按数据时间重新计算 hours_old（缓存中的值是请求时计算的）"""
+        value = dict(value)
+        if value.get('status') == 'success':
+            try:
+                data_time = datetime.strptime(value['data_time'], '%Y-%m-%d %H:%M')
+                value['hours_old'] = round((datetime.now() - data_time).total_seconds() / 3600, 1)
+            except Exception:
+                pass
+        return value
+
+    def start(self, interval=None):
+        """启动后台定时刷新线程（预热缓存并在每次过期前刷新），重复调用无副作用"""
+        if self._scheduler is not None:
+            return
+        interval = interval or self.ttl
+
+        def loop():
+            while True:
+                try:
+                    if self._value is None or self._expires_in() <= 0:
+                        self.refresh()
+                except Exception as e:
+                    print(f"⚠️ 定时刷新情绪数据失败: {e}")
+                time.sleep(max(1.0, min(interval, self._expires_in() if self._value else interval)))
+
+        self._scheduler = threading.Thread(target=loop, name='sentiment-scheduler', daemon=True)
+        self._scheduler.start()
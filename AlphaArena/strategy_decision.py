@@ -6,6 +6,9 @@
 提供统一的策略分析接口，支持动态选择策略版本。
 """
 
+import os
+
+
 class StrategyInterface:
     """策略决策接口类 - 支持动态选择策略版本。
     
@@ -17,15 +20,17 @@ class StrategyInterface:
     - strategy_decision_v5: MACD Signal线V型转折 + 布林带上半部分过滤
     """
     
-    def __init__(self, deepseek_client, strategy_version='strategy_decision_v2'):
+    def __init__(self, deepseek_client, strategy_version='strategy_decision_v2', strategy_params=None):
         """
         初始化策略接口。
         
         Args:
             deepseek_client: DeepSeek AI客户端。
             strategy_version: 策略版本 ('strategy_decision_v1', 'strategy_decision_v2', 'strategy_decision_v3', 'strategy_decision_v4', 'strategy_decision_v5')，默认 'strategy_decision_v2'
+            strategy_params: 可选的策略参数字典，原样传给对应版本的 StrategyAnalyzer（如 v3 的 bb_position_threshold）
         """
         self.strategy_version = strategy_version
+        self.strategy_params = strategy_params or {}
         self._load_strategy(deepseek_client)
     
     def _load_strategy(self, deepseek_client):
@@ -42,7 +47,7 @@ class StrategyInterface:
             from strategy_decision_v2 import StrategyAnalyzer
         
         # 实例化对应版本的策略分析器
-        self._strategy_analyzer = StrategyAnalyzer(deepseek_client)
+        self._strategy_analyzer = StrategyAnalyzer(deepseek_client, **self.strategy_params)
         print(f"✓ 策略版本: {self.strategy_version}")
     
     def analyze_market_strategy(self, price_data, signal_history, max_retries=2):
@@ -57,9 +62,117 @@ class StrategyInterface:
             max_retries=max_retries
         )
     
+    def supports_batch_signals(self):
+        """当前策略版本是否提供向量化的批量信号接口 (generate_signals)"""
+        return callable(getattr(self._strategy_analyzer, 'generate_signals', None))
+
+    def generate_signals(self, df):
+        """
+        批量生成整列交易信号的外部接口（用于回测）。
+
+        Args:
+            df: 已计算技术指标的完整K线数据。
+
+        Returns:
+            Series: 与 df 索引对齐的信号列 ('BUY'/'SELL'/'HOLD')。
+
+        Raises:
+            NotImplementedError: 当前策略版本不支持批量信号（如基于LLM的v1）。
+        """
+        if not self.supports_batch_signals():
+            raise NotImplementedError(f"策略 {self.strategy_version} 不支持批量信号生成")
+        return self._strategy_analyzer.generate_signals(df)
+
+    def supports_signal_prefetch(self):
+        """当前策略版本是否支持回测前并发预取逐根决策 (prefetch_signals，如基于LLM的v1)"""
+        return callable(getattr(self._strategy_analyzer, 'prefetch_signals', None))
+
+    def prefetch_signals(self, df, start=0, progress_callback=None):
+        """
+        回测前并发预取 [start, len(df)) 每根K线的决策，之后逐根调用 analyze_market_strategy 时直接使用。
+        progress_callback(已完成数, 总数) 抛出的异常会中止预取（用于后台任务取消）。
+
+        Returns:
+            int: 实际发出的请求数（不支持预取时为0）
+        """
+        if not self.supports_signal_prefetch():
+            return 0
+        return self._strategy_analyzer.prefetch_signals(df, start=start, progress_callback=progress_callback)
+
     def get_strategy_info(self):
         """获取当前策略版本信息"""
         return {
             'version': self.strategy_version,
             'name': getattr(self._strategy_analyzer, '__class__.__name__', 'Unknown')
         }
+
+
+class LiveStrategy:
+    """实时交易使用的长期策略实例。
+
+    只在以下情况重新创建 StrategyInterface，其余时候跨执行周期复用同一实例，
+    有状态或增量计算的策略可以保留预热状态：
+    - 策略配置文件的修改时间变化，且配置的策略版本发生变化
+    - 通过 reload_token_func 读到新的重新加载请求（如 Web 接口触发），此时无条件重建
+    """
+
+    def __init__(self, deepseek_client, load_config, config_path, reload_token_func=None,
+                 default_version='strategy_decision_v2'):
+        """
+        Args:
+            deepseek_client: DeepSeek AI客户端。
+            load_config: 读取策略配置的函数，返回 strategy_config.json 的内容。
+            config_path: 策略配置文件路径，用于检查修改时间。
+            reload_token_func: 可选，返回当前重新加载请求标识的函数，标识变化时强制重建。
+            default_version: 配置中没有实时策略版本时使用的版本。
+        """
+        self.deepseek_client = deepseek_client
+        self.load_config = load_config
+        self.config_path = config_path
+        self.reload_token_func = reload_token_func
+        self.default_version = default_version
+        self.interface = None
+        self.reloads = 0
+        self._config_mtime = None
+        # 读取失败时 _read_reload_token 返回上一次的标识，需先初始化
+        self._reload_token = None
+        self._reload_token = self._read_reload_token()
+
+    def _read_mtime(self):
+        try:
+            return os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read_reload_token(self):
+        if self.reload_token_func is None:
+            return None
+        try:
+            return self.reload_token_func()
+        except Exception as e:
+            print(f"⚠️ 读取策略重新加载请求失败: {e}")
+            return self._reload_token
+
+    def get(self):
+        """返回当前策略接口，按需重新加载"""
+        mtime = self._read_mtime()
+        token = self._read_reload_token()
+        forced = token != self._reload_token
+        if self.interface is not None and not forced and mtime == self._config_mtime:
+            return self.interface
+
+        config = self.load_config()
+        version = config.get('live_trading', {}).get('version', self.default_version)
+        self._config_mtime = mtime
+        self._reload_token = token
+        if self.interface is None or forced or version != self.interface.strategy_version:
+            reason = '手动重新加载' if forced and self.interface is not None else '配置变化'
+            if self.interface is not None:
+                print(f"🔄 {reason}，重建策略实例: {self.interface.strategy_version} -> {version}")
+            self.interface = StrategyInterface(self.deepseek_client, strategy_version=version)
+            self.reloads += 1
+        return self.interface
+
+    @property
+    def strategy_version(self):
+        return self.interface.strategy_version if self.interface else None
@@ -12,20 +12,37 @@ from datetime import datetime
 from openai import OpenAI
 
 # 导入所需的数据和分析函数
-from technical_analysis import generate_technical_analysis_text
-from market_data import get_recent_ai_analysis, get_recent_trades
+from technical_analysis import generate_technical_analysis_text, get_support_resistance_levels, get_market_trend
+from market_data import get_recent_ai_analysis, get_recent_trades, build_price_data
+from candle_store import timeframe_to_ms
+from llm_cache import deepseek_response_cache, make_key
+from llm_replay import RecordReplayClient
+
+SYSTEM_PROMPT = "你是专业的量化交易分析师，专门分析比特币市场。你必须严格按照JSON格式输出交易决策，不能有任何格式错误。"
 
 
 class StrategyAnalyzer:
     """策略分析器类 - 负责AI策略决策"""
     
-    def __init__(self, deepseek_client):
+    def __init__(self, deepseek_client, timeframe='15m', recent_analysis_func=None, recent_trades_func=None,
+                 context_bars=100, dispatcher=None):
         """初始化策略分析器
         
         Args:
-            deepseek_client: DeepSeek AI客户端
+            deepseek_client: DeepSeek AI客户端（也可传入 llm_replay.RecordReplayClient / StubChatClient）
+            timeframe: K线周期，price_data 只含 full_data 时（逐根回测）用于构造分析数据
+            recent_analysis_func: 获取最近AI分析记录的函数，默认读取实盘记录；回测时可传入返回空列表的函数
+            recent_trades_func: 获取最近交易记录的函数，默认读取实盘记录
+            context_bars: 逐根回测时构造分析数据所用的最近K线数量
+            dispatcher: 可选的 llm_dispatcher.LLMDispatcher，回测时用于并发预取各根K线的决策
         """
         self.deepseek_client = deepseek_client
+        self.timeframe = timeframe
+        self.recent_analysis_func = recent_analysis_func or get_recent_ai_analysis
+        self.recent_trades_func = recent_trades_func or get_recent_trades
+        self.context_bars = context_bars
+        self.dispatcher = dispatcher
+        self._prefetched = {}
     
     def safe_json_parse(self, json_str):
         """安全解析JSON字符串"""
@@ -52,9 +69,15 @@ class StrategyAnalyzer:
             "is_fallback": True
         }
 
-    def analyze_with_deepseek(self, price_data, signal_history):
-        """使用DeepSeek分析市场并生成交易信号（增强版）"""
+    def ensure_price_data(self, price_data):
+        """回测逐根调用时 price_data 只有 price/full_data，按最近K线补全技术分析数据"""
+        if 'technical_data' in price_data or 'full_data' not in price_data:
+            return price_data
+        context = price_data['full_data'].tail(self.context_bars)
+        return build_price_data(context, self.timeframe, get_support_resistance_levels, get_market_trend)
 
+    def build_request(self, price_data, signal_history):
+        """构造 chat.completions.create 的请求参数（同样的输入总是得到同样的请求）"""
         # 生成技术分析文本
         technical_analysis = generate_technical_analysis_text(price_data)
 
@@ -67,7 +90,7 @@ class StrategyAnalyzer:
             signal_text = f"\n【上次交易信号】\n信号: {last_signal.get('signal', 'N/A')}\n信心: {last_signal.get('confidence', 'N/A')}"
 
         # 获取最近5次AI分析历史
-        recent_ai_analysis = get_recent_ai_analysis(5)
+        recent_ai_analysis = self.recent_analysis_func(5)
         ai_analysis_history_text = ""
         if recent_ai_analysis:
             ai_analysis_history_text = "\n【最近5次AI分析历史】（供决策参考）\n"
@@ -75,7 +98,7 @@ class StrategyAnalyzer:
                 ai_analysis_history_text += f"{i+1}. {analysis['timestamp']} {analysis['signal']} @${analysis['btc_price']:.2f} ({analysis['confidence']}) [{analysis['position_desc']}] - {analysis['reason']}\n"
 
         # 获取最近5次交易记录
-        recent_trades = get_recent_trades(10)
+        recent_trades = self.recent_trades_func(10)
         trade_history_text = ""
         if recent_trades:
             trade_history_text = "\n【最近10次交易记录】\n"
@@ -131,7 +154,7 @@ BTC价格: ${price_data['price']:,.2f} USDT
   "reason": "详细的分析原因",
   "stop_loss": 数值,
   "take_profit": 数值,
-  "timestamp": "{datetime.now().isoformat()}"
+  "timestamp": "{price_data['timestamp']}"
 }}
 
 注意：
@@ -142,65 +165,56 @@ BTC价格: ${price_data['price']:,.2f} USDT
 - 严格按照JSON格式，确保可以被程序解析
 """
 
-        try:
-            print("🤖 正在调用DeepSeek AI分析...")
-            
-            response = self.deepseek_client.chat.completions.create(
-                model="deepseek-chat",
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "你是专业的量化交易分析师，专门分析比特币市场。你必须严格按照JSON格式输出交易决策，不能有任何格式错误。"
-                    },
-                    {
-                        "role": "user", 
-                        "content": prompt
-                    }
-                ],
-                max_tokens=1000,
-                temperature=0.1
-            )
-            
-            ai_response = response.choices[0].message.content.strip()
-            print(f"🤖 DeepSeek原始响应: {ai_response[:200]}...")
-
-            # 尝试从响应中提取JSON
-            json_match = re.search(r'\{.*?\}', ai_response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-                signal_data = self.safe_json_parse(json_str)
-                
-                if signal_data and all(key in signal_data for key in ['signal', 'confidence', 'reason']):
-                    # 验证signal字段
-                    if signal_data['signal'] not in ['BUY', 'SELL', 'HOLD']:
-                        print(f"⚠️ 无效的信号值: {signal_data['signal']}")
-                        return self.create_fallback_signal(price_data)
-                    
-                    # 验证confidence字段
-                    if signal_data['confidence'] not in ['HIGH', 'MEDIUM', 'LOW']:
-                        print(f"⚠️ 无效的信心值: {signal_data['confidence']}")
-                        signal_data['confidence'] = 'MEDIUM'  # 设置默认值
-                    
-                    # 设置默认的止损止盈（如果没有）
-                    if 'stop_loss' not in signal_data or not isinstance(signal_data['stop_loss'], (int, float)):
-                        signal_data['stop_loss'] = price_data['price'] * 0.98
-                        
-                    if 'take_profit' not in signal_data or not isinstance(signal_data['take_profit'], (int, float)):
-                        signal_data['take_profit'] = price_data['price'] * 1.02
-
-                    signal_data['timestamp'] = datetime.now().isoformat()
-                    signal_data['ai_response'] = ai_response
-                    signal_data['is_fallback'] = False
-                    
-                    print(f"✅ DeepSeek分析成功: {signal_data['signal']} ({signal_data['confidence']})")
-                    return signal_data
-                else:
-                    print("❌ JSON数据格式不完整")
-                    print(f"解析结果: {signal_data}")
-            else:
-                print("❌ 响应中未找到有效JSON")
-                print(f"完整响应: {ai_response}")
+        return {
+            'model': "deepseek-chat",
+            'messages': [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            'max_tokens': 1000,
+            'temperature': 0.1
+        }
 
+    def request_signal(self, request, price_data, timeout=None):
+        """调用模型并解析交易信号，无法解析时返回 None；timeout 为单次请求超时（秒）"""
+        print("🤖 正在调用DeepSeek AI分析...")
+        if timeout is None:
+            response = self.deepseek_client.chat.completions.create(**request)
+        else:
+            response = self.deepseek_client.chat.completions.create(**request, timeout=timeout)
+        ai_response = response.choices[0].message.content.strip()
+        print(f"🤖 DeepSeek原始响应: {ai_response[:200]}...")
+        signal_data = self.parse_ai_response(ai_response, price_data)
+        if signal_data is None and isinstance(self.deepseek_client, RecordReplayClient):
+            # 无法解析的响应不保留录制，重试时重新请求
+            self.deepseek_client.discard(request)
+        return signal_data
+
+    def analyze_with_deepseek(self, price_data, signal_history):
+        """使用DeepSeek分析市场并生成交易信号（增强版）"""
+        price_data = self.ensure_price_data(price_data)
+        request = self.build_request(price_data, signal_history)
+
+        def call_deepseek():
+            signal_data = self.request_signal(request, price_data)
+            return signal_data, signal_data is not None
+
+        try:
+            key = make_key(**request)
+            # 回测前已并发预取的决策直接使用
+            signal_data = self._prefetched.get(key)
+            if signal_data is None and isinstance(self.deepseek_client, RecordReplayClient):
+                # 回测的录制/回放/直连语义由 RecordReplayClient 决定，不经过进程级决策缓存
+                signal_data = self.request_signal(request, price_data)
+            elif signal_data is None:
+                # 同一根K线内输入完全相同的重试（如上次响应无法解析后再次执行）直接复用决策，
+                # 并发的相同请求只调用一次
+                ttl = timeframe_to_ms(price_data.get('timeframe', '15m')) / 1000.0
+                signal_data = deepseek_response_cache.get_or_compute(key, ttl, call_deepseek)
+            if signal_data:
+                signal_data = dict(signal_data, timestamp=datetime.now().isoformat())
+                print(f"✅ DeepSeek分析成功: {signal_data['signal']} ({signal_data['confidence']})")
+                return signal_data
         except Exception as e:
             print(f"❌ DeepSeek API调用失败: {e}")
 
@@ -208,6 +222,76 @@ BTC价格: ${price_data['price']:,.2f} USDT
         print("🔄 使用回退信号")
         return self.create_fallback_signal(price_data)
 
+    def prefetch_signals(self, df, start=0, progress_callback=None):
+        """
+        回测前并发预取 [start, len(df)) 每根K线的决策（需要 dispatcher）。
+        回测中各根K线的 prompt 只由K线决定、相互独立，经调度器有界并发、限流、超时请求后按顺序收集，
+        逐根回测时 analyze_with_deepseek 直接使用预取结果。已录制的请求（RecordReplayClient）不再预取。
+        progress_callback(已完成数, 总数) 抛出异常时停止发出剩余请求并原样抛出。
+
+        Returns:
+            int: 实际发出的请求数
+        """
+        if self.dispatcher is None:
+            return 0
+        is_recorded = getattr(self.deepseek_client, 'is_recorded', None)
+        jobs = []
+        for i in range(max(start, 1), len(df)):
+            context = df.iloc[max(0, i + 1 - self.context_bars):i + 1]
+            price_data = build_price_data(context, self.timeframe, get_support_resistance_levels, get_market_trend)
+            request = self.build_request(price_data, [])
+            key = make_key(**request)
+            if key in self._prefetched or (is_recorded is not None and is_recorded(request)):
+                continue
+            jobs.append((key, request, price_data))
+
+        if jobs:
+            print(f"🚀 并发预取LLM决策: {len(jobs)} 根K线，并发数 {self.dispatcher.max_concurrency}")
+        results = self.dispatcher.map(
+            lambda job: self.request_signal(job[1], job[2], timeout=self.dispatcher.timeout), jobs,
+            progress_callback=progress_callback
+        )
+        for (key, _, _), signal_data in zip(jobs, results):
+            if signal_data is not None:
+                self._prefetched[key] = signal_data
+        return len(jobs)
+
+    def parse_ai_response(self, ai_response, price_data):
+        """从模型响应中解析并校验交易信号，无法解析时返回 None"""
+        # 尝试从响应中提取JSON
+        json_match = re.search(r'\{.*?\}', ai_response, re.DOTALL)
+        if not json_match:
+            print("❌ 响应中未找到有效JSON")
+            print(f"完整响应: {ai_response}")
+            return None
+
+        signal_data = self.safe_json_parse(json_match.group(0))
+        if not (signal_data and all(key in signal_data for key in ['signal', 'confidence', 'reason'])):
+            print("❌ JSON数据格式不完整")
+            print(f"解析结果: {signal_data}")
+            return None
+
+        # 验证signal字段
+        if signal_data['signal'] not in ['BUY', 'SELL', 'HOLD']:
+            print(f"⚠️ 无效的信号值: {signal_data['signal']}")
+            return None
+
+        # 验证confidence字段
+        if signal_data['confidence'] not in ['HIGH', 'MEDIUM', 'LOW']:
+            print(f"⚠️ 无效的信心值: {signal_data['confidence']}")
+            signal_data['confidence'] = 'MEDIUM'  # 设置默认值
+
+        # 设置默认的止损止盈（如果没有）
+        if 'stop_loss' not in signal_data or not isinstance(signal_data['stop_loss'], (int, float)):
+            signal_data['stop_loss'] = price_data['price'] * 0.98
+
+        if 'take_profit' not in signal_data or not isinstance(signal_data['take_profit'], (int, float)):
+            signal_data['take_profit'] = price_data['price'] * 1.02
+
+        signal_data['ai_response'] = ai_response
+        signal_data['is_fallback'] = False
+        return signal_data
+
     def analyze_market_strategy(self, price_data, signal_history, max_retries=2):
         """带重试的DeepSeek策略分析 - 对外接口"""
         for attempt in range(max_retries + 1):
@@ -7,6 +7,8 @@
 """
 
 from datetime import datetime
+import numpy as np
+import pandas as pd
 
 class StrategyAnalyzer:
     """
@@ -74,6 +76,28 @@ class StrategyAnalyzer:
             print(f"❌ V2策略分析失败: {e}")
             return self._create_signal('HOLD', 'LOW', f"策略分析异常: {e}", price_data.get('price', 0))
 
+    def generate_signals(self, df):
+        """
+        批量生成整列交易信号（向量化版本），结果与逐根调用 analyze_market_strategy 一致。
+        第 i 根的信号只使用第 i 根及之前的数据，不引入未来函数。
+
+        Args:
+            df (DataFrame): 已计算技术指标的完整K线数据。
+
+        Returns:
+            Series: 与 df 索引对齐的信号列 ('BUY'/'SELL'/'HOLD')。
+        """
+        signal_line = df['macd_signal']
+        signal_prev_3 = signal_line.shift(3).to_numpy()  # P-3
+        signal_prev_2 = signal_line.shift(2).to_numpy()  # P-2
+        signal_prev_1 = signal_line.shift(1).to_numpy()  # P-1
+        # 前3根K线的shift为NaN，比较结果为False，自然对应"数据不足"时的HOLD
+
+        buy = (signal_prev_3 > signal_prev_2) & (signal_prev_2 < signal_prev_1) & (signal_prev_2 < 0)
+        sell = (signal_prev_3 < signal_prev_2) & (signal_prev_2 > signal_prev_1) & (signal_prev_2 > 0)
+
+        return pd.Series(np.select([buy, sell], ['BUY', 'SELL'], default='HOLD'), index=df.index)
+
     def _create_signal(self, signal, confidence, reason, price=0):
         """
         创建一个标准格式的信号字典。
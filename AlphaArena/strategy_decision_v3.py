@@ -7,6 +7,8 @@
 """
 
 from datetime import datetime
+import numpy as np
+import pandas as pd
 
 class StrategyAnalyzer:
     """
@@ -26,14 +28,20 @@ class StrategyAnalyzer:
     - 卖出：MACD柱状图倒V型 + 价格持续在布林带上部，表示上涨动能衰减且价格已高，趋势可能反转
     """
     
-    def __init__(self, deepseek_client=None):
+    def __init__(self, deepseek_client=None, bb_position_threshold=0.6, bb_position_window=10):
         """
         初始化策略分析器。
         
         Args:
             deepseek_client: 为了保持接口兼容性而保留，但在此版本中未使用。
+            bb_position_threshold: 卖出时前N个点布林带平均位置的阈值，默认0.6。
+            bb_position_window: 计算布林带平均位置的点数N，默认10。
         """
         # V3版本不使用deepseek_client，但保留参数以兼容接口
+        self.bb_position_threshold = bb_position_threshold
+        self.bb_position_window = int(bb_position_window)
+        # 需要 N+1 根计算布林带平均位置，再加上MACD柱状图的 P-3
+        self.min_bars = self.bb_position_window + 3
         print("🤖 初始化策略决策模块 V3 (布林带下轨买入 + MACD倒V卖出)")
     
     def analyze_market_strategy(self, price_data, signal_history, max_retries=2):
@@ -50,8 +58,8 @@ class StrategyAnalyzer:
         """
         try:
             df = price_data.get('full_data')
-            if df is None or len(df) < 13:
-                return self._create_signal('HOLD', 'LOW', 'K线数据不足（需要至少13根K线）')
+            if df is None or len(df) < self.min_bars:
+                return self._create_signal('HOLD', 'LOW', f'K线数据不足（需要至少{self.min_bars}根K线）')
 
             # 获取当前和前一根K线的收盘价和布林带值
             close_current = df['close'].iloc[-1]
@@ -67,10 +75,11 @@ class StrategyAnalyzer:
             hist_prev = df['macd_histogram'].iloc[-2]     # P-1
             # 注意：不使用当前柱 hist_current，避免look-ahead bias
 
-            # 计算前10个点（不包括当前点）在布林带中的位置平均值
+            # 计算前N个点（默认10个，不包括当前点）在布林带中的位置平均值
             # bb_position 定义：(close - bb_lower) / (bb_upper - bb_lower)
             # 值越接近1表示越靠近上轨，越接近0表示越靠近下轨
-            bb_positions = df['bb_position'].iloc[-11:-1]  # 前10个点
+            window = self.bb_position_window
+            bb_positions = df['bb_position'].iloc[-(window + 1):-1]  # 前N个点
             avg_bb_position = bb_positions.mean()
 
             current_price = price_data['price']
@@ -85,12 +94,12 @@ class StrategyAnalyzer:
                 reason += "价格向下突破布林带下轨且MACD呈下降趋势，预期反弹。"
                 return self._create_signal('BUY', 'HIGH', reason, current_price, bb_middle_current)
 
-            # 卖出信号：MACD柱状图形成倒V型 + 前10个点平均位置在上部区域（>0.6）
+            # 卖出信号：MACD柱状图形成倒V型 + 前N个点平均位置在上部区域（默认>0.6）
             # bb_position > 0.6 表示价格接近布林带上半部分
             elif (hist_prev_3 < hist_prev_2 and hist_prev_2 > hist_prev 
-                  and avg_bb_position > 0.6):
+                  and avg_bb_position > self.bb_position_threshold):
                 reason = f"MACD柱状图: P-3={hist_prev_3:.4f}, P-2={hist_prev_2:.4f}, P-1={hist_prev:.4f}. "
-                reason += f"前10个点布林带平均位置={avg_bb_position:.3f} (>0.6表示靠近上轨). "
+                reason += f"前{window}个点布林带平均位置={avg_bb_position:.3f} (>{self.bb_position_threshold}表示靠近上轨). "
                 reason += "MACD柱状图形成倒V型顶部且价格位于布林带上部，上涨动能衰减，看跌。"
                 return self._create_signal('SELL', 'HIGH', reason, current_price)
             
@@ -98,7 +107,7 @@ class StrategyAnalyzer:
             else:
                 reason = f"价格={close_current:.2f}, 布林带下轨={bb_lower_current:.2f}; "
                 reason += f"MACD: P-3={hist_prev_3:.4f}, P-2={hist_prev_2:.4f}, P-1={hist_prev:.4f}; "
-                reason += f"前10点布林带平均位置={avg_bb_position:.3f}. "
+                reason += f"前{window}点布林带平均位置={avg_bb_position:.3f}. "
                 reason += "未出现买入或卖出信号。"
                 return self._create_signal('HOLD', 'MEDIUM', reason, current_price)
 
@@ -106,6 +115,49 @@ class StrategyAnalyzer:
             print(f"❌ V3策略分析失败: {e}")
             return self._create_signal('HOLD', 'LOW', f"策略分析异常: {e}", price_data.get('price', 0))
 
+    def generate_signals(self, df):
+        """
+        批量生成整列交易信号（向量化版本），结果与逐根调用 analyze_market_strategy 一致。
+        第 i 根的信号只使用第 i 根及之前的数据，不引入未来函数。
+
+        Args:
+            df (DataFrame): 已计算技术指标的完整K线数据。
+
+        Returns:
+            Series: 与 df 索引对齐的信号列 ('BUY'/'SELL'/'HOLD')。
+        """
+        n = len(df)
+        close_current = df['close'].to_numpy()
+        close_prev = df['close'].shift(1).to_numpy()
+        bb_lower_current = df['bb_lower'].to_numpy()
+        bb_lower_prev = df['bb_lower'].shift(1).to_numpy()
+
+        hist = df['macd_histogram']
+        hist_prev_3 = hist.shift(3).to_numpy()  # P-3
+        hist_prev_2 = hist.shift(2).to_numpy()  # P-2
+        hist_prev = hist.shift(1).to_numpy()    # P-1
+
+        # 前N个点（不包括当前点）布林带位置的平均值，与 Series.mean() 一样跳过NaN
+        window = self.bb_position_window
+        avg_bb_position = np.full(n, np.nan)
+        if n > window:
+            bb_position = df['bb_position'].to_numpy(dtype=float)
+            valid = ~np.isnan(bb_position)
+            windows = np.lib.stride_tricks.sliding_window_view(np.where(valid, bb_position, 0.0), window)[:-1]
+            counts = np.lib.stride_tricks.sliding_window_view(valid, window)[:-1].sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                avg_bb_position[window:] = np.where(counts > 0, windows.sum(axis=1) / counts, np.nan)
+
+        buy = ((close_prev >= bb_lower_prev) & (close_current < bb_lower_current)
+               & (hist_prev_3 > hist_prev_2) & (hist_prev_2 > hist_prev))
+        sell = ((hist_prev_3 < hist_prev_2) & (hist_prev_2 > hist_prev)
+                & (avg_bb_position > self.bb_position_threshold))
+
+        # K线数量不足时与逐根分析保持一致，统一为HOLD
+        enough_data = np.arange(n) >= self.min_bars - 1
+        return pd.Series(np.select([buy & enough_data, sell & enough_data], ['BUY', 'SELL'], default='HOLD'),
+                         index=df.index)
+
     def _create_signal(self, signal, confidence, reason, price=0, target_price=None):
         """
         创建一个标准格式的信号字典。
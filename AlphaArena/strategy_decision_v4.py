@@ -8,6 +8,8 @@
 """
 
 from datetime import datetime
+import numpy as np
+import pandas as pd
 
 class StrategyAnalyzer:
     """
@@ -105,6 +107,41 @@ class StrategyAnalyzer:
             print(f"❌ V2策略分析失败: {e}")
             return self._create_signal('HOLD', 'LOW', f"策略分析异常: {e}", price_data.get('price', 0))
 
+    def generate_signals(self, df):
+        """
+        批量生成整列交易信号（向量化版本），结果与逐根调用 analyze_market_strategy 一致。
+        第 i 根的信号只使用第 i 根及之前的数据，不引入未来函数。
+
+        Args:
+            df (DataFrame): 已计算技术指标的完整K线数据。
+
+        Returns:
+            Series: 与 df 索引对齐的信号列 ('BUY'/'SELL'/'HOLD')。
+        """
+        signal_line = df['macd_signal']
+        signal_prev_3 = signal_line.shift(3).to_numpy()  # P-3
+        signal_prev_2 = signal_line.shift(2).to_numpy()  # P-2
+        signal_prev_1 = signal_line.shift(1).to_numpy()  # P-1
+        current_price = df['close'].to_numpy()
+        prev_price = df['close'].shift(1).to_numpy()
+        current_bb_middle = df['bb_middle'].to_numpy()
+        prev_bb_middle = df['bb_middle'].shift(1).to_numpy()
+
+        v_turn = (signal_prev_3 > signal_prev_2) & (signal_prev_2 < signal_prev_1)
+        inverted_v_turn = (signal_prev_3 < signal_prev_2) & (signal_prev_2 > signal_prev_1)
+
+        # 买入过滤：正在向上穿越中轨，或已在中轨上方
+        above_middle = (((prev_price < prev_bb_middle) & (current_price > current_bb_middle))
+                        | ((prev_price > prev_bb_middle) & (current_price > current_bb_middle)))
+        # 卖出过滤：正在向下穿越中轨，或已在中轨下方
+        below_middle = (((prev_price > prev_bb_middle) & (current_price < current_bb_middle))
+                        | ((prev_price < prev_bb_middle) & (current_price < current_bb_middle)))
+
+        buy = v_turn & ~above_middle
+        sell = inverted_v_turn & ~below_middle
+
+        return pd.Series(np.select([buy, sell], ['BUY', 'SELL'], default='HOLD'), index=df.index)
+
     def _create_signal(self, signal, confidence, reason, price=0):
         """
         创建一个标准格式的信号字典。
@@ -13,22 +13,53 @@ from datetime import datetime, timedelta
 import json
 import re
 
+from sentiment_cache import SentimentCache
 
-def calculate_technical_indicators(df):
-    """计算技术指标 - 来自第一个策略"""
+# 恐慌贪婪指数API（可替换为本地服务用于测试）
+SENTIMENT_API_URL = 'https://api.alternative.me/fng/?limit=10'
+
+
+def calculate_macd(close, fast=12, slow=26, signal=9):
+    """计算MACD相关列，返回 {ema_12, ema_26, macd, macd_signal, macd_histogram}（列名固定，周期可调）"""
+    ema_fast = close.ewm(span=fast).mean()
+    ema_slow = close.ewm(span=slow).mean()
+    macd = ema_fast - ema_slow
+    macd_signal = macd.ewm(span=signal).mean()
+    return {
+        'ema_12': ema_fast,
+        'ema_26': ema_slow,
+        'macd': macd,
+        'macd_signal': macd_signal,
+        # MACD柱状图归一化: (MACD柱子 ÷ 当前价格) × 10000
+        'macd_histogram': ((macd - macd_signal) / close) * 10000
+    }
+
+
+def calculate_bollinger(close, period=20, num_std=2):
+    """计算布林带相关列，返回 {bb_middle, bb_upper, bb_lower, bb_position}"""
+    bb_middle = close.rolling(period).mean()
+    bb_std = close.rolling(period).std()
+    bb_upper = bb_middle + (bb_std * num_std)
+    bb_lower = bb_middle - (bb_std * num_std)
+    return {
+        'bb_middle': bb_middle,
+        'bb_upper': bb_upper,
+        'bb_lower': bb_lower,
+        'bb_position': (close - bb_lower) / (bb_upper - bb_lower)
+    }
+
+
+def calculate_technical_indicators(df, bb_period=20, bb_std=2, macd_fast=12, macd_slow=26, macd_signal=9):
+    """计算技术指标 - 来自第一个策略（布林带与MACD周期可调，默认值即实盘参数）"""
     try:
         # 移动平均线
         df['sma_5'] = df['close'].rolling(window=5, min_periods=1).mean()
         df['sma_20'] = df['close'].rolling(window=20, min_periods=1).mean()
         df['sma_50'] = df['close'].rolling(window=50, min_periods=1).mean()
 
-        # 指数移动平均线
-        df['ema_12'] = df['close'].ewm(span=12).mean()
-        df['ema_26'] = df['close'].ewm(span=26).mean()
-        df['macd'] = df['ema_12'] - df['ema_26']
-        df['macd_signal'] = df['macd'].ewm(span=9).mean()
-        # MACD柱状图归一化: (MACD柱子 ÷ 当前价格) × 10000
-        df['macd_histogram'] = ((df['macd'] - df['macd_signal']) / df['close']) * 10000
+        # 指数移动平均线 / MACD
+        for col, values in calculate_macd(df['close'], macd_fast, macd_slow, macd_signal).items():
+            df[col] = values
 
         # 相对强弱指数 (RSI)
         delta = df['close'].diff()
@@ -38,11 +69,8 @@ def calculate_technical_indicators(df):
         df['rsi'] = 100 - (100 / (1 + rs))
 
         # 布林带
-        df['bb_middle'] = df['close'].rolling(20).mean()
-        bb_std = df['close'].rolling(20).std()
-        df['bb_upper'] = df['bb_middle'] + (bb_std * 2)
-        df['bb_lower'] = df['bb_middle'] - (bb_std * 2)
-        df['bb_position'] = (df['close'] - df['bb_lower']) / (df['bb_upper'] - df['bb_lower'])
+        for col, values in calculate_bollinger(df['close'], bb_period, bb_std).items():
+            df[col] = values
 
         # 成交量均线
         df['volume_ma'] = df['volume'].rolling(20).mean()
@@ -157,11 +185,11 @@ MACD信号线: {', '.join(macd_data)}
     return analysis_text
 
 
-def get_sentiment_indicators():
-    """获取市场情绪指标"""
+def fetch_sentiment_indicators(url=None):
+    """请求市场情绪指标（直接调用外部API，一般应通过 get_sentiment_indicators 读取缓存）"""
     try:
         # 使用Alternative.me的恐慌贪婪指数
-        response = requests.get('https://api.alternative.me/fng/?limit=10', timeout=10)
+        response = requests.get(url or SENTIMENT_API_URL, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
@@ -246,6 +274,15 @@ def get_sentiment_indicators():
         }
 
 
+# 全局情绪指标缓存（恐慌贪婪指数每天更新一次，TTL 1小时）
+sentiment_cache = SentimentCache(fetch_sentiment_indicators)
+
+
+def get_sentiment_indicators():
+    """获取市场情绪指标（带缓存：过期时返回旧值并在后台刷新，不阻塞调用方）"""
+    return sentiment_cache.get()
+
+
 def calculate_integrated_trading_score(current_price, technical_data, sentiment_data=None, position_info=None):
     """
     集成买卖判别函数 - 基于deepseekok2.py的策略
@@ -373,4 +410,103 @@ def calculate_integrated_trading_score(current_price, technical_data, sentiment_
         
     except Exception as e:
         print(f"集成决策函数错误: {e}")
-        return 0
\ No newline at end of file
+        return 0
+
+def calculate_integrated_trading_scores(df, sentiment_data=None, position_info=None):
+    """
+    集成买卖判别函数的向量化版本 - 对整个DataFrame逐列计算评分
+    与 calculate_integrated_trading_score 逐行调用的结果完全一致（运算顺序相同）
+    返回与 df 索引对齐的评分 Series
+    """
+    close = df['close'].to_numpy(dtype=float)
+    sma_5 = df['sma_5'].to_numpy(dtype=float)
+    sma_20 = df['sma_20'].to_numpy(dtype=float)
+    sma_50 = df['sma_50'].to_numpy(dtype=float)
+    rsi = df['rsi'].to_numpy(dtype=float)
+    macd = df['macd'].to_numpy(dtype=float)
+    macd_signal = df['macd_signal'].to_numpy(dtype=float)
+    macd_histogram = df['macd_histogram'].to_numpy(dtype=float)
+    bb_position = df['bb_position'].to_numpy(dtype=float)
+
+    # 1. 技术分析主导 (权重60%)
+    # 1.1 趋势分析 - 均线排列
+    bullish = (sma_5 > sma_20) & (sma_20 > sma_50)
+    bearish = (sma_5 < sma_20) & (sma_20 < sma_50)
+    tech_score = np.select(
+        [bullish & (close > sma_5), bullish,
+         bearish & (close < sma_5), bearish,
+         close > sma_20, close < sma_20],
+        [40, 25, -40, -25, 10, -10],
+        default=0
+    )
+
+    # 1.2 RSI分析
+    rsi_healthy = (rsi >= 30) & (rsi <= 70)
+    tech_score = tech_score + np.select(
+        [rsi_healthy & (rsi > 55), rsi_healthy & (rsi < 45),
+         ~rsi_healthy & (rsi > 70), ~rsi_healthy & (rsi < 30)],
+        [8, -8, -12, 12],
+        default=0
+    )
+
+    # 1.3 MACD分析（空头分支中柱状图非负时为 -(-8)，与标量函数保持一致）
+    macd_above = macd > macd_signal
+    tech_score = tech_score + np.select(
+        [macd_above & (macd_histogram > 0), macd_above,
+         macd_histogram < 0],
+        [15, 8, -15],
+        default=8
+    )
+
+    # 1.4 布林带分析
+    bb_normal = (bb_position >= 0.2) & (bb_position <= 0.8)
+    tech_score = tech_score + np.select(
+        [bb_normal & (bb_position > 0.6), bb_normal & (bb_position < 0.4),
+         ~bb_normal & (bb_position > 0.8), ~bb_normal & (bb_position < 0.2)],
+        [5, -5, -8, 8],
+        default=0
+    )
+
+    score = tech_score * 0.6
+
+    # 2. 市场情绪辅助 (权重30%)
+    if sentiment_data:
+        net_sentiment = sentiment_data.get('net_sentiment', 0)
+        if abs(net_sentiment) > 0.2:
+            base_sentiment = net_sentiment * 100
+        elif abs(net_sentiment) > 0.1:
+            base_sentiment = net_sentiment * 60
+        else:
+            base_sentiment = net_sentiment * 30
+
+        tech_direction = np.sign(tech_score)
+        sentiment_direction = 1 if base_sentiment > 0 else -1 if base_sentiment < 0 else 0
+        sentiment_score = np.select(
+            [(tech_direction == sentiment_direction) & (tech_direction != 0),
+             (tech_direction != sentiment_direction) & (tech_direction != 0)],
+            [base_sentiment * 1.2, base_sentiment * 0.6],
+            default=base_sentiment
+        )
+        score = score + sentiment_score * 0.3
+
+    # 3. 风险管理 (权重10%)
+    risk_score = np.zeros(len(df))
+    if position_info:
+        unrealized_pnl = position_info.get('unrealized_pnl', 0)
+        position_side = position_info.get('side', '')
+        if unrealized_pnl > 0:
+            if position_side == 'long':
+                risk_score = np.where(score > 20, -5, 0)
+            elif position_side == 'short':
+                risk_score = np.where(score < -20, 5, 0)
+        elif unrealized_pnl < -50:
+            if position_side == 'long':
+                risk_score = np.where(score < -10, -10, 0)
+            elif position_side == 'short':
+                risk_score = np.where(score > 10, 10, 0)
+
+    score = score + risk_score * 0.1
+
+    # 确保评分在合理范围内；使用内置round保持与标量函数相同的舍入结果
+    score = np.clip(score, -100, 100)
+    return pd.Series([round(s, 1) for s in score.tolist()], index=df.index, dtype=float)
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+# 各模块按脚本目录平铺导入（from data_manager import ...）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def isolated_cwd(tmp_path, monkeypatch):
+    """DataManager 等使用相对路径 data/，每个测试在独立的临时目录中运行"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
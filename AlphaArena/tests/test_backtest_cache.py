@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from backtest_cache import BacktestResultCache
+from candle_store import timeframe_to_ms
+
+
+def make_candles(interval, n=50, closed=False):
+    """最后一根为当前未收盘K线（closed=True 时整段都已收盘）"""
+    tf = pd.Timedelta(milliseconds=timeframe_to_ms(interval))
+    now = pd.Timestamp.now(tz='Asia/Shanghai').tz_localize(None)
+    last = now.floor(tf) - (2 * tf if closed else pd.Timedelta(0))
+    close = 60000 + np.arange(n, dtype=float)
+    return pd.DataFrame({
+        'timestamp': pd.date_range(end=last, periods=n, freq=tf),
+        'open': close, 'high': close + 10, 'low': close - 10, 'close': close, 'volume': np.full(n, 100.0),
+    })
+
+
+def test_open_candle_is_not_part_of_key_on_short_intervals(tmp_path):
+    cache = BacktestResultCache(cache_dir=str(tmp_path))
+    df = make_candles('15m')
+    key = cache.make_key('strategy_decision_v3', '15m', 2, df)
+    df.loc[df.index[-1], 'close'] += 50
+    assert key is not None
+    assert cache.make_key('strategy_decision_v3', '15m', 2, df) == key
+
+
+def test_long_interval_with_open_candle_is_not_cached(tmp_path):
+    cache = BacktestResultCache(cache_dir=str(tmp_path))
+    assert cache.make_key('strategy_decision_v3', '4h', 10, make_candles('4h')) is None
+    assert cache.make_key('strategy_decision_v3', '1d', 30, make_candles('1d')) is None
+    # 截至已收盘K线的回测结果不会再变化，可以缓存
+    assert cache.make_key('strategy_decision_v3', '1d', 30, make_candles('1d', closed=True)) is not None
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+RULE_VERSIONS = ['strategy_decision_v2', 'strategy_decision_v3', 'strategy_decision_v4', 'strategy_decision_v5']
+
+
+@pytest.fixture(scope='module')
+def backtest(tmp_path_factory):
+    pytest.importorskip('ccxt')
+    pytest.importorskip('openai')
+    pytest.importorskip('requests')
+    pytest.importorskip('dotenv')
+    # 导入时会在当前目录创建 DataManager，需在临时目录中导入
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(tmp_path_factory.mktemp('backtest'))
+        import backtest
+    return backtest
+
+
+@pytest.fixture(scope='module')
+def candles(backtest):
+    from technical_analysis import calculate_technical_indicators
+    rng = np.random.default_rng(11)
+    n = 96 * 4
+    close = 60000 + np.cumsum(rng.normal(0, 150, n)) + 800 * np.sin(np.arange(n) / 15)
+    df = pd.DataFrame({
+        'timestamp': pd.date_range('2026-10-01', periods=n, freq='15min'),
+        'open': close + rng.normal(0, 30, n),
+        'high': close + np.abs(rng.normal(0, 80, n)),
+        'low': close - np.abs(rng.normal(0, 80, n)),
+        'close': close,
+        'volume': rng.uniform(50, 500, n),
+    })
+    return calculate_technical_indicators(df)
+
+
+@pytest.mark.parametrize('strategy_version', RULE_VERSIONS)
+def test_engines_produce_identical_backtests(backtest, candles, strategy_version):
+    results = {
+        engine: backtest.simulate_strategy(candles, strategy_version=strategy_version, warmup_candles=96,
+                                           engine=engine, verbose=False)
+        for engine in ('batch', 'cursor', 'copy')
+    }
+    reference = results['copy']
+    assert reference['trades']
+    for engine in ('batch', 'cursor'):
+        assert results[engine]['trades'] == reference['trades'], engine
+        assert results[engine]['decisions'] == reference['decisions'], engine
+        assert results[engine]['equity_curve'] == reference['equity_curve'], engine
+        assert results[engine]['stats'] == reference['stats'], engine
@@ -0,0 +1,58 @@
+import time
+
+from candle_store import CandleStore, timeframe_to_ms
+
+SYMBOL = 'BTC/USDT:USDT'
+TF_MS = timeframe_to_ms('15m')
+
+
+class FakeExchange:
+    """按 since/limit 返回 [first_ts, last_ts] 内的K线；outage 为 True 时返回空列表"""
+
+    def __init__(self, first_ts, last_ts):
+        self.first_ts, self.last_ts = first_ts, last_ts
+        self.outage = False
+        self.calls = 0
+
+    def fetch_ohlcv(self, symbol, timeframe, since, limit):
+        self.calls += 1
+        if self.outage:
+            return []
+        start = max(self.first_ts, -(-since // TF_MS) * TF_MS)
+        return [[ts, 1.0, 2.0, 0.5, 1.5, 10.0] for ts in range(start, self.last_ts + 1, TF_MS)][:limit]
+
+
+def test_empty_response_is_not_marked_covered(tmp_path):
+    store = CandleStore(db_path=str(tmp_path / 'candles.sqlite3'))
+    end = (int(time.time() * 1000) // TF_MS - 100) * TF_MS
+    since = end - 50 * TF_MS
+    exchange = FakeExchange(since - 200 * TF_MS, end + 10 * TF_MS)
+
+    exchange.outage = True
+    assert store.load(exchange, SYMBOL, '15m', since, end) == []
+    assert store.find_gaps(SYMBOL, '15m', since, end) == [(since, end)]
+
+    exchange.outage = False
+    assert len(store.load(exchange, SYMBOL, '15m', since, end)) == 51
+    assert store.find_gaps(SYMBOL, '15m', since, end) == []
+
+
+def test_newest_candle_is_not_persisted(tmp_path):
+    store = CandleStore(db_path=str(tmp_path / 'candles.sqlite3'))
+    # 交易所最新一根K线按本地时钟已收盘（时钟偏差），但之后还没有更晚的K线
+    newest = (int(time.time() * 1000) // TF_MS - 5) * TF_MS
+    since = newest - 20 * TF_MS
+    exchange = FakeExchange(since - 100 * TF_MS, newest)
+
+    rows = store.load(exchange, SYMBOL, '15m', since, newest + TF_MS)
+    assert rows[-1][0] == newest
+    assert store.get_rows(SYMBOL, '15m', since, newest)[-1][0] == newest - TF_MS
+    assert store.find_gaps(SYMBOL, '15m', since, newest) == [(newest, newest)]
+
+
+def test_database_is_created_on_first_use(tmp_path):
+    db_path = tmp_path / 'store' / 'candles.sqlite3'
+    store = CandleStore(db_path=str(db_path))
+    assert not db_path.exists()
+    assert store.find_gaps(SYMBOL, '15m', 0, TF_MS) == [(0, TF_MS)]
+    assert db_path.exists()
@@ -0,0 +1,31 @@
+import pytest
+
+
+@pytest.fixture
+def manager():
+    from data_manager import DataManager
+    return DataManager()
+
+
+def read_all_pages(manager, page_size):
+    records, cursor = [], None
+    while True:
+        page, cursor = manager.get_trades_page(page_size=page_size, cursor=cursor)
+        records.extend(page)
+        if cursor is None:
+            return records
+
+
+def test_cursor_pages_cover_all_records(manager):
+    for i in range(7):
+        manager.save_trade_record({'timestamp': f'2026-10-10 12:0{i}:00', 'action': 'OPEN_LONG', 'n': i})
+    manager.save_trade_record({'action': 'OPEN_LONG', 'n': 'no-timestamp'})
+
+    records = read_all_pages(manager, page_size=3)
+    assert [r['n'] for r in records] == [6, 5, 4, 3, 2, 1, 0, 'no-timestamp']
+
+
+@pytest.mark.parametrize('cursor', ['garbage', '2026-10-10 12:00:00|', '2026-10-10|abc', '|-1'])
+def test_malformed_cursor_is_rejected(manager, cursor):
+    with pytest.raises(ValueError):
+        manager.get_trades_page(page_size=3, cursor=cursor)
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('requests')
+
+from indicator_engine import IncrementalIndicatorEngine, INDICATOR_COLUMNS
+from technical_analysis import calculate_technical_indicators
+
+
+def make_candles(n, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 60000 + np.cumsum(rng.normal(0, 120, n))
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2026-10-01', periods=n, freq='15min'),
+        'open': close + rng.normal(0, 30, n),
+        'high': close + np.abs(rng.normal(0, 60, n)),
+        'low': close - np.abs(rng.normal(0, 60, n)),
+        'close': close,
+        'volume': rng.uniform(50, 500, n),
+    })
+
+
+def assert_batch_parity(result, window):
+    expected = calculate_technical_indicators(window.copy())
+    for col in INDICATOR_COLUMNS:
+        np.testing.assert_allclose(result[col].to_numpy(dtype=float), expected[col].to_numpy(dtype=float),
+                                   rtol=1e-9, atol=1e-6, err_msg=col)
+
+
+def count_warm_ups(engine, monkeypatch):
+    calls = []
+    original = engine.warm_up
+
+    def warm_up(df):
+        calls.append(len(df))
+        return original(df)
+
+    monkeypatch.setattr(engine, 'warm_up', warm_up)
+    return calls
+
+
+def test_sliding_window_updates_without_warm_up(monkeypatch):
+    candles = make_candles(400)
+    engine = IncrementalIndicatorEngine()
+    warm_ups = count_warm_ups(engine, monkeypatch)
+    start = 0
+    for end in range(96, 196):
+        # 实盘每根新K线取到的固定长度滑动窗口，最后一根为未收盘K线
+        window = candles.iloc[end - 96:end].reset_index(drop=True)
+        result = engine.calculate(window.copy())
+        assert len(result) == len(window)
+        # 与从初始化起点开始的完整历史上的批量结果一致
+        history = candles.iloc[start:end]
+        expected = calculate_technical_indicators(history.copy()).tail(len(window))
+        for col in INDICATOR_COLUMNS:
+            np.testing.assert_allclose(result[col].to_numpy(dtype=float), expected[col].to_numpy(dtype=float),
+                                       rtol=1e-9, atol=1e-6, err_msg=col)
+        # 与对窗口直接批量计算相比：窗口末尾的固定窗口指标一致，EMA系列仅有截断误差
+        last = result.iloc[-1]
+        batch_last = calculate_technical_indicators(window.copy()).iloc[-1]
+        for col in INDICATOR_COLUMNS:
+            if col.startswith(('ema', 'macd')):
+                assert abs(last[col] - batch_last[col]) < 2e-4 * last['close'], col
+            else:
+                assert last[col] == pytest.approx(batch_last[col], rel=1e-9, abs=1e-6), col
+    # 只有第一次调用做了批量初始化，之后每根新K线都走 update()
+    assert warm_ups == [95]
+    assert engine._count == 95 + 99
+
+
+def test_gap_beyond_window_reseeds(monkeypatch):
+    candles = make_candles(600)
+    engine = IncrementalIndicatorEngine()
+    warm_ups = count_warm_ups(engine, monkeypatch)
+    engine.calculate(candles.iloc[0:96].copy())
+    # 停机超过一个窗口后，引擎的最后一根K线已不在窗口内
+    window = candles.iloc[400:496].reset_index(drop=True)
+    assert_batch_parity(engine.calculate(window.copy()), window)
+    assert len(warm_ups) == 2
+
+
+def test_growing_window_updates_incrementally():
+    candles = make_candles(300)
+    engine = IncrementalIndicatorEngine()
+    engine.calculate(candles.iloc[:100].copy())
+    count = engine._count
+    for end in range(101, 300):
+        window = candles.iloc[:end]
+        assert_batch_parity(engine.calculate(window.copy()), window)
+    # 起点不变时没有重新冷启动，只提交了新收盘的K线
+    assert engine._count == count + 199
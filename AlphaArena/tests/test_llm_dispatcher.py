@@ -0,0 +1,96 @@
+import random
+import time
+
+import pytest
+
+from llm_dispatcher import LLMDispatcher, TokenBucket
+from llm_replay import StubChatClient
+
+
+def chat(client, prompt):
+    response = client.chat.completions.create(model='deepseek-chat', messages=[{'role': 'user', 'content': prompt}])
+    return response.choices[0].message.content
+
+
+def test_results_keep_input_order():
+    dispatcher = LLMDispatcher(max_concurrency=8, rate_per_second=0)
+
+    def work(i):
+        time.sleep(random.uniform(0, 0.02))
+        return i * 10
+
+    assert dispatcher.map(work, range(40)) == [i * 10 for i in range(40)]
+    assert dispatcher.stats()['completed'] == 40
+
+
+def test_concurrent_requests_against_stub_client():
+    client = StubChatClient(latency=0.1)
+    dispatcher = LLMDispatcher(max_concurrency=8, rate_per_second=0)
+    prompts = [f'bar {i}' for i in range(16)]
+
+    start = time.monotonic()
+    results = dispatcher.map(lambda prompt: chat(client, prompt), prompts)
+    elapsed = time.monotonic() - start
+
+    # 16 个请求、并发 8：约 2 个往返
+    assert elapsed < 0.6
+    assert client.calls == 16
+    assert results == [chat(StubChatClient(), prompt) for prompt in prompts]
+
+
+def test_timeout_and_errors_return_default():
+    dispatcher = LLMDispatcher(max_concurrency=4, rate_per_second=0, timeout=0.1)
+
+    def work(i):
+        if i == 2:
+            time.sleep(0.5)
+        if i == 4:
+            raise RuntimeError('boom')
+        return i
+
+    assert dispatcher.map(work, range(6), default=-1) == [0, 1, -1, 3, -1, 5]
+    assert dispatcher.stats()['timeouts'] == 1
+    assert dispatcher.stats()['errors'] == 1
+
+
+def test_timeout_excludes_queue_wait():
+    # 并发 1 时后面的请求需要排队，排队时间不计入超时
+    dispatcher = LLMDispatcher(max_concurrency=1, rate_per_second=0, timeout=0.15)
+    assert dispatcher.map(lambda i: time.sleep(0.05) or i, range(6), default=-1) == list(range(6))
+
+
+def test_rate_limit():
+    dispatcher = LLMDispatcher(max_concurrency=8, rate_per_second=20, burst=1)
+    start = time.monotonic()
+    dispatcher.map(lambda i: i, range(11))
+    # 首个令牌立即可用，其余 10 个按每秒 20 个补充
+    assert time.monotonic() - start >= 0.45
+
+
+def test_token_bucket_allows_burst():
+    bucket = TokenBucket(rate=1, capacity=5)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.1
+
+
+class Cancelled(Exception):
+    pass
+
+
+def test_progress_callback_cancels_remaining_requests():
+    client = StubChatClient(latency=0.05)
+    dispatcher = LLMDispatcher(max_concurrency=2, rate_per_second=0)
+    progress = []
+
+    def on_progress(done, total):
+        progress.append((done, total))
+        if done >= 4:
+            raise Cancelled()
+
+    with pytest.raises(Cancelled):
+        dispatcher.map(lambda i: chat(client, str(i)), range(100), progress_callback=on_progress)
+    time.sleep(0.2)
+    assert progress[:2] == [(0, 100), (1, 100)]
+    assert client.calls < 10
@@ -0,0 +1,106 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from llm_dispatcher import LLMDispatcher
+from llm_replay import LLMRecordStore, RecordReplayClient, ReplayMissError, StubChatClient
+
+REQUEST = {'model': 'deepseek-chat', 'messages': [{'role': 'user', 'content': 'bar 1'}], 'temperature': 0.1}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LLMRecordStore(str(tmp_path / 'llm_records.sqlite3'))
+
+
+def content(client, **request):
+    return client.chat.completions.create(**request).choices[0].message.content
+
+
+def test_record_then_replay(store):
+    stub = StubChatClient()
+    recorded = content(RecordReplayClient(store, 'record', stub), **REQUEST)
+    # 超时参数不影响录制键
+    replayed = content(RecordReplayClient(store, 'replay'), **REQUEST, timeout=5)
+    assert replayed == recorded
+    assert stub.calls == 1
+
+
+def test_replay_miss_raises(store):
+    client = RecordReplayClient(store, 'replay')
+    with pytest.raises(ReplayMissError):
+        client.chat.completions.create(**REQUEST)
+    assert client.stats()['misses'] == 1
+
+
+def test_discard_only_deletes_in_record_mode(store):
+    RecordReplayClient(store, 'record', StubChatClient()).chat.completions.create(**REQUEST)
+    RecordReplayClient(store, 'replay').discard(REQUEST)
+    assert store.count() == 1
+    RecordReplayClient(store, 'record', StubChatClient()).discard(REQUEST)
+    assert store.count() == 0
+
+
+# ----------------------------------------------------------------------
+# strategy_decision_v1 逐根回测：录制后回放结果一致
+# ----------------------------------------------------------------------
+@pytest.fixture
+def candles():
+    pytest.importorskip('ccxt')
+    pytest.importorskip('openai')
+    pytest.importorskip('requests')
+    from technical_analysis import calculate_technical_indicators
+    rng = np.random.default_rng(3)
+    close = 60000 + np.cumsum(rng.normal(0, 100, 60))
+    df = pd.DataFrame({
+        'timestamp': pd.date_range('2026-10-01', periods=60, freq='15min'),
+        'open': close, 'high': close + 50, 'low': close - 50, 'close': close, 'volume': rng.uniform(50, 500, 60),
+    })
+    return calculate_technical_indicators(df)
+
+
+def run_bars(client, df, dispatcher=None):
+    from strategy_decision import StrategyInterface
+    no_history = lambda limit: []
+    strategy = StrategyInterface(client, strategy_version='strategy_decision_v1', strategy_params={
+        'timeframe': '15m', 'recent_analysis_func': no_history, 'recent_trades_func': no_history,
+        'dispatcher': dispatcher})
+    strategy.prefetch_signals(df, start=40)
+    signals = []
+    for i in range(40, len(df)):
+        signal = strategy.analyze_market_strategy(price_data={'price': float(df['close'].iloc[i]), 'full_data': df.iloc[:i + 1]},
+                                                  signal_history=[], max_retries=1)
+        signals.append((signal['signal'], signal['reason'], signal.get('is_fallback', False)))
+    return signals
+
+
+def test_v1_record_then_replay_is_deterministic(store, candles):
+    stub = StubChatClient(latency=0.01)
+    recorded = run_bars(RecordReplayClient(store, 'record', stub), candles, LLMDispatcher(8, 0))
+    assert stub.calls == 20
+    assert not any(fallback for _, _, fallback in recorded)
+
+    replay = RecordReplayClient(store, 'replay')
+    assert run_bars(replay, candles) == recorded
+    assert replay.stats()['hits'] == 20
+
+
+def test_v1_replay_miss_falls_back_to_hold(store, candles):
+    replay = RecordReplayClient(store, 'replay')
+    signals = run_bars(replay, candles)
+    assert all(signal == 'HOLD' and fallback for signal, _, fallback in signals)
+    assert replay.stats()['misses'] > 0
+
+
+def test_v1_unparseable_response_is_not_recorded(store, candles):
+    answers = iter(['not json'] * 20)
+    good = json.dumps({'signal': 'BUY', 'confidence': 'HIGH', 'reason': 'retry'})
+    stub = StubChatClient(responder=lambda request: next(answers, good))
+    client = RecordReplayClient(store, 'record', stub)
+    signals = run_bars(client, candles, LLMDispatcher(4, 0))
+    # 预取得到的无法解析响应被丢弃，逐根回测时重新请求并录制有效响应
+    assert client.stats()['discarded'] == 20
+    assert signals == [('BUY', 'retry', False)] * 20
+    assert store.count() == 20
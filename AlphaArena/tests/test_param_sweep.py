@@ -0,0 +1,40 @@
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+pytest.importorskip('requests')
+
+import param_sweep
+
+
+class BreakingPool:
+    """产出前若干个结果后进程池崩溃（模拟工作进程被杀）"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def map(self, func, tasks, chunksize=1):
+        for i, task in enumerate(tasks):
+            if i == 7:
+                raise BrokenProcessPool('worker killed')
+            yield func(task)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def fake_run_combo(task):
+    index, params = task
+    return {'index': index, 'params': params, 'net_pnl_total': float(index)}
+
+
+def test_pool_failure_runs_only_remaining_combos(monkeypatch):
+    monkeypatch.setattr(param_sweep, 'ProcessPoolExecutor', BreakingPool)
+    monkeypatch.setattr(param_sweep, '_run_combo', fake_run_combo)
+    combos = param_sweep.expand_grid({'bb_position_threshold': [0.6, 0.7, 0.8, 0.9], 'fee_rate': [0.0005, 0.001, 0.002]})
+
+    results = list(param_sweep.iter_sweep(None, combos, max_workers=4))
+
+    indices = [r['index'] for r in results]
+    assert len(indices) == len(combos) == 12
+    assert sorted(indices) == list(range(12))
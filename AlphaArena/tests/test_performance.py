@@ -0,0 +1,51 @@
+import pytest
+
+
+@pytest.fixture
+def manager():
+    from data_manager import DataManager
+    return DataManager()
+
+
+def close_leg(pnl, strategy_version='strategy_decision_v2'):
+    return {'timestamp': '2026-10-10 12:00:00', 'action': 'CLOSE_LONG', 'side': 'sell', 'qty': 0.01,
+            'strategy_version': strategy_version, 'pnl': pnl}
+
+
+def test_close_legs_update_aggregates(manager):
+    manager.save_trade_record({'timestamp': '2026-10-10 11:00:00', 'action': 'OPEN_LONG', 'side': 'buy', 'qty': 0.01})
+    assert manager.get_performance()['aggregates']['closed_trades'] == 0
+
+    for pnl in (10.0, -4.0, 6.0):
+        manager.save_trade_record(close_leg(pnl))
+
+    aggregates = manager.get_performance()['aggregates']
+    assert aggregates['closed_trades'] == 3
+    assert aggregates['pnl_mean'] == pytest.approx(4.0)
+    assert aggregates['pnl_m2'] == pytest.approx(104.0)  # 样本方差 52
+    assert aggregates['pnl_std'] == pytest.approx(52 ** 0.5)
+    assert aggregates['max_drawdown'] == pytest.approx(4.0)
+    assert manager.get_performance()['by_strategy']['strategy_decision_v2']['closed_trades'] == 3
+
+
+def test_flip_records_realized_pnl(manager, monkeypatch):
+    pytest.importorskip('ccxt')
+    import trade_executor
+    monkeypatch.setattr(trade_executor, 'save_trade_record', manager.save_trade_record)
+
+    class Exchange:
+        def create_market_sell_order(self, symbol, amount):
+            return {'id': '1', 'status': 'closed', 'filled': amount, 'average': 105.0}
+
+    executed = trade_executor.execute_flip(
+        Exchange(), {'symbol': 'BTC/USDT:USDT'}, 'sell', 0.5, 0.2, {'price': 104.0},
+        {'signal': 'SELL', 'strategy_version': 'strategy_decision_v2'}, 'CLOSE_LONG', 'OPEN_SHORT', entry_price=100.0
+    )
+
+    assert [t['action'] for t in executed] == ['CLOSE_LONG', 'OPEN_SHORT']
+    trades = manager.get_trade_history()
+    assert trades[0]['pnl'] == pytest.approx(2.5)
+    assert 'pnl' not in trades[1]
+    aggregates = manager.get_performance()['aggregates']
+    assert aggregates['closed_trades'] == 1
+    assert aggregates['pnl_mean'] == pytest.approx(2.5)
@@ -0,0 +1,118 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('requests')
+
+from sentiment_cache import SentimentCache
+from technical_analysis import fetch_sentiment_indicators
+
+
+class FakeSentimentAPI:
+    """本地替身服务：返回 alternative.me 格式的恐慌贪婪指数，可设置延迟和故障"""
+
+    def __init__(self):
+        self.index = 70
+        self.status = 200
+        self.delay = 0.0
+        self.hits = 0
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                api.hits += 1
+                time.sleep(api.delay)
+                body = json.dumps({'data': [{
+                    'value': str(api.index),
+                    'value_classification': 'Greed',
+                    'timestamp': str(int(time.time())),
+                }]}).encode()
+                self.send_response(api.status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/fng/'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def fetch(self):
+        return fetch_sentiment_indicators(self.url)
+
+
+@pytest.fixture
+def api():
+    server = FakeSentimentAPI()
+    yield server
+    server.server.shutdown()
+
+
+def make_cache(api, tmp_path, **kwargs):
+    return SentimentCache(api.fetch, cache_path=str(tmp_path / 'sentiment_cache.json'), **kwargs)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, '等待超时'
+        time.sleep(0.02)
+
+
+def test_fresh_value_is_served_without_refetch(api, tmp_path):
+    cache = make_cache(api, tmp_path)
+    assert cache.get()['fear_greed_index'] == 70
+    api.index = 20
+    assert cache.get()['fear_greed_index'] == 70
+    assert api.hits == 1
+
+
+def test_stale_value_is_returned_while_refreshing(api, tmp_path):
+    cache = make_cache(api, tmp_path, ttl=3600)
+    cache.get()
+    cache._fetched_at -= 7200
+    api.index, api.delay = 20, 0.5
+
+    started = time.time()
+    assert cache.get()['fear_greed_index'] == 70
+    assert time.time() - started < 0.3
+
+    wait_for(lambda: cache.get()['fear_greed_index'] == 20)
+    assert api.hits == 2
+
+
+def test_failed_refresh_keeps_last_success(api, tmp_path):
+    cache = make_cache(api, tmp_path)
+    cache.get()
+    api.status = 500
+    assert cache.refresh()['status'] == 'fallback'
+    value = cache.get()
+    assert value['status'] == 'success'
+    assert value['fear_greed_index'] == 70
+
+
+def test_restart_reads_cache_from_disk(api, tmp_path):
+    make_cache(api, tmp_path).get()
+    api.index = 20
+    restarted = make_cache(api, tmp_path)
+    assert restarted.get()['fear_greed_index'] == 70
+    assert api.hits == 1
+
+
+def test_concurrent_cold_start_fetches_once(api, tmp_path):
+    cache = make_cache(api, tmp_path)
+    api.delay = 0.3
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get())) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert api.hits == 1
+    assert [r['fear_greed_index'] for r in results] == [70] * 5
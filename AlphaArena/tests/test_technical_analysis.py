@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('requests')
+
+from technical_analysis import (
+    calculate_integrated_trading_score, calculate_integrated_trading_scores, calculate_technical_indicators
+)
+
+TECH_COLUMNS = ['sma_5', 'sma_20', 'sma_50', 'rsi', 'macd', 'macd_signal', 'macd_histogram', 'bb_position']
+
+SENTIMENTS = [None, {'net_sentiment': 0.4}, {'net_sentiment': -0.15}, {'net_sentiment': 0.05}, {'net_sentiment': 0.0}]
+POSITIONS = [
+    None,
+    {'side': 'long', 'unrealized_pnl': 30},
+    {'side': 'short', 'unrealized_pnl': 30},
+    {'side': 'long', 'unrealized_pnl': -80},
+    {'side': 'short', 'unrealized_pnl': -80},
+]
+
+
+@pytest.fixture(scope='module')
+def indicators():
+    rng = np.random.default_rng(5)
+    n = 400
+    close = 60000 + np.cumsum(rng.normal(0, 150, n)) + 800 * np.sin(np.arange(n) / 15)
+    df = pd.DataFrame({
+        'timestamp': pd.date_range('2026-10-01', periods=n, freq='15min'),
+        'open': close, 'high': close + 60, 'low': close - 60, 'close': close, 'volume': rng.uniform(50, 500, n),
+    })
+    # 前几十行的 RSI/布林带/成交量均线为 NaN（预热期）
+    return calculate_technical_indicators(df)
+
+
+@pytest.mark.parametrize('position_info', POSITIONS)
+@pytest.mark.parametrize('sentiment_data', SENTIMENTS)
+def test_vectorized_scores_match_scalar(indicators, sentiment_data, position_info):
+    assert indicators['rsi'].isna().any()
+    expected = [
+        calculate_integrated_trading_score(current_price=row['close'], technical_data={c: row[c] for c in TECH_COLUMNS},
+                                           sentiment_data=sentiment_data, position_info=position_info)
+        for row in indicators.to_dict('records')
+    ]
+    scores = calculate_integrated_trading_scores(indicators, sentiment_data, position_info)
+    assert scores.tolist() == expected
@@ -0,0 +1,50 @@
+import pytest
+
+pytest.importorskip('ccxt')
+
+CONFIG = {'symbol': 'BTC/USDT:USDT', 'flip_mode': 'netted', 'fill_timeout': 0.05,
+          'position_management': {'base_usdt_amount': 100, 'max_position_ratio': 10}}
+LONG = {'side': 'long', 'size': 0.02, 'entry_price': 60000.0}
+
+
+class Exchange:
+    def __init__(self, status, filled):
+        self.status, self.filled = status, filled
+
+    def create_market_sell_order(self, symbol, amount):
+        return {'id': '1', 'status': self.status, 'filled': self.filled, 'average': 61000.0}
+
+    def fetch_order(self, order_id, symbol):
+        return {'id': order_id, 'status': self.status, 'filled': self.filled}
+
+
+@pytest.fixture
+def trade_executor():
+    # 导入时会在当前目录创建 DataManager，需在临时目录中导入
+    import trade_executor
+    return trade_executor
+
+
+@pytest.fixture
+def recorded(trade_executor, monkeypatch):
+    trades = []
+    monkeypatch.setattr(trade_executor, 'save_trade_record', trades.append)
+    return trades
+
+
+@pytest.mark.parametrize('flip_mode', ['netted', 'sequential'])
+@pytest.mark.parametrize('status, filled', [('rejected', None), ('canceled', 0), ('open', 0)])
+def test_unfilled_flip_is_reported_as_failure(trade_executor, recorded, flip_mode, status, filled):
+    result = trade_executor.execute_trade(Exchange(status, filled), dict(CONFIG, flip_mode=flip_mode),
+                                          {'signal': 'SELL'}, {'price': 61000.0}, current_position=LONG)
+    assert result['success'] is False
+    assert '未成交' in result['message']
+    assert recorded == []
+
+
+def test_filled_flip_records_both_legs(trade_executor, recorded):
+    result = trade_executor.execute_trade(Exchange('closed', 0.03), CONFIG, {'signal': 'SELL'}, {'price': 61000.0},
+                                          current_position=LONG)
+    assert result['success'] is True
+    assert [t['action'] for t in recorded] == ['CLOSE_LONG', 'OPEN_SHORT']
+    assert recorded[0]['pnl'] == pytest.approx(20.0)
@@ -12,11 +12,26 @@ from datetime import datetime
 from market_data import get_current_position
 from data_manager import save_trade_record
 
+# execute_trade 的 current_position 默认值：表示调用方没有持仓快照，需要自行查询
+POSITION_NOT_FETCHED = object()
 
-def record_trade(action: str, side: str, size: float, ref_price: float, response: dict, signal_data: dict, extra: dict = None):
+
+class OrderNotFilledError(Exception):
+    """订单被拒绝、撤销或超时后没有任何成交（原持仓保持不变）"""
+
+
+def realized_pnl(action: str, entry_price: float, exit_price: float, size: float):
+    """平仓腿的已实现盈亏（USDT）：(平仓价 - 开仓均价) × 成交数量 × 方向（平多为正向，平空为反向）"""
+    direction = 1 if action == 'CLOSE_LONG' else -1
+    return round((float(exit_price) - float(entry_price)) * float(size) * direction, 6)
+
+
+def record_trade(action: str, side: str, size: float, ref_price: float, response: dict, signal_data: dict, extra: dict = None,
+                 entry_price: float = None):
     """构造并保存一条标准化交易记录到 trades.json。
     - 时间戳采用上海时区字符串 '%Y-%m-%d %H:%M:%S'
     - 保存 signal/confidence/reason 字段，方便技术图 merge_asof 匹配
+    - 平仓腿（CLOSE_*）传入持仓开仓均价 entry_price 时记录已实现盈亏 pnl，计入绩效统计
     - 兼容旧字段 price/size
     """
     try:
@@ -51,6 +66,10 @@ def record_trade(action: str, side: str, size: float, ref_price: float, response
     }
     if extra:
         trade_record.update(extra)
+    if entry_price and action.startswith('CLOSE_'):
+        exit_price = trade_record['fill_price'] if isinstance(trade_record['fill_price'], (int, float)) else ref_price
+        trade_record['entry_price'] = round(float(entry_price), 2)
+        trade_record['pnl'] = realized_pnl(action, entry_price, exit_price, size)
 
     # 兼容旧字段命名
     trade_record['price'] = trade_record['ref_price']
@@ -60,6 +79,101 @@ def record_trade(action: str, side: str, size: float, ref_price: float, response
     return trade_record
 
 
+def wait_for_fill(exchange, order: dict, symbol: str, timeout: float = 5.0, poll_interval: float = 0.2):
+    """按订单状态确认成交，代替固定等待。
+    市价单通常立即成交，下单返回的状态已是 closed 时不再查询；
+    否则轮询 fetch_order 直到订单结束（closed/canceled/rejected）或超时，返回最后一次查询到的订单。
+    """
+    order = order or {}
+    order_id = order.get('id')
+    deadline = time.time() + timeout
+    while order.get('status') not in ('closed', 'canceled', 'rejected', 'expired') and order_id:
+        if time.time() >= deadline:
+            print(f"⚠️ 订单 {order_id} 在 {timeout}s 内未确认成交，当前状态: {order.get('status')}")
+            break
+        time.sleep(poll_interval)
+        try:
+            order = exchange.fetch_order(order_id, symbol) or order
+        except ccxt.BaseError as e:
+            print(f"⚠️ 查询订单状态失败: {e}")
+    return order
+
+
+def _filled_amount(order: dict, requested: float) -> float:
+    """订单已成交数量；交易所未返回 filled 字段时，被拒绝/撤销/过期的订单按0处理，其余按请求数量处理"""
+    filled = order.get('filled')
+    if filled is not None:
+        return float(filled)
+    return 0.0 if order.get('status') in ('canceled', 'rejected', 'expired') else requested
+
+
+def execute_flip(exchange, trade_config: dict, side: str, close_size: float, open_size: float,
+                 price_data: dict, signal_data: dict, close_action: str, open_action: str, entry_price: float = None):
+    """反向开仓：平掉当前持仓并开反向仓位，两条腿分别记录交易（entry_price 为当前持仓开仓均价，用于平仓腿盈亏）。
+
+    flip_mode 为 netted（默认）时发送一笔数量为 平仓+开仓 的净额市价单（单向持仓模式下一笔订单即完成反手），
+    只有一次往返、中间没有裸露敞口；为 sequential 时先平后开，两笔订单都按订单状态确认成交后再继续。
+
+    Returns:
+        list: 已执行的交易 [{'action', 'size'}]
+
+    Raises:
+        OrderNotFilledError: 净额订单或平仓订单没有任何成交
+    """
+    symbol = trade_config['symbol']
+    timeout = trade_config.get('fill_timeout', 5)
+    place_order = exchange.create_market_buy_order if side == 'buy' else exchange.create_market_sell_order
+
+    if trade_config.get('flip_mode', 'netted') == 'netted':
+        total_size = close_size + open_size
+        print(f"🔁 反手净额下单: {side} {total_size:.4f} (平仓 {close_size:.4f} + 开仓 {open_size:.4f})")
+        order = wait_for_fill(exchange, place_order(symbol, total_size), symbol, timeout)
+        # 部分成交时优先计入平仓腿
+        filled = min(_filled_amount(order, total_size), total_size)
+        if filled <= 0:
+            print(f"❌ 反手订单未成交，状态: {order.get('status')}，原持仓保持不变")
+            raise OrderNotFilledError(f"反手订单未成交 (状态: {order.get('status')})")
+        print(f"✅ 反手订单状态: {order.get('status')}, 成交 {filled}")
+
+        close_filled = min(filled, close_size)
+        open_filled = round(filled - close_filled, 8)
+        extra = {'flip_mode': 'netted', 'netted_qty': round(float(total_size), 6), 'order_status': order.get('status')}
+        executed = []
+        if close_filled > 0:
+            record_trade(close_action, side, close_filled, price_data['price'], order, signal_data, dict(extra, leg='close'),
+                         entry_price)
+            executed.append({'action': close_action, 'size': close_filled})
+        if open_filled > 0:
+            record_trade(open_action, side, open_filled, price_data['price'], order, signal_data, dict(extra, leg='open'))
+            executed.append({'action': open_action, 'size': open_filled})
+        return executed
+
+    print(f"🔁 反手: 先平仓 {close_size:.4f}，确认成交后开仓 {open_size:.4f}")
+    close_order = wait_for_fill(exchange, place_order(symbol, close_size), symbol, timeout)
+    close_filled = _filled_amount(close_order, close_size)
+    if close_filled <= 0:
+        print(f"❌ 平仓订单未成交，状态: {close_order.get('status')}，放弃开反向仓位")
+        raise OrderNotFilledError(f"平仓订单未成交 (状态: {close_order.get('status')})")
+    print(f"✅ 平仓订单状态: {close_order.get('status')}")
+    record_trade(close_action, side, close_filled, price_data['price'], close_order, signal_data,
+                 {'flip_mode': 'sequential', 'leg': 'close', 'order_status': close_order.get('status')}, entry_price)
+    executed = [{'action': close_action, 'size': close_filled}]
+    if close_order.get('status') in ('canceled', 'rejected', 'expired'):
+        print(f"❌ 平仓订单未完全成交 (状态: {close_order.get('status')})，放弃开反向仓位")
+        return executed
+
+    open_order = wait_for_fill(exchange, place_order(symbol, open_size), symbol, timeout)
+    open_filled = _filled_amount(open_order, open_size)
+    if open_filled <= 0:
+        print(f"❌ 开仓订单未成交，状态: {open_order.get('status')}，仅完成平仓")
+        return executed
+    print(f"✅ 开仓订单状态: {open_order.get('status')}")
+    record_trade(open_action, side, open_filled, price_data['price'], open_order, signal_data,
+                 {'flip_mode': 'sequential', 'leg': 'open', 'order_status': open_order.get('status')})
+    executed.append({'action': open_action, 'size': open_filled})
+    return executed
+
+
 def calculate_position_size(signal_data: dict, price_data: dict, trade_config: dict, current_position: dict = None):
     """智能仓位计算函数 - 简化版（固定金额，按张数下单）"""
     try:
@@ -104,7 +218,7 @@ def calculate_position_size(signal_data: dict, price_data: dict, trade_config: d
         return 0.01  # 返回最小仓位（1张 = 0.01 BTC）
 
 
-def execute_trade(exchange, trade_config: dict, signal_data: dict, price_data: dict):
+def execute_trade(exchange, trade_config: dict, signal_data: dict, price_data: dict, current_position=POSITION_NOT_FETCHED):
     """
     执行交易 - 统一接口
     
@@ -113,13 +227,16 @@ def execute_trade(exchange, trade_config: dict, signal_data: dict, price_data: d
         trade_config: 交易配置字典
         signal_data: 信号数据，必须包含 'signal' 字段 ('BUY' 或 'SELL')
         price_data: 价格数据，必须包含 'price' 字段；可选包含 'manual_btc_amount' 用于手动交易
+        current_position: 调用方已获取的持仓快照（None 表示无持仓）；未传入时在此查询
     
     Returns:
-        dict: 交易结果 {'success': bool, 'message': str, 'trades': list}
+        dict: 交易结果 {'success': bool, 'message': str, 'trades': list}；
+              已发出订单时包含 'order_sent_at'（首笔订单发出时刻，epoch秒，不含等待成交确认的时间）
     """
     try:
-        # 获取当前持仓
-        current_position = get_current_position(exchange, trade_config)
+        # 获取当前持仓（优先复用调用方本轮的持仓快照，省去一次REST请求）
+        if current_position is POSITION_NOT_FETCHED:
+            current_position = get_current_position(exchange, trade_config)
         
         # 检查是否手动指定了张数（张数即BTC数量，OKX中1张=0.01BTC）
         if 'manual_contracts' in price_data and price_data['manual_contracts'] > 0:
@@ -140,6 +257,8 @@ def execute_trade(exchange, trade_config: dict, signal_data: dict, price_data: d
         print(f"📊 执行仓位: {trade_size:.4f} BTC")
         
         executed_trades = []
+        # 以下各分支随即发出首笔订单
+        order_sent_at = time.time()
         
         # 执行买入
         if signal_data['signal'] == 'BUY':
@@ -157,29 +276,11 @@ def execute_trade(exchange, trade_config: dict, signal_data: dict, price_data: d
                 executed_trades.append({'action': 'ADD_LONG', 'size': trade_size})
                 
             elif current_position and current_position['side'] == 'short':
-                # 先平空仓
-                current_size = abs(current_position['size'])
-                print(f"📉 平空仓: {current_size:.4f} BTC")
-                close_response = exchange.create_market_buy_order(
-                    trade_config['symbol'], 
-                    current_size
-                )
-                print(f"✅ 平空成功: {close_response}")
-                
-                # 再开多仓
-                time.sleep(1)  # 稍微等待一下
-                print(f"📈 开多仓: {trade_size:.4f} BTC")
-                open_response = exchange.create_market_buy_order(
-                    trade_config['symbol'], 
-                    trade_size
-                )
-                print(f"✅ 开多成功: {open_response}")
-                
-                # 保存两个交易记录
-                record_trade('CLOSE_SHORT', 'buy', current_size, price_data['price'], close_response, signal_data)
-                record_trade('OPEN_LONG', 'buy', trade_size, price_data['price'], open_response, signal_data)
-                executed_trades.append({'action': 'CLOSE_SHORT', 'size': current_size})
-                executed_trades.append({'action': 'OPEN_LONG', 'size': trade_size})
+                # 平空并开多（反手）
+                executed_trades.extend(execute_flip(
+                    exchange, trade_config, 'buy', abs(current_position['size']), trade_size,
+                    price_data, signal_data, 'CLOSE_SHORT', 'OPEN_LONG', current_position.get('entry_price')
+                ))
                 
             else:
                 # 直接开多仓
@@ -210,29 +311,11 @@ def execute_trade(exchange, trade_config: dict, signal_data: dict, price_data: d
                 executed_trades.append({'action': 'ADD_SHORT', 'size': trade_size})
                 
             elif current_position and current_position['side'] == 'long':
-                # 先平多仓
-                current_size = abs(current_position['size'])
-                print(f"📈 平多仓: {current_size:.4f} BTC")
-                close_response = exchange.create_market_sell_order(
-                    trade_config['symbol'], 
-                    current_size
-                )
-                print(f"✅ 平多成功: {close_response}")
-                
-                # 再开空仓
-                time.sleep(1)
-                print(f"📉 开空仓: {trade_size:.4f} BTC")
-                open_response = exchange.create_market_sell_order(
-                    trade_config['symbol'], 
-                    trade_size
-                )
-                print(f"✅ 开空成功: {open_response}")
-                
-                # 保存两个交易记录
-                record_trade('CLOSE_LONG', 'sell', current_size, price_data['price'], close_response, signal_data)
-                record_trade('OPEN_SHORT', 'sell', trade_size, price_data['price'], open_response, signal_data)
-                executed_trades.append({'action': 'CLOSE_LONG', 'size': current_size})
-                executed_trades.append({'action': 'OPEN_SHORT', 'size': trade_size})
+                # 平多并开空（反手）
+                executed_trades.extend(execute_flip(
+                    exchange, trade_config, 'sell', abs(current_position['size']), trade_size,
+                    price_data, signal_data, 'CLOSE_LONG', 'OPEN_SHORT', current_position.get('entry_price')
+                ))
                 
             else:
                 # 直接开空仓
@@ -257,9 +340,13 @@ def execute_trade(exchange, trade_config: dict, signal_data: dict, price_data: d
         return {
             'success': True,
             'message': f'交易执行成功，共执行 {len(executed_trades)} 笔交易',
-            'trades': executed_trades
+            'trades': executed_trades,
+            'order_sent_at': order_sent_at
         }
         
+    except OrderNotFilledError as e:
+        return {'success': False, 'message': str(e), 'trades': [], 'order_sent_at': order_sent_at}
+
     except ccxt.BaseError as e:
         error_msg = str(e)
         if "Insufficient balance" in error_msg:
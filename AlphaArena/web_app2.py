@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from flask import Flask, jsonify, request, make_response
+from flask import Flask, jsonify, request, make_response, Response
 from flask_cors import CORS
 import os
 import json
@@ -29,29 +29,35 @@ def login():
 def get_system_status():
     return jsonify(data_manager.get_system_status())
 
+def _history_filters():
+    """解析历史记录查询参数: since, until, strategy_version, signal"""
+    return {
+        'since': request.args.get('since'),
+        'until': request.args.get('until'),
+        'strategy_version': request.args.get('strategy_version'),
+        'signal': request.args.get('signal'),
+    }
+
 @app.route('/api/trade-history', methods=['GET'])
 def get_trade_history():
-    return jsonify(data_manager.get_trade_history())
+    """交易历史：默认最近100条；可选 since/until/strategy_version/signal 过滤，limit 指定条数（0 表示范围内全部）"""
+    limit = request.args.get('limit', 100, type=int)
+    return jsonify(data_manager.get_trade_history(limit=limit or None, **_history_filters()))
 
 @app.route('/api/ai-analysis-history', methods=['GET'])
 def get_ai_analysis():
-    # 获取分页参数
-    page = request.args.get('page', 1, type=int)
-    page_size = request.args.get('page_size', 10, type=int)
-    
-    # 获取所有数据
-    all_data = data_manager.get_ai_analysis_history()
-    
-    # 计算分页
-    total_count = len(all_data)
-    start_idx = (page - 1) * page_size
-    end_idx = start_idx + page_size
+    # 获取分页参数（深翻页可改用上一页返回的 next_cursor）
+    page = max(request.args.get('page', 1, type=int), 1)
+    page_size = min(max(request.args.get('page_size', 10, type=int), 1), 200)
+    cursor = request.args.get('cursor')
+    filters = _history_filters()
     
-    # 按时间倒序排列（最新的在前面）
-    sorted_data = sorted(all_data, key=lambda x: x.get('timestamp', ''), reverse=True)
-    
-    # 获取当前页数据
-    page_data = sorted_data[start_idx:end_idx]
+    # 按时间倒序（最新的在前面）直接从索引读取当前页
+    try:
+        page_data, next_cursor = data_manager.get_ai_analysis_page(page_size=page_size, page=page, cursor=cursor, **filters)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    total_count = data_manager.count_ai_analysis(**filters)
     
     return jsonify({
         'data': page_data,
@@ -60,8 +66,9 @@ def get_ai_analysis():
             'page_size': page_size,
             'total_count': total_count,
             'total_pages': (total_count + page_size - 1) // page_size,
-            'has_next': end_idx < total_count,
-            'has_prev': page > 1
+            'has_next': next_cursor is not None,
+            'has_prev': page > 1,
+            'next_cursor': next_cursor
         }
     })
 
@@ -69,9 +76,8 @@ def get_ai_analysis():
 def get_performance():
     return jsonify(data_manager.get_performance())
 
-@app.route('/api/technical-chart', methods=['GET'])
-def get_technical_chart_data():
-    """获取K线和技术指标数据 - 使用deepseekok3.py的公共函数"""
+def _build_technical_chart(days):
+    """计算技术图表数据（K线、指标、评分、决策信号、情绪），返回 (数据, HTTP状态码)"""
     try:
         # 导入deepseekok3模块
         import sys
@@ -86,15 +92,8 @@ def get_technical_chart_data():
         except ImportError as e:
             print(f"❌ 导入deepseekok3失败: {e}")
             # 如果导入失败，回退到本地实现
-            return jsonify({'error': '无法导入交易引擎模块'}), 500
+            return {'error': '无法导入交易引擎模块'}, 500
         
-        # 解析可选的 days 参数（默认2天）来动态控制数据窗口大小
-        try:
-            days = int(request.args.get('days', 2))
-        except Exception:
-            days = 2
-        days = max(1, min(days, 30))  # 安全边界：1~30天
-
         def tf_to_minutes(tf: str) -> int:
             try:
                 tf = (tf or '').lower().strip()
@@ -125,7 +124,7 @@ def get_technical_chart_data():
                 calculate_technical_indicators, get_sentiment_indicators, calculate_integrated_trading_score
             )
             if not web_data:
-                return jsonify({'error': '无法获取市场数据'}), 500
+                return {'error': '无法获取市场数据'}, 500
             
             df = web_data['dataframe']
             sentiment_info = web_data['sentiment']
@@ -141,8 +140,12 @@ def get_technical_chart_data():
                 decision_signals = [0] * kline_count
                 print(f"初始化决策信号数组，长度: {kline_count}")
                 
-                # 获取交易记录并匹配到K线数据
-                trade_history = data_manager.get_trade_history()
+                # 获取交易记录并匹配到K线数据（只读取K线时间范围内的交易）
+                trade_history = data_manager.get_trade_history(
+                    since=df['timestamp'].min(),
+                    until=df['timestamp'].max() + timedelta(minutes=tf_to_minutes(timeframe)),
+                    limit=None
+                )
                 
                 if trade_history and len(trade_history) > 0:
                     print(f"找到 {len(trade_history)} 条交易记录，开始匹配...")
@@ -263,12 +266,43 @@ def get_technical_chart_data():
                 'sentiment': sentiment_info
             }
             
-            return jsonify(chart_data)
+            return chart_data, 200
             
         except Exception as exchange_error:
             print(f"获取交易所数据失败: {exchange_error}")
-            return jsonify({'error': f'无法获取市场数据: {str(exchange_error)}'}), 500
+            return {'error': f'无法获取市场数据: {str(exchange_error)}'}, 500
         
+    except Exception as e:
+        print(f"获取技术图表数据失败: {e}")
+        return {'error': str(e)}, 500
+
+
+@app.route('/api/technical-chart', methods=['GET'])
+def get_technical_chart_data():
+    """获取K线和技术指标数据 - 使用deepseekok3.py的公共函数。
+    结果按 (timeframe, days) 缓存到下一根K线收盘，有新交易记录时立即失效；
+    并发请求共享同一次计算。"""
+    try:
+        from response_cache import technical_chart_cache
+
+        # 解析可选的 days 参数（默认2天）来动态控制数据窗口大小
+        try:
+            days = int(request.args.get('days', 2))
+        except Exception:
+            days = 2
+        days = max(1, min(days, 30))  # 安全边界：1~30天
+
+        timeframe = TRADE_CONFIG.get('timeframe', '15m')
+        trades_version = data_manager.get_trades_version()
+
+        def compute():
+            data, status = _build_technical_chart(days)
+            return (data, status), status == 200
+
+        data, status = technical_chart_cache.get_or_compute(
+            (timeframe, days), timeframe, compute, version=trades_version
+        )
+        return jsonify(data), status
     except Exception as e:
         print(f"获取技术图表数据失败: {e}")
         return jsonify({'error': str(e)}), 500
@@ -277,7 +311,7 @@ def get_technical_chart_data():
 @app.route('/api/backtest', methods=['POST'])
 def run_backtest_api():
     """回测接口：默认回测最近2天，15分钟级别。
-    可选传参: days (最多300天), interval, strategy_version, end_time (截至时间)。
+    可选传参: days (最多300天), interval, strategy_version, end_time (截至时间), llm_mode (LLM策略的 record/replay/live)。
     当回测天数超过20天时，返回数据仅包含最近20天，但统计基于完整回测。"""
     try:
         # 延迟导入，避免循环依赖
@@ -289,7 +323,10 @@ def run_backtest_api():
         strategy_version = data.get('strategy_version', 'strategy_decision_v2')
         end_time = data.get('end_time')  # 截至时间，格式: 'YYYY-MM-DD HH:MM:SS'
 
-        result = run_backtest(days=days, interval=interval, strategy_version=strategy_version, end_time=end_time)
+        llm_mode = data.get('llm_mode', 'record')  # LLM策略(v1)的模型调用方式: record / replay / live
+
+        result = run_backtest(days=days, interval=interval, strategy_version=strategy_version, end_time=end_time,
+                              llm_mode=llm_mode)
         if 'error' in result:
             return jsonify(result), 500
         return jsonify(result)
@@ -297,6 +334,141 @@ def run_backtest_api():
         print(f"回测执行失败: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/backtest/jobs', methods=['POST'])
+def submit_backtest_job():
+    """提交后台回测任务，立即返回任务ID（参数同 /api/backtest）"""
+    try:
+        from backtest_jobs import backtest_job_manager
+
+        data = request.get_json(silent=True) or {}
+        params = {
+            'days': min(int(data.get('days', 2)), 300),
+            'interval': data.get('interval', '15m'),
+            'strategy_version': data.get('strategy_version', 'strategy_decision_v2'),
+            'end_time': data.get('end_time'),
+            'llm_mode': data.get('llm_mode', 'record')
+        }
+        job = backtest_job_manager.submit(params)
+        if 'error' in job:
+            return jsonify(job), 429
+        return jsonify(job), 202
+    except Exception as e:
+        print(f"提交回测任务失败: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/backtest/jobs', methods=['GET'])
+def list_backtest_jobs():
+    """列出所有回测任务（不含结果）"""
+    from backtest_jobs import backtest_job_manager
+    return jsonify({'jobs': backtest_job_manager.list_jobs()})
+
+@app.route('/api/backtest/jobs/<job_id>', methods=['GET'])
+def get_backtest_job(job_id):
+    """查询回测任务状态与进度"""
+    from backtest_jobs import backtest_job_manager
+    job = backtest_job_manager.get_status(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    return jsonify(job)
+
+@app.route('/api/backtest/jobs/<job_id>/result', methods=['GET'])
+def get_backtest_job_result(job_id):
+    """获取已完成回测任务的结果（格式同 /api/backtest）"""
+    from backtest_jobs import backtest_job_manager, JOB_COMPLETED
+    job, result = backtest_job_manager.get_result(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    if job['status'] != JOB_COMPLETED:
+        return jsonify(dict(job, error=job['error'] or '任务尚未完成')), 409
+    return jsonify(result)
+
+@app.route('/api/backtest/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_backtest_job(job_id):
+    """取消排队中或执行中的回测任务"""
+    from backtest_jobs import backtest_job_manager
+    job = backtest_job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    return jsonify(job)
+
+@app.route('/api/backtest/compare', methods=['POST'])
+def compare_backtest_api():
+    """多策略对比回测接口：K线和指标只加载一次，并行回测多个策略版本。
+    可选传参: days (最多300天), interval, end_time, versions (默认所有启用的策略版本)。"""
+    try:
+        from backtest import compare_strategies
+
+        data = request.get_json(silent=True) or {}
+        days = min(int(data.get('days', 2)), 300)
+        interval = data.get('interval', '15m')
+        end_time = data.get('end_time')
+        versions = data.get('versions')
+
+        result = compare_strategies(days=days, interval=interval, end_time=end_time, versions=versions)
+        if 'error' in result:
+            return jsonify(result), 500
+        return jsonify(result)
+    except Exception as e:
+        print(f"对比回测执行失败: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/backtest/sweep', methods=['POST'])
+def sweep_backtest_api():
+    """参数扫描接口：对参数网格中的所有组合并行回测，以 NDJSON 流式返回。
+    传参: param_ranges ({参数名: 列表 或 {start, stop, step}})，
+    可选: strategy_version (默认 v3), days, interval, end_time, sort_by (net_pnl/win_rate/max_drawdown), top_n (默认20)。
+    参数组合数超过 MAX_SWEEP_COMBOS（环境变量 SWEEP_MAX_COMBOS）时返回 400。
+    每完成一个组合输出一行 {type: 'result', ...}，最后输出一行 {type: 'ranking', results: [...]}。"""
+    try:
+        from backtest import load_backtest_data
+        from param_sweep import expand_grid, iter_sweep, sort_results, SORT_KEYS, MAX_SWEEP_COMBOS
+
+        data = request.get_json(silent=True) or {}
+        param_ranges = data.get('param_ranges') or {}
+        strategy_version = data.get('strategy_version', 'strategy_decision_v3')
+        days = min(int(data.get('days', 2)), 300)
+        interval = data.get('interval', '15m')
+        end_time = data.get('end_time')
+        sort_by = data.get('sort_by', 'net_pnl')
+        top_n = int(data.get('top_n', 20))
+
+        if sort_by not in SORT_KEYS:
+            return jsonify({'error': f'不支持的排序指标: {sort_by}'}), 400
+        try:
+            combos = expand_grid(param_ranges, max_combos=MAX_SWEEP_COMBOS)
+        except Exception as e:
+            return jsonify({'error': f'参数范围无效: {e}'}), 400
+
+        backtest_data = load_backtest_data(days=days, interval=interval, end_time=end_time)
+        if 'error' in backtest_data:
+            return jsonify(backtest_data), 500
+
+        def generate():
+            results = []
+            sweep = iter_sweep(backtest_data['df'], combos, strategy_version=strategy_version,
+                               warmup_candles=backtest_data['per_day'])
+            try:
+                for result in sweep:
+                    results.append(result)
+                    yield json.dumps(dict(result, type='result', completed=len(results), total=len(combos)),
+                                     ensure_ascii=False) + '\n'
+            finally:
+                # 客户端断开时关闭扫描，进程池取消剩余组合
+                sweep.close()
+            ranked = sort_results(results, sort_by)[:top_n]
+            yield json.dumps({
+                'type': 'ranking',
+                'strategy_version': strategy_version,
+                'sort_by': sort_by,
+                'total': len(combos),
+                'results': [dict(r, rank=rank) for rank, r in enumerate(ranked, 1)]
+            }, ensure_ascii=False) + '\n'
+
+        return Response(generate(), mimetype='application/x-ndjson')
+    except Exception as e:
+        print(f"参数扫描执行失败: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/strategy-config', methods=['GET'])
 def get_strategy_config():
     """获取策略配置"""
@@ -336,6 +508,18 @@ def get_live_strategy():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/strategy-config/reload', methods=['POST'])
+def reload_live_strategy():
+    """请求交易进程重新加载实时策略（下一次执行时生效）"""
+    requested_at = data_manager.request_strategy_reload()
+    if requested_at is None:
+        return jsonify({'success': False, 'message': '保存重新加载请求失败'}), 500
+    return jsonify({
+        'success': True,
+        'message': '已请求重新加载策略，将在下一次执行时生效',
+        'requested_at': requested_at
+    })
+
 @app.route('/api/manual-trade', methods=['POST'])
 def manual_trade():
     """手动交易接口 - 立即执行买入或卖出操作，支持自定义张数"""
@@ -458,10 +642,48 @@ def dashboard():
         return f"错误: {str(e)}", 500
 
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus 文本格式的外部接口调用指标（交易进程 + Web进程）"""
+    try:
+        from metrics import metrics_registry, render_prometheus
+        body = render_prometheus({
+            'bot': data_manager.get_runtime_metrics(),
+            'web': metrics_registry.snapshot(),
+        })
+        return Response(body, mimetype='text/plain; version=0.0.4; charset=utf-8')
+    except Exception as e:
+        print(f"生成监控指标失败: {e}")
+        return Response(f"# error: {e}\n", status=500, mimetype='text/plain')
+
+
+@app.route('/api/tick-timings', methods=['GET'])
+def tick_timings():
+    """交易周期分阶段耗时：最近 N 个周期各阶段的 p50/p95/p99（参数 last，默认100）"""
+    try:
+        from metrics import summarize_stage_timings
+        last_n = max(1, min(int(request.args.get('last', 100)), 500))
+        ticks = data_manager.get_tick_timings()[-last_n:]
+        return jsonify({
+            'ticks': len(ticks),
+            'stages': summarize_stage_timings(ticks),
+            'recent': ticks[-10:]
+        })
+    except Exception as e:
+        print(f"获取阶段耗时失败: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/health', methods=['GET'])
 def health():
     return jsonify({'status': 0, 'msg': 'API正常', 'data': {'service': 'AlphaArena', 'version': '2.0'}})
 
 if __name__ == '__main__':
     print(f"🚀 AlphaArena Web服务启动 - http://172.16.0.252:8003/")
-    app.run(host='0.0.0.0', port=8003, debug=True, threaded=True)
+    # 后台预热并定时刷新情绪指标，图表和回测请求不再同步等待外部API；
+    # debug 模式的 reloader 父进程只负责监控文件变化，只在实际提供服务的子进程中启动
+    debug = True
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from technical_analysis import sentiment_cache
+        sentiment_cache.start()
+    app.run(host='0.0.0.0', port=8003, debug=debug, threaded=True)